@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from controllers.pipeline_controller import (
+    create_job, expand_parts, execute_stage, get_output_paths, quarantine_job, SCRIPT_STAGE, TTS_STAGE, RENDER_STAGE
+)
+from controllers.tts_controller import TTSController
+from modules.job_manifest import JobManifest
+
+_STOP = object()
+
+
+class BatchController:
+    """Run many PDFs through script -> TTS -> render with one bounded pool per stage.
+
+    The script and TTS stages are network-bound and run on threads. Rendering is
+    CPU-bound and runs on a process pool sized to the machine. Stages are connected
+    by bounded queues so PDF N+1 is scripted and voiced while PDF N is encoding.
+    """
+
+    def __init__(self, script_workers=2, tts_workers=2, render_workers=None, queue_size=4, script_options=None,
+                 render_options=None):
+        self.script_workers = max(1, script_workers)
+        self.tts_workers = max(1, tts_workers)
+        self.render_workers = max(1, render_workers or os.cpu_count() or 1)
+        self.queue_size = queue_size
+        self.script_options = script_options or {}
+        self.render_options = render_options or {}
+        self.completed = []
+        self.failed = []
+        self._results_lock = threading.Lock()
+        self._remaining_parts = {}  # source_name -> parts not yet rendered
+
+    def _record_failure(self, stage, item, error):
+        print(f"\n[{stage}] Failed for {item}: {error}")
+        traceback.print_exc()
+        if isinstance(item, dict):
+            quarantine_job(item, error)
+            item = item['base_name']
+        with self._results_lock:
+            self.failed.append((item, stage, str(error)))
+
+    def _part_completed(self, job):
+        """Mark a split PDF's source job completed once its last part has rendered, as run_pipeline does."""
+        source_name = job['source_name']
+        with self._results_lock:
+            remaining = self._remaining_parts.get(source_name, 1) - 1
+            self._remaining_parts[source_name] = remaining
+        if remaining == 0 and source_name != job['base_name']:
+            JobManifest(source_name).set_status('completed')
+
+    def _start_stage(self, name, worker_count, in_queue, out_queue, next_worker_count, handler_factory):
+        """Start worker threads for one stage and forward stop markers when they finish."""
+
+        def worker():
+            try:
+                handler = handler_factory()
+            except Exception as e:
+                self._record_failure(name, "worker setup", e)
+                handler = None
+            while True:
+                item = in_queue.get()
+                if item is _STOP:
+                    break
+                try:
+                    if handler is None:
+                        raise RuntimeError(f"{name} worker could not be initialized")
+                    result = handler(item)
+                except Exception as e:
+                    self._record_failure(name, item, e)
+                    continue
+                if out_queue is not None:
+                    for next_item in result if isinstance(result, list) else [result]:
+                        out_queue.put(next_item)
+
+        threads = [threading.Thread(target=worker, name=f"{name}-{i}", daemon=True)
+                   for i in range(worker_count)]
+        for thread in threads:
+            thread.start()
+
+        def closer():
+            for thread in threads:
+                thread.join()
+            if out_queue is not None:
+                for _ in range(next_worker_count):
+                    out_queue.put(_STOP)
+
+        closer_thread = threading.Thread(target=closer, name=f"{name}-closer", daemon=True)
+        closer_thread.start()
+        return closer_thread
+
+    def run(self, pdf_paths):
+        """Process all PDFs and return (completed, failed) lists."""
+        pdf_paths = list(pdf_paths)
+        print(f"Starting batch of {len(pdf_paths)} PDFs "
+              f"(script={self.script_workers}, tts={self.tts_workers}, render={self.render_workers})")
+
+        script_queue = queue.Queue()
+        tts_queue = queue.Queue(maxsize=self.queue_size)
+        render_queue = queue.Queue(maxsize=self.queue_size)
+
+        for pdf_path in pdf_paths:
+            script_queue.put(create_job(pdf_path))
+        for _ in range(self.script_workers):
+            script_queue.put(_STOP)
+
+        # Spawn rather than fork: the stage threads are already running, and a forked child
+        # can inherit a lock one of them held and deadlock
+        render_context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.render_workers, mp_context=render_context) as render_pool:
+
+            def script_handler_factory():
+                def handler(job):
+                    execute_stage(SCRIPT_STAGE, job, **self.script_options)
+                    part_jobs = expand_parts(job)
+                    with self._results_lock:
+                        self._remaining_parts[job['source_name']] = len(part_jobs)
+                    return part_jobs
+                return handler
+
+            def tts_handler_factory():
+                tts_controller = TTSController(use_cache=self.script_options.get('use_cache', True))
+                def handler(job):
+                    execute_stage(TTS_STAGE, job, tts_controller=tts_controller)
+                    return job
+                return handler
+
+            def render_handler_factory():
+                def handler(job):
+                    render_pool.submit(execute_stage, RENDER_STAGE, job, **self.render_options).result()
+                    JobManifest(job['base_name']).set_status('completed')
+                    self._part_completed(job)
+                    output_path = get_output_paths(job['base_name'])['output_video_path']
+                    with self._results_lock:
+                        self.completed.append((job['base_name'], output_path))
+                    print(f"\n== Successfully processed {job['base_name']} ==")
+                    return output_path
+                return handler
+
+            closers = [
+                self._start_stage("script", self.script_workers, script_queue, tts_queue,
+                                  self.tts_workers, script_handler_factory),
+                self._start_stage("tts", self.tts_workers, tts_queue, render_queue,
+                                  self.render_workers, tts_handler_factory),
+                self._start_stage("render", self.render_workers, render_queue, None,
+                                  0, render_handler_factory),
+            ]
+            for closer in closers:
+                closer.join()
+
+        print(f"\nBatch finished: {len(self.completed)} succeeded, {len(self.failed)} failed")
+        return self.completed, self.failed
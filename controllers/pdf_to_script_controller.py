@@ -1,9 +1,130 @@
 import os
 import json
-from modules.gemini_api import PDFProcessor
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from modules.llm_router import create_processor, get_model_name
+from modules.disk_cache import DiskCache
+from modules.file_utils import sha256_file
+from modules.pdf_text_extractor import extract_pdf_text, has_usable_text
+from modules.pdf_splitter import split_pdf
+from modules.rate_limiter import RateLimiter
+from modules.json_repair import parse_script_response, ScriptValidationError
 
+SCRIPT_CACHE_FOLDER = os.path.join("cache", "scripts")
+SCRIPT_CACHE_MAX_BYTES = 200 * 1024 * 1024
+SCRIPT_CACHE_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+CHUNKS_FOLDER = "chunks"
+REPAIR_PROMPT = ("The text above was meant to be a JSON object with a string field \"title\" and a string "
+                 "field \"script\", but it is not valid JSON. Return only that JSON object, corrected, "
+                 "with the same content and no other text.")
 
-def convert_pdf_to_script(pdf_path, prompt_path):
+script_cache = DiskCache(SCRIPT_CACHE_FOLDER, max_bytes=SCRIPT_CACHE_MAX_BYTES,
+                         max_age=SCRIPT_CACHE_MAX_AGE, suffix=".json")
+script_rate_limiter = RateLimiter(max_concurrent=3, min_interval=1.0)
+
+
+def script_cache_key(pdf_path, prompt_text, model_name):
+    """Key a script by the PDF bytes, the prompt text and the model that generates it."""
+    digest = hashlib.sha256()
+    for part in (sha256_file(pdf_path), prompt_text, model_name):
+        encoded = part.encode("utf8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def move_to_processed(pdf_path, processed_path):
+    if os.path.abspath(pdf_path) != os.path.abspath(processed_path):
+        os.replace(pdf_path, processed_path)
+        print(f"Moved {os.path.basename(pdf_path)} to processed folder")
+
+
+def save_script(script_json, base_filename, scripts_folder="scripts"):
+    script_filename = f"{base_filename}.json"
+    script_path = os.path.join(scripts_folder, script_filename)
+    with open(script_path, "w", encoding="utf8") as f:
+        json.dump(script_json, f, indent=4, ensure_ascii=False)
+    print(f"Saved script as {script_filename}")
+    return script_path
+
+
+def generate_script(pdf_path, prompt_text, base_filename, use_cache=True, extract_text=False,
+                    scripts_folder="scripts", provider="gemini", hedge=False):
+    """Generate scripts/<base_filename>.json for one PDF, using the script cache when possible."""
+    # Optionally send locally extracted text instead of uploading the PDF
+    document_text = None
+    if extract_text:
+        document_text, page_count = extract_pdf_text(pdf_path)
+        if not has_usable_text(document_text, page_count):
+            print("Extracted text is too sparse (scanned PDF?), uploading the file instead")
+            document_text = None
+
+    model_name = get_model_name(provider)
+    model_key = model_name if document_text is None else f"{model_name}:text"
+    cache_key = script_cache_key(pdf_path, prompt_text, model_key)
+    cached_script = script_cache.get_json(cache_key) if use_cache else None
+
+    if cached_script is not None:
+        print(f"Using cached script for {os.path.basename(pdf_path)}")
+        return save_script(cached_script, base_filename, scripts_folder)
+
+    # Initialize processor and generate script
+    print(f"Processing {pdf_path}...")
+    with script_rate_limiter:
+        processor = create_processor(provider, hedge)
+        if document_text is not None:
+            gpt_response = processor.process_text(document_text, prompt_text)
+        else:
+            gpt_response = processor.process_pdf(pdf_path, prompt_text)
+
+    try:
+        gpt_json = parse_script_response(gpt_response)
+    except ScriptValidationError as e:
+        print(f"Could not repair response locally ({e}), asking the model to fix it...")
+        gpt_json = repair_with_model(processor, gpt_response)
+
+    if gpt_json is None:
+        script_filename = f"{base_filename}_response.txt"
+        script_path = os.path.join(scripts_folder, script_filename)
+
+        with open(script_path, "w", encoding="utf8") as f:
+            f.write(gpt_response)
+        print(f"Saved non-JSON response as {script_filename}")
+        return None
+
+    script_path = save_script(gpt_json, base_filename, scripts_folder)
+    script_cache.put_json(cache_key, gpt_json)
+    return script_path
+
+
+def repair_with_model(processor, gpt_response):
+    """Last resort: send the malformed response back to the model and ask for valid JSON."""
+    try:
+        with script_rate_limiter:
+            repaired = processor.process_text(gpt_response, REPAIR_PROMPT)
+        return parse_script_response(repaired)
+    except Exception as e:
+        print(f"Model repair failed: {e}")
+        return None
+
+
+def build_part_prompt(prompt_text, part_number, part_count):
+    return (f"{prompt_text}\n\nThis PDF is part {part_number} of {part_count} of a longer document. "
+            f"Only cover the content of this part; the script will be posted as part {part_number} "
+            f"of a {part_count}-part series.")
+
+
+def convert_pdf_to_script(pdf_path, prompt_path, use_cache=True, extract_text=False, split_pages=None,
+                          provider="gemini", hedge=False):
+    """Generate the script(s) for a PDF and return the base names of the scripts written.
+
+    When split_pages is set, documents longer than that are split into page-range
+    parts (at outline boundaries where possible) whose scripts are generated
+    concurrently as <name>_part01.json, <name>_part02.json, ...
+
+    provider selects the LLM backend: "gemini", "openai", or "router" to fail
+    over between them (and hedge slow requests when hedge is set).
+    """
     processed_path = None
     try:
         # Ensure folders exist
@@ -19,41 +140,34 @@ def convert_pdf_to_script(pdf_path, prompt_path):
         with open(prompt_path, "r", encoding="utf8") as f:
             prompt_text = f.read()
 
-        # Initialize processor and generate script
-        print(f"Processing {pdf_path}...")
-        processor = PDFProcessor()
-        gpt_response = processor.process_pdf(pdf_path, prompt_text)
-
-        # Remove code block markers if present
-        if gpt_response.startswith("```"):
-            gpt_response = gpt_response.replace("```json", "").replace("```", "")
+        parts = split_pdf(pdf_path, CHUNKS_FOLDER, split_pages) if split_pages else []
 
-        try:
-            # Attempt to parse response as JSON
-            gpt_json = json.loads(gpt_response)
-            script_filename = f"{base_filename}.json"
-            script_path = os.path.join(scripts_folder, script_filename)
-
-            with open(script_path, "w", encoding="utf8") as f:
-                json.dump(gpt_json, f, indent=4, ensure_ascii=False)
-            print(f"Saved script as {script_filename}")
-
-        except json.JSONDecodeError:
-            script_filename = f"{base_filename}_response.txt"
-            script_path = os.path.join(scripts_folder, script_filename)
-
-            with open(script_path, "w", encoding="utf8") as f:
-                f.write(gpt_response)
-            print(f"Saved non-JSON response as {script_filename}")
+        if not parts:
+            generate_script(pdf_path, prompt_text, base_filename, use_cache, extract_text, scripts_folder,
+                            provider, hedge)
+            part_names = [base_filename]
+        else:
+            print(f"Split {os.path.basename(pdf_path)} into {len(parts)} parts")
+            with ThreadPoolExecutor(max_workers=len(parts)) as executor:
+                futures = [
+                    executor.submit(generate_script, part_path,
+                                    build_part_prompt(prompt_text, index, len(parts)),
+                                    part_name, use_cache, extract_text, scripts_folder, provider, hedge)
+                    for index, (part_name, part_path) in enumerate(parts, 1)
+                ]
+                for future in futures:
+                    future.result()
+            part_names = [part_name for part_name, _ in parts]
 
         # Move processed PDF
-        os.rename(pdf_path, processed_path)
-        print(f"Moved {os.path.basename(pdf_path)} to processed folder")
+        move_to_processed(pdf_path, processed_path)
+        return part_names
 
     except Exception as e:
         print(f"Failed to process {pdf_path}: {e}")
-        if processed_path and os.path.exists(processed_path):
+        if processed_path and os.path.exists(processed_path) and not os.path.exists(pdf_path):
             try:
                 os.rename(processed_path, pdf_path)
             except Exception as restore_error:
                 print(f"Failed to restore PDF file: {restore_error}")
+        raise
@@ -0,0 +1,333 @@
+import os
+import shutil
+import time
+from controllers.pdf_to_script_controller import convert_pdf_to_script, move_to_processed
+from controllers.tts_controller import TTSController
+from controllers.video_controller import VideoController
+from controllers.streaming_controller import stream_pdf_to_script_and_audio
+from modules.ffmpeg_utils import probe_duration
+from modules.footage_allocator import FootageAllocator
+from modules.job_manifest import JobManifest
+from modules.subtitles import relayout_subtitles
+
+PROMPT_FILE = "prompts/brainrot.txt"
+# Extra footage leased beyond the TTS audio length, covering AAC priming and padding
+FOOTAGE_MARGIN = 1.0
+PROCESSED_FOLDER = "processed"
+QUARANTINE_FOLDER = "quarantine"
+
+SCRIPT_STAGE = "script"
+TTS_STAGE = "tts"
+RENDER_STAGE = "render"
+
+
+class StageFailedError(RuntimeError):
+    """Raised when a pipeline stage exhausts its retries."""
+
+    def __init__(self, stage_name, base_name, error):
+        super().__init__(f"Stage '{stage_name}' failed for {base_name}: {error}")
+        self.stage_name = stage_name
+        self.base_name = base_name
+
+
+def get_output_paths(base_name):
+    """Return every artifact path produced for a given base name."""
+    return {
+        'script_path': os.path.join("scripts", f"{base_name}.json"),
+        'audio_path': os.path.join("audio", f"{base_name}.mp3"),
+        'srt_path': os.path.join("audio", "subtitles", f"{base_name}.srt"),
+        'marks_path': os.path.join("audio", "marks", f"{base_name}.json"),
+        'output_video_path': os.path.join("output", f"{base_name}_final.mp4")
+    }
+
+
+def resolve_pdf_path(pdf_path):
+    """Find a PDF in its original location or in the processed folder it is moved to."""
+    if os.path.exists(pdf_path):
+        return pdf_path
+    processed_path = os.path.join(PROCESSED_FOLDER, os.path.basename(pdf_path))
+    if os.path.exists(processed_path):
+        return processed_path
+    return pdf_path
+
+
+def run_script_stage(pdf_path, prompt_file=PROMPT_FILE, use_cache=True, extract_text=False, split_pages=None,
+                     provider="gemini", hedge=False):
+    """Generate the script(s) for a PDF and return the base name of every part."""
+    part_names = convert_pdf_to_script(os.path.abspath(pdf_path), os.path.abspath(prompt_file),
+                                       use_cache=use_cache, extract_text=extract_text,
+                                       split_pages=split_pages, provider=provider, hedge=hedge)
+    if not part_names:
+        raise RuntimeError(f"Script generation failed for {os.path.basename(pdf_path)}")
+
+    for part_name in part_names:
+        script_path = get_output_paths(part_name)['script_path']
+        if not os.path.exists(script_path):
+            raise RuntimeError(f"Script generation failed: {script_path} was not created")
+    return part_names
+
+
+def run_tts_stage(base_name, tts_controller=None, use_cache=True):
+    """Generate audio and subtitles for an existing script."""
+    paths = get_output_paths(base_name)
+    tts_controller = tts_controller or TTSController(use_cache=use_cache)
+    try:
+        result = tts_controller.process_script(paths['script_path'])
+        print(f"Audio generated: {result['audio_path']}")
+        print(f"Subtitles generated: {result['subtitle_path']}")
+    except Exception as e:
+        raise RuntimeError(f"TTS processing failed: {str(e)}")
+    return base_name
+
+
+def run_render_stage(base_name, video_controller=None, footage_allocator=None):
+    """Render the final video for an existing audio/subtitle pair over freshly leased background footage."""
+    paths = get_output_paths(base_name)
+
+    if not os.path.exists(paths['srt_path']):
+        relayout_subtitles(base_name)
+
+    video_controller = video_controller or VideoController()
+    footage_allocator = footage_allocator or FootageAllocator()
+    lease = footage_allocator.lease(probe_duration(paths['audio_path']) + FOOTAGE_MARGIN, holder=base_name)
+    try:
+        final_video_path = video_controller.process_segment(
+            os.path.abspath(lease['path']),
+            os.path.abspath(paths['audio_path']),
+            os.path.abspath(paths['srt_path']),
+            os.path.abspath(paths['output_video_path']),
+            lease['start']
+        )
+    except Exception as e:
+        raise RuntimeError(f"Video processing failed: {str(e)}")
+    finally:
+        footage_allocator.release(lease['id'])
+
+    print(f"\nFinal video created successfully: {final_video_path}")
+    return final_video_path
+
+
+def run_streaming_script_stage(job, prompt_file=PROMPT_FILE, use_cache=True, tts_controller=None):
+    """Generate the script and its audio together, voicing sentences while the model is still writing.
+
+    When audio was produced the TTS stage is recorded as complete too, so the
+    pipeline skips it.
+    """
+    pdf_path = resolve_pdf_path(job['pdf_path'])
+    result = stream_pdf_to_script_and_audio(os.path.abspath(pdf_path), os.path.abspath(prompt_file),
+                                            tts_controller=tts_controller, use_cache=use_cache)
+    if result['tts_result'] is not None:
+        tts_stage = PIPELINE_STAGES[TTS_STAGE]
+        JobManifest(job['base_name']).mark_stage_complete(
+            TTS_STAGE, tts_stage['inputs'](job), tts_stage['outputs'](job)
+        )
+    return [job['base_name']]
+
+
+def _script_runner(job, prompt_file=PROMPT_FILE, use_cache=True, extract_text=False, split_pages=None,
+                   stream=False, provider="gemini", hedge=False, tts_controller=None, **kwargs):
+    if stream and provider == "gemini" and not split_pages and not extract_text:
+        return run_streaming_script_stage(job, prompt_file, use_cache, tts_controller)
+    return run_script_stage(resolve_pdf_path(job['pdf_path']), prompt_file, use_cache, extract_text, split_pages,
+                            provider, hedge)
+
+
+def _tts_runner(job, tts_controller=None, use_cache=True, **kwargs):
+    return run_tts_stage(job['base_name'], tts_controller, use_cache)
+
+
+def _render_runner(job, video_controller=None, render_backend="moviepy", render_profile=None, render_chunks=None,
+                   render_cores=None, **kwargs):
+    video_controller = video_controller or VideoController(backend=render_backend, profile=render_profile,
+                                                           chunks=render_chunks, cores=render_cores)
+    return run_render_stage(job['base_name'], video_controller=video_controller)
+
+
+def _script_inputs(job):
+    return {'pdf': resolve_pdf_path(job['pdf_path']), 'prompt': PROMPT_FILE}
+
+
+def _script_outputs(job):
+    return {part_name: get_output_paths(part_name)['script_path']
+            for part_name in job.get('parts') or [job['base_name']]}
+
+
+def _restore_parts(job, part_names):
+    job['parts'] = part_names
+
+
+def _archive_source(job):
+    """A skipped script stage never reaches convert_pdf_to_script's move; move the PDF out of input/ here."""
+    if os.path.exists(job['pdf_path']):
+        os.makedirs(PROCESSED_FOLDER, exist_ok=True)
+        move_to_processed(job['pdf_path'], os.path.join(PROCESSED_FOLDER, os.path.basename(job['pdf_path'])))
+
+
+# Stage DAG: each stage declares its upstream stages, the files it reads and the files it writes.
+# 'source' stages run once per PDF; 'part' stages run once per generated script part.
+PIPELINE_STAGES = {
+    SCRIPT_STAGE: {
+        'depends_on': [],
+        'scope': 'source',
+        'runner': _script_runner,
+        'restore': _restore_parts,
+        'skipped': _archive_source,
+        'inputs': _script_inputs,
+        'outputs': _script_outputs
+    },
+    TTS_STAGE: {
+        'depends_on': [SCRIPT_STAGE],
+        'scope': 'part',
+        'runner': _tts_runner,
+        'inputs': lambda job: {'script': get_output_paths(job['base_name'])['script_path']},
+        # The SRT is left out so a subtitle re-layout only invalidates rendering
+        'outputs': lambda job: {
+            'audio': get_output_paths(job['base_name'])['audio_path'],
+            'marks': get_output_paths(job['base_name'])['marks_path']
+        }
+    },
+    RENDER_STAGE: {
+        'depends_on': [TTS_STAGE],
+        'scope': 'part',
+        'runner': _render_runner,
+        'inputs': lambda job: {
+            'audio': get_output_paths(job['base_name'])['audio_path'],
+            'srt': get_output_paths(job['base_name'])['srt_path']
+        },
+        'outputs': lambda job: {'video': get_output_paths(job['base_name'])['output_video_path']}
+    }
+}
+
+
+def stage_order(stages=PIPELINE_STAGES):
+    """Topologically sort the stage DAG."""
+    ordered = []
+    visiting = set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f"Cycle in pipeline stages at '{name}'")
+        visiting.add(name)
+        for dependency in stages[name]['depends_on']:
+            visit(dependency)
+        visiting.discard(name)
+        ordered.append(name)
+
+    for stage_name in stages:
+        visit(stage_name)
+    return ordered
+
+
+def create_job(pdf_path):
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return {'pdf_path': pdf_path, 'source_name': base_name, 'base_name': base_name}
+
+
+def expand_parts(job):
+    """Return one job per script part produced by the script stage."""
+    return [dict(job, base_name=part_name, parts=None) for part_name in job.get('parts') or [job['base_name']]]
+
+
+def get_stage_manifest(stage_name, job):
+    scope = PIPELINE_STAGES[stage_name]['scope']
+    return JobManifest(job['source_name'] if scope == 'source' else job['base_name'])
+
+
+def cleanup_stage_outputs(stage_name, job):
+    """Remove partial outputs of a single stage before retrying it."""
+    for path in PIPELINE_STAGES[stage_name]['outputs'](job).values():
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+                print(f"Cleaned up: {path}")
+            except Exception as e:
+                print(f"Failed to clean up {path}: {str(e)}")
+
+
+def execute_stage(stage_name, job, max_retries=3, retry_delay=5, **runner_kwargs):
+    """Run one stage unless the manifest shows it already completed with matching artifacts.
+
+    Returns the stage runner's result (recorded in the manifest, so skipped stages return it too).
+    """
+    stage = PIPELINE_STAGES[stage_name]
+    manifest = get_stage_manifest(stage_name, job)
+
+    for dependency in stage['depends_on']:
+        if get_stage_manifest(dependency, job).get_stage(dependency).get('status') != 'completed':
+            raise StageFailedError(stage_name, job['base_name'], f"upstream stage '{dependency}' has not completed")
+
+    recorded = manifest.get_stage(stage_name)
+    if 'result' in recorded and stage.get('restore'):
+        stage['restore'](job, recorded['result'])
+
+    if manifest.is_stage_complete(stage_name, stage['inputs'](job), stage['outputs'](job)):
+        print(f"Skipping {stage_name} for {job['base_name']} (already completed)")
+        if stage.get('skipped'):
+            stage['skipped'](job)
+        return recorded.get('result')
+
+    retries = 0
+    while True:
+        try:
+            result = stage['runner'](job, **runner_kwargs)
+            if stage.get('restore'):
+                stage['restore'](job, result)
+            outputs = stage['outputs'](job)
+            missing = [path for path in outputs.values() if not os.path.exists(path)]
+            if missing:
+                raise RuntimeError(f"Stage finished without producing: {', '.join(missing)}")
+            manifest.mark_stage_complete(stage_name, stage['inputs'](job), outputs, result=result)
+            return result
+
+        except Exception as e:
+            retries += 1
+            print(f"\nStage {stage_name} failed for {job['base_name']} (Attempt {retries}/{max_retries}): {str(e)}")
+            if retries >= max_retries:
+                manifest.mark_stage_failed(stage_name, e, retries)
+                raise StageFailedError(stage_name, job['base_name'], e)
+
+            print(f"Cleaning up {stage_name} outputs and retrying in {retry_delay} seconds...")
+            cleanup_stage_outputs(stage_name, job)
+            time.sleep(retry_delay)
+
+
+def quarantine_job(job, error):
+    """Move a PDF that keeps failing out of the way so the rest of the batch can continue."""
+    os.makedirs(QUARANTINE_FOLDER, exist_ok=True)
+    pdf_path = resolve_pdf_path(job['pdf_path'])
+    quarantined_path = os.path.join(QUARANTINE_FOLDER, os.path.basename(pdf_path))
+    if os.path.exists(pdf_path):
+        shutil.move(pdf_path, quarantined_path)
+        print(f"Quarantined {os.path.basename(pdf_path)}")
+
+    JobManifest(job['source_name']).set_status(
+        'quarantined',
+        quarantined_path=quarantined_path,
+        error=str(error)
+    )
+
+
+def run_pipeline(pdf_path, max_retries=3, retry_delay=5, **runner_kwargs):
+    """Run every stage for a PDF, resuming from the last completed stage.
+
+    Returns the output video path of every part.
+    """
+    job = create_job(pdf_path)
+    ordered = stage_order()
+
+    for stage_name in [name for name in ordered if PIPELINE_STAGES[name]['scope'] == 'source']:
+        print(f"\n== Stage: {stage_name} ==")
+        execute_stage(stage_name, job, max_retries, retry_delay, **runner_kwargs)
+
+    output_paths = []
+    for part_job in expand_parts(job):
+        for stage_name in [name for name in ordered if PIPELINE_STAGES[name]['scope'] == 'part']:
+            print(f"\n== Stage: {stage_name} ({part_job['base_name']}) ==")
+            execute_stage(stage_name, part_job, max_retries, retry_delay, **runner_kwargs)
+        JobManifest(part_job['base_name']).set_status('completed')
+        output_paths.append(get_output_paths(part_job['base_name'])['output_video_path'])
+
+    JobManifest(job['source_name']).set_status('completed')
+    return output_paths
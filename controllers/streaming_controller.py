@@ -0,0 +1,110 @@
+import os
+from controllers.pdf_to_script_controller import (
+    script_cache, script_cache_key, script_rate_limiter, save_script, move_to_processed, repair_with_model
+)
+from controllers.tts_controller import TTSController
+from modules.llm_router import create_processor, get_model_name
+from modules.script_stream_parser import ScriptStreamParser
+from modules.json_repair import parse_script_response, ScriptValidationError
+
+
+def batch_sentences(chunks, parser, first_batch_size=2, batch_size=6, max_chars=1500):
+    """Group sentences from a streamed response into TTS batches.
+
+    The first batch is kept small so synthesis starts as early as possible;
+    later batches are larger to keep the number of Polly calls down.
+    """
+    batch = []
+    size = first_batch_size
+    for chunk in chunks:
+        for sentence in parser.feed(chunk):
+            batch.append(sentence)
+            if len(batch) >= size or sum(len(s) for s in batch) >= max_chars:
+                yield batch
+                batch = []
+                size = batch_size
+
+    batch.extend(parser.finish())
+    if batch:
+        yield batch
+
+
+def rate_limited_stream(start_stream, limiter=script_rate_limiter):
+    """Yield from start_stream() while holding a limiter slot, released as soon as the stream ends.
+
+    Synthesis of the last sentences happens after that, so it does not keep
+    an LLM slot busy.
+    """
+    with limiter:
+        yield from start_stream()
+
+
+def stream_pdf_to_script_and_audio(pdf_path, prompt_path, tts_controller=None, use_cache=True):
+    """Stream the script from Gemini and voice it sentence by sentence while it is generated.
+
+    Returns a dict with the script path and, if the script was streamed and
+    voiced as saved, the audio/subtitle result. Otherwise (a cached script, a
+    TTS failure, or a script the model had to repair) the result has no audio
+    and the regular TTS stage picks the script up.
+    """
+    processed_folder = "processed"
+    scripts_folder = "scripts"
+    os.makedirs(processed_folder, exist_ok=True)
+    os.makedirs(scripts_folder, exist_ok=True)
+
+    processed_path = os.path.join(processed_folder, os.path.basename(pdf_path))
+    base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
+
+    with open(prompt_path, "r", encoding="utf8") as f:
+        prompt_text = f.read()
+
+    cache_key = script_cache_key(pdf_path, prompt_text, get_model_name("gemini"))
+    cached_script = script_cache.get_json(cache_key) if use_cache else None
+    if cached_script is not None:
+        print(f"Using cached script for {os.path.basename(pdf_path)}")
+        script_path = save_script(cached_script, base_filename, scripts_folder)
+        move_to_processed(pdf_path, processed_path)
+        return {'script_path': script_path, 'tts_result': None}
+
+    tts_controller = tts_controller or TTSController(use_cache=use_cache)
+    parser = ScriptStreamParser()
+
+    print(f"Streaming {pdf_path}...")
+    chunks = rate_limited_stream(lambda: create_processor("gemini").stream_pdf(pdf_path, prompt_text))
+    try:
+        tts_result = tts_controller.process_sentence_stream(batch_sentences(chunks, parser), base_filename)
+    except Exception as e:
+        # Keep the script even if TTS failed: read the rest of the stream so the regular TTS
+        # stage can voice it, instead of a retry of this stage paying for the script again
+        for chunk in chunks:
+            parser.feed(chunk)
+        if not parser.done:
+            raise
+        print(f"Streaming TTS failed ({e}), keeping the script for the TTS stage")
+        tts_result = None
+    finally:
+        chunks.close()
+
+    gpt_response = parser.raw.strip()
+
+    try:
+        gpt_json = parse_script_response(gpt_response)
+    except ScriptValidationError as e:
+        print(f"Could not repair response locally ({e}), asking the model to fix it...")
+        gpt_json = repair_with_model(create_processor("gemini"), gpt_response)
+
+    if gpt_json is None:
+        response_path = os.path.join(scripts_folder, f"{base_filename}_response.txt")
+        with open(response_path, "w", encoding="utf8") as f:
+            f.write(gpt_response)
+        raise RuntimeError(f"Streamed response was not valid JSON, saved as {response_path}")
+
+    if tts_result is not None and gpt_json['script'].split() != parser.script.split():
+        # The script was repaired into different text than was voiced, so the audio has to be redone
+        print("Saved script differs from the streamed text, leaving the audio to the TTS stage")
+        tts_result = None
+
+    script_path = save_script(gpt_json, base_filename, scripts_folder)
+    script_cache.put_json(cache_key, gpt_json)
+    move_to_processed(pdf_path, processed_path)
+    return {'script_path': script_path, 'tts_result': tts_result}
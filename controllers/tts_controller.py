@@ -3,8 +3,8 @@ from modules.tts_converter import PollyTTS
 
 
 class TTSController:
-    def __init__(self):
-        self.tts_converter = PollyTTS()
+    def __init__(self, use_cache=True):
+        self.tts_converter = PollyTTS(use_cache=use_cache)
 
     def process_script(self, script_path):
         """Process a script file to generate audio and subtitles."""
@@ -27,3 +27,19 @@ class TTSController:
             print(f"Failed to process script: {str(e)}")
             raise
 
+    def process_sentence_stream(self, sentence_batches, base_name):
+        """Generate audio and subtitles from sentence batches while the script is still being written."""
+        try:
+            print(f"Streaming sentences to TTS for: {base_name}")
+
+            result = self.tts_converter.convert_sentence_stream_to_audio(sentence_batches, base_name)
+
+            print(f"Successfully generated:")
+            print(f"- Audio: {result['audio_path']}")
+            print(f"- Subtitles: {result['subtitle_path']}")
+
+            return result
+
+        except Exception as e:
+            print(f"Failed to process sentence stream: {str(e)}")
+            raise
@@ -2,21 +2,22 @@ import os
 from modules.video_processor import VideoProcessor
 
 class VideoController:
-    def __init__(self):
-        self.processor = VideoProcessor()
+    def __init__(self, audio_format="aac", backend="moviepy", profile=None, chunks=None, cores=None):
+        self.processor = VideoProcessor(audio_format=audio_format, backend=backend, profile=profile,
+                                        chunks=chunks, cores=cores)
 
-    def process_segment(self, video_path, audio_path, srt_path, output_path):
+    def process_segment(self, video_path, audio_path, srt_path, output_path, start_time=0):
         try:
             if not all(os.path.exists(p) for p in [video_path, audio_path, srt_path]):
                 raise FileNotFoundError("One or more input files not found")
 
             print(f"Processing video segment...")
-            print(f"Video: {video_path}")
+            print(f"Video: {video_path} from {start_time:.1f}s")
             print(f"Audio: {audio_path}")
             print(f"Subtitles: {srt_path}")
             print(f"Output: {output_path}")
 
-            result_path = self.processor.process_video(video_path, audio_path, srt_path, output_path)
+            result_path = self.processor.process_video(video_path, audio_path, srt_path, output_path, start_time)
             print(f"Successfully created video segment: {result_path}")
 
             return result_path
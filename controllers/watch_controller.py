@@ -0,0 +1,234 @@
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from controllers.pipeline_controller import run_pipeline, quarantine_job, create_job
+from controllers.tts_controller import TTSController
+from controllers.video_controller import VideoController
+from modules.state_store import state_store
+
+_STOP = object()
+
+
+def start_observer(folder, callback):
+    """Call callback(path) on file events in folder via watchdog (inotify on Linux); None if not installed."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if not event.is_directory:
+                callback(getattr(event, "dest_path", None) or event.src_path)
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=False)
+    observer.start()
+    return observer
+
+
+class WatchController:
+    """Long-running service that renders every PDF dropped into the input folder.
+
+    API clients (Polly, S3, Gemini/OpenAI), the font and caption caches and the
+    state database connection are created once and reused by every job, so a
+    new upload goes straight to the model call. Files are picked up via
+    watchdog when it is installed and by polling otherwise, and only once their
+    size has stopped changing, so half-copied uploads are not read. A small
+    JSON status endpoint reports queued, running and recently finished jobs.
+    """
+
+    def __init__(self, input_folder="input", workers=1, poll_interval=0.25, settle_time=0.5, status_port=8765,
+                 script_options=None, render_options=None):
+        self.input_folder = input_folder
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.status_port = status_port
+        self.script_options = script_options or {}
+        render_options = render_options or {}
+        self.tts_controller = TTSController(use_cache=self.script_options.get('use_cache', True))
+        self.video_controller = VideoController(
+            backend=render_options.get('render_backend', "moviepy"),
+            profile=render_options.get('render_profile'),
+            chunks=render_options.get('render_chunks'),
+            cores=render_options.get('render_cores')
+        )
+        self.jobs = queue.Queue()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.candidates = {}  # path -> (size, mtime, first seen unchanged at)
+        self.queued = []
+        self.running = {}
+        self.finished = {}  # path -> (size, mtime) when processed, so a file left behind is not rerun
+        self.recent = deque(maxlen=100)
+        self.counts = {'completed': 0, 'failed': 0}
+        self.started_at = time.time()
+        self.mode = "polling"
+        self.server = None
+
+    def notice(self, path):
+        in_folder = os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.input_folder)
+        if in_folder and path.lower().endswith(".pdf"):
+            with self.lock:
+                self.candidates.setdefault(path, None)
+
+    def scan(self):
+        for entry in os.scandir(self.input_folder):
+            if entry.is_file():
+                self.notice(entry.path)
+
+    def enqueue_settled(self):
+        """Queue candidates whose size and mtime have not changed for settle_time seconds."""
+        now = time.time()
+        with self.lock:
+            for path, seen in list(self.candidates.items()):
+                if path in self.queued or path in self.running:
+                    del self.candidates[path]
+                    continue
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    del self.candidates[path]
+                    continue
+                signature = (stat.st_size, stat.st_mtime)
+                if self.finished.get(path) == signature:
+                    del self.candidates[path]
+                elif seen is None or seen[:2] != signature:
+                    self.candidates[path] = signature + (now,)
+                elif now - seen[2] >= self.settle_time and stat.st_size > 0:
+                    del self.candidates[path]
+                    self.queued.append(path)
+                    self.jobs.put(path)
+                    print(f"Queued {os.path.basename(path)}")
+
+    def watch(self):
+        observer = start_observer(self.input_folder, self.notice)
+        self.mode = "inotify" if observer else "polling"
+        print(f"Watching {self.input_folder}/ ({'watchdog' if observer else 'polling'})")
+        last_scan = 0
+        try:
+            while not self.stop_event.is_set():
+                # With watchdog a slow rescan only catches events missed while busy
+                if observer is None or time.time() - last_scan > 30:
+                    self.scan()
+                    last_scan = time.time()
+                self.enqueue_settled()
+                self.stop_event.wait(self.poll_interval)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def process(self, pdf_path):
+        name = os.path.basename(pdf_path)
+        with self.lock:
+            if pdf_path not in self.queued:
+                return  # dropped from the queue at shutdown
+            self.queued.remove(pdf_path)
+            if not os.path.exists(pdf_path):
+                return
+            stat = os.stat(pdf_path)
+            self.running[pdf_path] = {'pdf': name, 'started_at': time.time()}
+        record = {'pdf': name, 'started_at': time.time()}
+        try:
+            print(f"\n{'=' * 50}\nProcessing {name}\n{'=' * 50}")
+            outputs = run_pipeline(pdf_path, tts_controller=self.tts_controller,
+                                   video_controller=self.video_controller, **self.script_options)
+            record.update(status='completed', outputs=outputs)
+            print(f"\n== Successfully processed {name} ==")
+        except Exception as e:
+            traceback.print_exc()
+            print(f"\nGiving up on {name}: {str(e)}")
+            quarantine_job(create_job(pdf_path), e)
+            record.update(status='failed', error=str(e))
+        record['finished_at'] = time.time()
+        with self.lock:
+            del self.running[pdf_path]
+            self.finished[pdf_path] = (stat.st_size, stat.st_mtime)
+            self.recent.appendleft(record)
+            self.counts[record['status']] += 1
+
+    def worker(self):
+        while True:
+            pdf_path = self.jobs.get()
+            if pdf_path is _STOP:
+                break
+            self.process(pdf_path)
+
+    def status(self):
+        now = time.time()
+        with self.lock:
+            return {
+                'input_folder': self.input_folder,
+                'mode': self.mode,
+                'workers': self.workers,
+                'uptime': now - self.started_at,
+                'queued': [os.path.basename(path) for path in self.queued],
+                'running': [dict(job, elapsed=now - job['started_at']) for job in self.running.values()],
+                'recent': list(self.recent),
+                'counts': dict(self.counts)
+            }
+
+    def start_status_server(self):
+        controller = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path in ("/", "/status"):
+                    body = controller.status()
+                elif url.path == "/jobs":
+                    body = state_store.list_jobs(parse_qs(url.query).get("status", [None])[0])
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body, indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.status_port), StatusHandler)
+        threading.Thread(target=self.server.serve_forever, name="status-server", daemon=True).start()
+        print(f"Status at http://127.0.0.1:{self.status_port}/status")
+
+    def run(self):
+        """Serve until interrupted; jobs already running are finished before returning."""
+        os.makedirs(self.input_folder, exist_ok=True)
+        if self.status_port:
+            self.start_status_server()
+        threads = [threading.Thread(target=self.worker, name=f"watch-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.watch()
+        except KeyboardInterrupt:
+            print("\nStopping: finishing running jobs...")
+        finally:
+            self.stop_event.set()
+            with self.lock:
+                self.queued.clear()
+            while True:
+                try:
+                    self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+            for _ in threads:
+                self.jobs.put(_STOP)
+            for thread in threads:
+                thread.join()
+            if self.server is not None:
+                self.server.shutdown()
@@ -1,119 +1,159 @@
-from controllers.pdf_to_script_controller import convert_pdf_to_script
-from controllers.tts_controller import TTSController
-from controllers.video_controller import VideoController
+from controllers.pipeline_controller import run_pipeline, quarantine_job, create_job
+from controllers.batch_controller import BatchController
+from controllers.watch_controller import WatchController
+from modules.video_processor import OUTPUT_PROFILES
+import argparse
 import os
-import time
 import sys
 
 
-def process_pdf_to_video(pdf_path):
-    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
-
-    # Define all output paths
-    script_path = os.path.join("scripts", f"{base_name}.json")
-    audio_path = os.path.join("audio", f"{base_name}.mp3")
-    srt_path = os.path.join("audio", "subtitles", f"{base_name}.srt")
-    output_video_path = os.path.join("output", f"{base_name}_final.mp4")
-
+def process_pdf_to_video(pdf_path, **script_options):
     print(f"Processing PDF: {pdf_path}")
+    return run_pipeline(pdf_path, **script_options)
 
-    # Step 1: Convert PDF to script
-    print("\n== Converting PDF to Script ==")
-    prompt_file = "prompts/brainrot.txt"
-    convert_pdf_to_script(os.path.abspath(pdf_path), os.path.abspath(prompt_file))
-
-    # Step 2: Process script through TTS
-    print("\n== Converting Script to Audio ==")
-    tts_controller = TTSController()
-    try:
-        result = tts_controller.process_script(script_path)
-        print(f"Audio generated: {result['audio_path']}")
-        print(f"Subtitles generated: {result['subtitle_path']}")
-    except Exception as e:
-        raise RuntimeError(f"TTS processing failed: {str(e)}")
-
-    # Step 3: Create video
-    print("\n== Creating Final Video ==")
-    video_controller = VideoController()
-    background_video_path = "videos/minecraft/edited_1 hour 22 minutes of relaxing Minecraft Parkour (60fps, Scenic, Download in the Description).mp4"
-
-    if not os.path.exists(background_video_path):
-        raise FileNotFoundError(f"Background video not found: {background_video_path}")
-
-    try:
-        final_video_path = video_controller.process_segment(
-            os.path.abspath(background_video_path),
-            os.path.abspath(audio_path),
-            os.path.abspath(srt_path),
-            os.path.abspath(output_video_path)
-        )
-        print(f"\nFinal video created successfully: {final_video_path}")
-        return final_video_path
-
-    except Exception as e:
-        raise RuntimeError(f"Video processing failed: {str(e)}")
-
-
-def cleanup_failed_outputs(base_name):
-    """Clean up any partially created files from failed processing"""
-    paths_to_cleanup = [
-        os.path.join("scripts", f"{base_name}.json"),
-        os.path.join("audio", f"{base_name}.mp3"),
-        os.path.join("audio", "subtitles", f"{base_name}.srt"),
-        os.path.join("output", f"{base_name}_final.mp4")
-    ]
-
-    for path in paths_to_cleanup:
-        if os.path.exists(path):
-            try:
-                os.remove(path)
-                print(f"Cleaned up: {path}")
-            except Exception as e:
-                print(f"Failed to clean up {path}: {str(e)}")
+
+def run_batch(args):
+    input_folder = "input"
+    pdf_paths = [os.path.join(input_folder, filename) for filename in sorted(os.listdir(input_folder))
+                 if filename.lower().endswith('.pdf')]
+
+    batch = BatchController(
+        script_workers=args.script_workers,
+        tts_workers=args.tts_workers,
+        render_workers=args.render_workers,
+        script_options=get_script_options(args),
+        render_options=get_render_options(args)
+    )
+    completed, failed = batch.run(pdf_paths)
+
+    for base_name, out_path in completed:
+        print(f"- {base_name} -> {out_path}")
+    if failed:
+        print("\nFailed:")
+        for item, stage, error in failed:
+            print(f"- {item} ({stage}): {error}")
+        sys.exit(1)
+
+
+def run_watch(args):
+    WatchController(
+        workers=args.watch_workers,
+        status_port=args.status_port,
+        script_options=get_script_options(args),
+        render_options=get_render_options(args)
+    ).run()
+
+
+def get_script_options(args):
+    return {
+        'use_cache': not args.no_cache,
+        'extract_text': args.extract_text,
+        'split_pages': args.split_pages,
+        'stream': args.stream,
+        'provider': args.provider,
+        'hedge': args.hedge
+    }
+
+
+def get_render_options(args):
+    cores = os.cpu_count() or 1
+    # In batch and watch mode the cores are shared between the workers that render at the same time
+    render_cores = None
+    if args.batch:
+        render_cores = max(1, cores // (args.render_workers or cores))
+    elif args.watch:
+        render_cores = max(1, cores // max(1, args.watch_workers))
+    return {
+        'render_backend': args.render_backend,
+        'render_profile': args.profile,
+        'render_chunks': args.render_chunks,
+        'render_cores': render_cores
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert PDFs in input/ to TikTok-style videos.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Pipeline all PDFs with one worker pool per stage")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and process PDFs as soon as they appear in input/")
+    parser.add_argument("--watch-workers", type=int, default=1,
+                        help="PDFs processed at the same time in --watch mode")
+    parser.add_argument("--status-port", type=int, default=8765,
+                        help="Port of the local JSON status endpoint in --watch mode (0 disables it)")
+    parser.add_argument("--script-workers", type=int, default=2)
+    parser.add_argument("--tts-workers", type=int, default=2)
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Render processes (defaults to the number of CPU cores)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Ignore cached scripts and TTS audio and always call the model and Polly")
+    parser.add_argument("--extract-text", action="store_true",
+                        help="Send locally extracted PDF text to the model instead of uploading the file")
+    parser.add_argument("--split-pages", type=int, default=None,
+                        help="Split PDFs longer than this many pages into a multi-part video series")
+    parser.add_argument("--stream", action="store_true",
+                        help="Start TTS on completed sentences while the script is still being generated")
+    parser.add_argument("--provider", choices=["gemini", "openai", "router"], default="gemini",
+                        help="LLM backend; 'router' fails over between Gemini and OpenAI")
+    parser.add_argument("--hedge", action="store_true",
+                        help="With --provider router, also ask the next provider when the first is slower than usual")
+    parser.add_argument("--render-backend", choices=["moviepy", "ffmpeg"], default="moviepy",
+                        help="'ffmpeg' burns in subtitles in a single ffmpeg run instead of compositing in Python")
+    parser.add_argument("--profile", choices=sorted(OUTPUT_PROFILES), default=None,
+                        help="Output size and frame rate (default: background footage size at 24fps)")
+    parser.add_argument("--render-chunks", type=int, default=None,
+                        help="Render each video in this many parallel chunks (default: from core count and length)")
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
+
     # Create necessary directories
     for directory in ["input", "scripts", "audio", os.path.join("audio", "subtitles"), "output"]:
         os.makedirs(directory, exist_ok=True)
 
+    if args.watch:
+        run_watch(args)
+        return
+
+    if args.batch:
+        run_batch(args)
+        return
+
     input_folder = "input"
     processed_files = []
-    max_retries = 3
-    retry_delay = 5  # seconds
+    failed_files = []
 
     # Process all PDF files in input folder
     for filename in os.listdir(input_folder):
         if filename.lower().endswith('.pdf'):
             pdf_path = os.path.join(input_folder, filename)
-            base_name = os.path.splitext(filename)[0]
 
             print(f"\n{'=' * 50}")
             print(f"Processing {filename}")
             print(f"{'=' * 50}")
 
-            retries = 0
-            while retries < max_retries:
-                try:
-                    output_path = process_pdf_to_video(pdf_path)
+            try:
+                output_paths = process_pdf_to_video(pdf_path, **get_script_options(args), **get_render_options(args))
+                for output_path in output_paths:
                     processed_files.append((filename, output_path))
-                    print(f"\n== Successfully processed {filename} ==")
-                    break
-
-                except Exception as e:
-                    retries += 1
-                    print(f"\nError processing {filename} (Attempt {retries}/{max_retries}): {str(e)}")
-
-                    if retries < max_retries:
-                        print(f"Cleaning up failed outputs and retrying in {retry_delay} seconds...")
-                        cleanup_failed_outputs(base_name)
-                        time.sleep(retry_delay)
-                    else:
-                        print(f"\nMax retries reached for {filename}. Stopping program.")
-                        print("\nFiles processed before failure:")
-                        for proc_file, out_path in processed_files:
-                            print(f"- {proc_file} -> {out_path}")
-                        sys.exit(1)
+                print(f"\n== Successfully processed {filename} ==")
+
+            except Exception as e:
+                print(f"\nGiving up on {filename}: {str(e)}")
+                quarantine_job(create_job(pdf_path), e)
+                failed_files.append((filename, str(e)))
+
+    print("\nFiles processed:")
+    for proc_file, out_path in processed_files:
+        print(f"- {proc_file} -> {out_path}")
+
+    if failed_files:
+        print("\nFiles quarantined:")
+        for failed_file, error in failed_files:
+            print(f"- {failed_file}: {error}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -1,17 +1,34 @@
-from openai import OpenAI
+from openai import OpenAI, NotFoundError
 import os
 from dotenv import load_dotenv
 import time
+from modules.file_utils import sha256_file
+from modules.state_store import state_store
 
 
 class PDFProcessor:
-    def __init__(self):
+    model_name = "gpt-4o-mini"
+
+    def __init__(self, run_timeout=600, store=None):
         load_dotenv()
         print("Initializing PDFProcessor...")
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.assistant_name = "TikTok Script Generator"
+        self.store = store or state_store
+        self.run_timeout = run_timeout
         print("Initialization complete.")
 
+    def get_assistant_id(self):
+        """Return the assistant ID recorded in the state store, falling back to an account scan."""
+        assistant_id = self.store.get_setting(f"openai_assistant:{self.assistant_name}")
+        if assistant_id:
+            print(f"Using indexed assistant: {assistant_id}")
+            return assistant_id
+
+        assistant = self.get_or_create_assistant()
+        self.store.set_setting(f"openai_assistant:{self.assistant_name}", assistant.id)
+        return assistant.id
+
     def get_or_create_assistant(self):
         """Get existing assistant or create a new one."""
         print("\nChecking for existing assistant...")
@@ -24,29 +41,20 @@ class PDFProcessor:
         assistant = self.client.beta.assistants.create(
             name=self.assistant_name,
             instructions="You are an assistant that generates TikTok scripts from PDFs.",
-            model="gpt-4o-mini",
+            model=self.model_name,
             tools=[{"type": "file_search"}]
         )
         print(f"Created new assistant with ID: {assistant.id}")
         return assistant
 
-    def get_existing_file(self, filename):
-        """Check if file exists in OpenAI storage by filename."""
-        print(f"\nChecking for existing file: {os.path.basename(filename)}")
-        files = self.client.files.list()
-        for file in files.data:
-            if file.filename == os.path.basename(filename):
-                print(f"Found existing file: {file.filename} (ID: {file.id})")
-                return file
-        print("File not found in storage.")
-        return None
-
     def upload_file(self, file_path):
-        """Upload file to OpenAI if it doesn't exist already."""
-        existing_file = self.get_existing_file(file_path)
-        if existing_file:
-            print(f"Using existing file: {os.path.basename(file_path)} (ID: {existing_file.id})")
-            return existing_file
+        """Return the file ID for a PDF, uploading it only if its content hash is not indexed."""
+        file_hash = sha256_file(file_path)
+        upload = self.store.get_upload("openai", file_hash)
+        file_id = upload['remote_id'] if upload else None
+        if file_id:
+            print(f"Using indexed file: {os.path.basename(file_path)} (ID: {file_id})")
+            return file_id
 
         print(f"\nUploading new file: {os.path.basename(file_path)}")
         with open(file_path, "rb") as file:
@@ -54,105 +62,152 @@ class PDFProcessor:
                 file=file,
                 purpose="assistants"
             )
-            print(f"File uploaded successfully. ID: {uploaded_file.id}")
-            return uploaded_file
+        print(f"File uploaded successfully. ID: {uploaded_file.id}")
+        self.store.put_upload("openai", file_hash, uploaded_file.id, file_name=os.path.basename(file_path))
+        return uploaded_file.id
 
-    def process_pdf(self, pdf_path, prompt_text):
-        """Process PDF and generate response."""
+    def add_pdf_message(self, thread_id, pdf_path, prompt_text, file_id):
+        """Attach the PDF to the thread, re-uploading once if the indexed file is gone."""
         try:
-            print("\n" + "=" * 50)
-            print(f"Starting processing of PDF: {os.path.basename(pdf_path)}")
-            print("=" * 50)
-
-            if not os.path.exists(pdf_path):
-                raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+            return self._create_message(thread_id, prompt_text, file_id)
+        except NotFoundError:
+            print(f"Indexed file {file_id} no longer exists, re-uploading...")
+            self.store.delete_upload("openai", sha256_file(pdf_path))
+            return self._create_message(thread_id, prompt_text, self.upload_file(pdf_path))
+
+    def _create_message(self, thread_id, prompt_text, file_id):
+        return self.client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=prompt_text,
+            attachments=[{
+                "file_id": file_id,
+                "tools": [{"type": "file_search"}]
+            }]
+        )
 
-            # Upload file if it doesn't exist
-            uploaded_file = self.upload_file(pdf_path)
+    def start_run(self, thread_id, assistant_id):
+        """Start a run, rebuilding the assistant index entry once if the assistant is gone."""
+        try:
+            return self._create_run(thread_id, assistant_id)
+        except NotFoundError:
+            print(f"Indexed assistant {assistant_id} no longer exists, looking it up again...")
+            self.store.set_setting(f"openai_assistant:{self.assistant_name}", None)
+            return self._create_run(thread_id, self.get_assistant_id())
+
+    def _create_run(self, thread_id, assistant_id):
+        return self.client.beta.threads.runs.create(
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            instructions="Generate a TikTok video script based on this PDF."
+        )
 
-            # Get or create assistant
-            assistant = self.get_or_create_assistant()
+    def wait_for_run(self, thread_id, run, initial_delay=0.5, max_delay=5, backoff=1.5):
+        """Poll a run with exponential backoff until it finishes or run_timeout elapses."""
+        deadline = time.time() + self.run_timeout
+        delay = initial_delay
 
-            # Create thread
-            print("\nCreating new thread...")
-            thread = self.client.beta.threads.create()
-            print(f"Thread created with ID: {thread.id}")
+        print("\nWaiting for assistant to complete...")
+        while True:
+            run = self.client.beta.threads.runs.retrieve(
+                thread_id=thread_id,
+                run_id=run.id
+            )
 
-            # Create message with file attachment
-            print("\nAdding message to thread...")
+            print(f"Run status: {run.status}")
+
+            if run.status == "completed":
+                print("Run completed successfully!")
+                return run
+            elif run.status == "failed":
+                print("Run failed. Getting error details...")
+                print({
+                    "status": run.status,
+                    "last_error": getattr(run, "last_error", None),
+                    "failed_at": getattr(run, "failed_at", None)
+                })
+                run_steps = self.client.beta.threads.runs.steps.list(
+                    thread_id=thread_id,
+                    run_id=run.id
+                )
+                error_details = [step.last_error for step in run_steps.data if hasattr(step, 'last_error')]
+                raise RuntimeError(f"Run failed with details: {error_details}")
+            elif run.status in ["cancelled", "expired"]:
+                raise RuntimeError(f"Run ended with status: {run.status}")
+
+            if time.time() + delay > deadline:
+                raise RuntimeError(f"Run timed out after {self.run_timeout} seconds")
+            time.sleep(delay)
+            delay = min(delay * backoff, max_delay)
+
+    def run_prompt(self, prompt_text, pdf_path=None, file_id=None):
+        """Run the assistant on a new thread and return its reply."""
+        # Get or create assistant
+        assistant_id = self.get_assistant_id()
+
+        # Create thread
+        print("\nCreating new thread...")
+        thread = self.client.beta.threads.create()
+        print(f"Thread created with ID: {thread.id}")
+
+        # Create message, with the file attached when there is one
+        print("\nAdding message to thread...")
+        if file_id:
+            self.add_pdf_message(thread.id, pdf_path, prompt_text, file_id)
+        else:
             self.client.beta.threads.messages.create(
                 thread_id=thread.id,
                 role="user",
-                content=prompt_text,
-                attachments=[{
-                    "file_id": uploaded_file.id,
-                    "tools": [{"type": "file_search"}]
-                }]
+                content=prompt_text
             )
-            print("Message added successfully")
+        print("Message added successfully")
 
-            # Run assistant
-            print("\nStarting assistant run...")
-            run = self.client.beta.threads.runs.create(
-                thread_id=thread.id,
-                assistant_id=assistant.id,
-                instructions="Generate a TikTok video script based on this PDF."
-            )
-            print(f"Run created with ID: {run.id}")
+        # Run assistant
+        print("\nStarting assistant run...")
+        run = self.start_run(thread.id, assistant_id)
+        print(f"Run created with ID: {run.id}")
 
-            # Wait for completion with timeout and better error handling
-            max_retries = 45
-            retry_count = 0
+        self.wait_for_run(thread.id, run)
 
-            print("\nWaiting for assistant to complete...")
-            while retry_count < max_retries:
-                run = self.client.beta.threads.runs.retrieve(
-                    thread_id=thread.id,
-                    run_id=run.id
-                )
+        # Get messages
+        print("\nRetrieving assistant's response...")
+        messages = self.client.beta.threads.messages.list(
+            thread_id=thread.id
+        )
 
-                print(f"Run status: {run.status}")
-
-                if run.status == "completed":
-                    print("Run completed successfully!")
-                    break
-                elif run.status == "failed":
-                    print("Run failed. Getting error details...")
-                    print({
-                        "status": run.status,
-                        "last_error": getattr(run, "last_error", None),
-                        "failed_at": getattr(run, "failed_at", None)
-                    })
-                    run_steps = self.client.beta.threads.runs.steps.list(
-                        thread_id=thread.id,
-                        run_id=run.id
-                    )
-                    error_details = [step.last_error for step in run_steps.data if hasattr(step, 'last_error')]
-                    raise RuntimeError(f"Run failed with details: {error_details}")
-                elif run.status in ["cancelled", "expired"]:
-                    raise RuntimeError(f"Run ended with status: {run.status}")
-
-                retry_count += 1
-                time.sleep(1)
-
-            if retry_count >= max_retries:
-                raise RuntimeError("Run timed out after 30 seconds")
-
-            # Get messages
-            print("\nRetrieving assistant's response...")
-            messages = self.client.beta.threads.messages.list(
-                thread_id=thread.id
-            )
+        # Return the last assistant message
+        for message in messages.data:
+            if message.role == "assistant":
+                print("Response retrieved successfully")
+                return message.content[0].text.value
 
-            # Return the last assistant message
-            for message in messages.data:
-                if message.role == "assistant":
-                    print("Response retrieved successfully")
-                    return message.content[0].text.value
+        print("No assistant response found")
+        return "No response generated."
 
-            print("No assistant response found")
-            return "No response generated."
+    def process_pdf(self, pdf_path, prompt_text):
+        """Process PDF and generate response."""
+        try:
+            print("\n" + "=" * 50)
+            print(f"Starting processing of PDF: {os.path.basename(pdf_path)}")
+            print("=" * 50)
+
+            if not os.path.exists(pdf_path):
+                raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+
+            # Upload file if it isn't indexed already
+            file_id = self.upload_file(pdf_path)
+            return self.run_prompt(prompt_text, pdf_path=pdf_path, file_id=file_id)
+
+        except Exception as e:
+            print(f"\nERROR: {str(e)}")
+            raise RuntimeError(f"Failed to process PDF: {str(e)}")
+
+    def process_text(self, document_text, prompt_text):
+        """Generate a response from locally extracted PDF text instead of an uploaded file."""
+        try:
+            print(f"\nSending {len(document_text)} characters of extracted text")
+            return self.run_prompt(f"PDF content:\n{document_text}\n\n{prompt_text}")
 
         except Exception as e:
             print(f"\nERROR: {str(e)}")
-            raise RuntimeError(f"Failed to process PDF: {str(e)}")
\ No newline at end of file
+            raise RuntimeError(f"Failed to process text: {str(e)}")
@@ -0,0 +1,122 @@
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+
+def _skip_id3v2(data):
+    """Return the offset of the first byte after an ID3v2 tag, if any."""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = ((data[6] & 0x7F) << 21) | ((data[7] & 0x7F) << 14) | ((data[8] & 0x7F) << 7) | (data[9] & 0x7F)
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _parse_frame_header(data, offset):
+    """Return (frame_length, samples, sample_rate) for an MPEG Layer III frame header, or None."""
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[offset + 1] >> 3) & 0x03
+    layer_bits = (data[offset + 1] >> 1) & 0x03
+    if version_bits == 1 or layer_bits != 1:  # reserved version, or not Layer III
+        return None
+    version = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0x03
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+    padding = (data[offset + 2] >> 1) & 0x01
+
+    bitrate = MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    samples = 1152 if version == 1 else 576
+    frame_length = (samples // 8) * bitrate // sample_rate + padding
+    return frame_length, samples, sample_rate
+
+
+def _frames(data):
+    """Yield (offset, frame_length, seconds) for each MPEG frame, skipping ID3 tags."""
+    offset = _skip_id3v2(data)
+    found = False
+    while offset < len(data):
+        header = _parse_frame_header(data, offset)
+        if header is None:
+            if found and data[offset:offset + 3] == b"TAG":
+                break  # ID3v1 trailer
+            offset += 1  # resync on garbage between frames
+            continue
+        frame_length, samples, sample_rate = header
+        found = True
+        yield offset, frame_length, samples / sample_rate
+        offset += frame_length
+
+
+def mp3_audio_range(data):
+    """Return (start, end, duration_ms) of the MPEG frame data, excluding ID3 tags."""
+    start = None
+    end = _skip_id3v2(data)
+    total_seconds = 0.0
+    for offset, frame_length, seconds in _frames(data):
+        if start is None:
+            start = offset
+        total_seconds += seconds
+        end = min(offset + frame_length, len(data))
+    return (start or 0), end, int(round(total_seconds * 1000))
+
+
+def split_mp3(data, cut_times_ms):
+    """Split MP3 bytes frame-wise, starting a new piece at the frame playing at each cut time.
+
+    Returns (pieces, start_times_ms): len(cut_times_ms) + 1 frame-data byte strings
+    (ID3 tags dropped; empty for cuts past the end) and the time each piece starts
+    at in the original audio.
+    """
+    cuts = sorted(cut_times_ms)
+    pieces = []
+    starts_ms = [0]
+    piece_start = piece_end = None
+    elapsed = 0.0
+    for offset, frame_length, seconds in _frames(data):
+        if piece_start is None:
+            piece_start = offset
+        # Rounded so float error can't move a cut on a frame boundary into the frame before
+        while cuts and cuts[0] < round((elapsed + seconds) * 1000, 3):
+            cuts.pop(0)
+            pieces.append(data[piece_start:offset])
+            piece_start = offset
+            starts_ms.append(int(round(elapsed * 1000)))
+        elapsed += seconds
+        piece_end = min(offset + frame_length, len(data))
+    pieces.append(data[piece_start:piece_end] if piece_start is not None else b"")
+    for _ in cuts:
+        pieces.append(b"")
+        starts_ms.append(int(round(elapsed * 1000)))
+    return pieces, starts_ms
+
+
+def mp3_duration_ms(data):
+    """Duration of MP3 bytes computed from frame headers, without decoding."""
+    return mp3_audio_range(data)[2]
+
+
+def concat_mp3(chunks):
+    """Concatenate MP3 byte strings frame-wise, dropping per-chunk ID3 tags.
+
+    Returns (audio_bytes, chunk_offsets_ms) where chunk_offsets_ms[i] is the start
+    time of chunk i in the joined audio.
+    """
+    parts = []
+    offsets = []
+    elapsed_ms = 0
+    for chunk in chunks:
+        start, end, duration_ms = mp3_audio_range(chunk)
+        offsets.append(elapsed_ms)
+        parts.append(chunk[start:end])
+        elapsed_ms += duration_ms
+    return b"".join(parts), offsets
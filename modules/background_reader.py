@@ -0,0 +1,75 @@
+import subprocess
+import numpy as np
+from moviepy.editor import VideoClip
+from modules.ffmpeg_utils import get_ffmpeg_binary
+
+
+def scale_filter(width, height):
+    """Scale to cover width x height, then center-crop to exactly that size."""
+    return (f"scale={width}:{height}:force_original_aspect_ratio=increase:flags=bilinear,"
+            f"crop={width}:{height}")
+
+
+class BackgroundReader:
+    """Read a stretch of background footage as raw RGB frames already at the output fps and size.
+
+    ffmpeg seeks to start on the input side, drops frames with the fps filter
+    and scales before anything reaches Python, so decode and composite cost
+    follow the output profile instead of the source footage.
+    """
+
+    def __init__(self, video_path, start, duration, fps, width, height):
+        self.video_path = video_path
+        self.start = start
+        self.duration = duration
+        self.fps = fps
+        self.size = (width, height)
+        self.frame_bytes = width * height * 3
+        self.process = None
+        self.position = -1
+        self.frame = None
+
+    def _open(self):
+        self.close()
+        width, height = self.size
+        command = [
+            get_ffmpeg_binary(), "-hide_banner", "-loglevel", "error",
+            "-ss", f"{self.start:.3f}",
+            "-t", f"{self.duration:.3f}",
+            "-i", self.video_path,
+            "-an",
+            "-vf", f"fps={self.fps},{scale_filter(width, height)}",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-"
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                        bufsize=self.frame_bytes * 4)
+        self.position = -1
+
+    def get_frame(self, t):
+        """Frame at time t (relative to start); frames are expected to be requested in order."""
+        index = int(round(t * self.fps))
+        if self.process is None or index < self.position:
+            self._open()
+        while self.position < index:
+            data = self.process.stdout.read(self.frame_bytes)
+            if len(data) < self.frame_bytes:
+                break  # past the end of the stream: keep showing the last frame
+            self.frame = np.frombuffer(data, dtype=np.uint8).reshape(self.size[1], self.size[0], 3)
+            self.position += 1
+        if self.frame is None:
+            raise RuntimeError(f"No frames decoded from {self.video_path} at {self.start + t:.2f}s")
+        return self.frame
+
+    def to_clip(self):
+        clip = VideoClip(self.get_frame, duration=self.duration)
+        clip.fps = self.fps
+        return clip
+
+    def close(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.terminate()
+            self.process.wait()
+            self.process = None
@@ -0,0 +1,287 @@
+import argparse
+import bisect
+import functools
+import hashlib
+import io
+import json
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from modules.disk_cache import DiskCache
+
+# Rendered captions as PNGs, shared by every render on this machine
+caption_cache = DiskCache("cache/captions", max_bytes=200 * 1024 * 1024, suffix=".png")
+# Bytes of ready sprites kept per process (each holds its RGBA plus the uint16 blending arrays)
+MEMORY_CACHE_BYTES = 64 * 1024 * 1024
+
+
+@functools.lru_cache(maxsize=32)
+def load_font(font, size):
+    """Load a TrueType font by path or by name (searched in the system font folders); loaded once per process."""
+    try:
+        return ImageFont.truetype(font, size)
+    except OSError:
+        print(f"Font {font} not found, falling back to Pillow's default font")
+        return ImageFont.load_default(size=size)
+
+
+class CaptionSprite:
+    """A rasterized caption cropped to its visible pixels, stored ready for blending."""
+
+    def __init__(self, rgba):
+        self.rgba = rgba
+        self.height, self.width = rgba.shape[:2]
+        alpha = rgba[:, :, 3:4].astype(np.uint16)
+        # Premultiplied colour and inverse alpha, so blending is one multiply-add per pixel
+        self.premultiplied = rgba[:, :, :3].astype(np.uint16) * alpha
+        self.inverse_alpha = 255 - alpha
+
+    @classmethod
+    def from_image(cls, image):
+        return cls(np.asarray(image.convert("RGBA")))
+
+    @property
+    def nbytes(self):
+        return self.rgba.nbytes + self.premultiplied.nbytes + self.inverse_alpha.nbytes
+
+    def to_image(self):
+        return Image.fromarray(self.rgba, "RGBA")
+
+
+class SpriteCache:
+    """Two-level caption cache: an in-process LRU of ready sprites in front of the on-disk PNG cache.
+
+    The in-memory level is bounded by the sprites' total size in bytes, not by
+    their count, since one long caption can take as much memory as dozens of short ones.
+    """
+
+    def __init__(self, disk_cache=caption_cache, max_bytes=MEMORY_CACHE_BYTES):
+        self.disk_cache = disk_cache
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.memory_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            sprite = self.memory.get(key)
+            if sprite is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return sprite
+
+        data = self.disk_cache.get(key) if self.disk_cache else None
+        if data is None:
+            with self.lock:
+                self.misses += 1
+            return None
+        try:
+            sprite = CaptionSprite.from_image(Image.open(io.BytesIO(data)))
+        except OSError:
+            return None
+        with self.lock:
+            self.disk_hits += 1
+        self._remember(key, sprite)
+        return sprite
+
+    def put(self, key, sprite):
+        self._remember(key, sprite)
+        if self.disk_cache:
+            buffer = io.BytesIO()
+            sprite.to_image().save(buffer, format="PNG")
+            self.disk_cache.put(key, buffer.getvalue())
+
+    def _remember(self, key, sprite):
+        with self.lock:
+            previous = self.memory.pop(key, None)
+            if previous is not None:
+                self.memory_bytes -= previous.nbytes
+            self.memory[key] = sprite
+            self.memory_bytes += sprite.nbytes
+            while self.memory_bytes > self.max_bytes and self.memory:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_bytes -= evicted.nbytes
+
+
+# Shared by every renderer in the process
+sprite_cache = SpriteCache()
+
+
+class CaptionRenderer:
+    """Rasterize caption text with Pillow: word-wrapped, centered, with an outline.
+
+    Rendered captions are cached by text and style, in memory and on disk, so
+    recurring captions are rasterized once per machine rather than once per video.
+    """
+
+    def __init__(self, font, font_size, color="white", stroke_color="black", stroke_width=2, max_width=1040,
+                 cache=sprite_cache):
+        self.font_name = font
+        self.font_size = font_size
+        self.color = color
+        self.stroke_color = stroke_color
+        self.stroke_width = stroke_width
+        self.max_width = max_width
+        self.cache = cache
+        self._font = None
+
+    @property
+    def font(self):
+        # Loaded lazily: when every caption is a cache hit the font file is never opened
+        if self._font is None:
+            self._font = load_font(self.font_name, self.font_size)
+        return self._font
+
+    def cache_key(self, text):
+        style = [text, self.font_name, self.font_size, self.color, self.stroke_color, self.stroke_width, self.max_width]
+        return hashlib.sha256(json.dumps(style).encode("utf-8")).hexdigest()
+
+    def wrap(self, text):
+        """Greedily break text into lines no wider than max_width."""
+        lines = []
+        for paragraph in text.splitlines() or [""]:
+            line = ""
+            for word in paragraph.split():
+                candidate = f"{line} {word}" if line else word
+                if line and self.font.getlength(candidate) + 2 * self.stroke_width > self.max_width:
+                    lines.append(line)
+                    line = word
+                else:
+                    line = candidate
+            lines.append(line)
+        return "\n".join(lines)
+
+    def render(self, text):
+        """Return the caption as a CaptionSprite cropped to its bounding box, from the cache when possible."""
+        if self.cache is None:
+            return self.rasterize(text)
+        key = self.cache_key(text)
+        sprite = self.cache.get(key)
+        if sprite is None:
+            sprite = self.rasterize(text)
+            self.cache.put(key, sprite)
+        return sprite
+
+    def rasterize(self, text):
+        text = self.wrap(text)
+        draw = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+        left, top, right, bottom = draw.multiline_textbbox(
+            (0, 0), text, font=self.font, align="center", stroke_width=self.stroke_width
+        )
+        image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+        ImageDraw.Draw(image).multiline_text(
+            (-left, -top), text, font=self.font, fill=self.color, align="center",
+            stroke_width=self.stroke_width, stroke_fill=self.stroke_color
+        )
+        bbox = image.getbbox()
+        if bbox:
+            image = image.crop(bbox)
+        return CaptionSprite.from_image(image)
+
+
+def composite(frame, sprite, x, y):
+    """Blend sprite onto a copy of frame with its top-left corner at (x, y); only the sprite's box is touched."""
+    frame = np.array(frame, copy=True)
+    frame_height, frame_width = frame.shape[:2]
+    x0, y0 = max(0, x), max(0, y)
+    x1, y1 = min(frame_width, x + sprite.width), min(frame_height, y + sprite.height)
+    if x0 >= x1 or y0 >= y1:
+        return frame
+
+    sx, sy = x0 - x, y0 - y
+    region = frame[y0:y1, x0:x1].astype(np.uint16)
+    blended = sprite.premultiplied[sy:sy + y1 - y0, sx:sx + x1 - x0] \
+        + region * sprite.inverse_alpha[sy:sy + y1 - y0, sx:sx + x1 - x0]
+    # (v + 128 + ((v + 128) >> 8)) >> 8 is an exact rounding division by 255
+    blended += 128
+    frame[y0:y1, x0:x1] = ((blended + (blended >> 8)) >> 8).astype(np.uint8)
+    return frame
+
+
+class CaptionTrack:
+    """Timed captions drawn centered onto frames, each rasterized once on first use."""
+
+    def __init__(self, cues, renderer):
+        self.cues = sorted(cues)
+        self.starts = [start for start, _, _ in self.cues]
+        self.renderer = renderer
+        self.sprites = {}
+
+    def sprite_for(self, index):
+        if index not in self.sprites:
+            self.sprites[index] = self.renderer.render(self.cues[index][2])
+        return self.sprites[index]
+
+    def active_cue(self, t):
+        index = bisect.bisect_right(self.starts, t) - 1
+        if index >= 0 and t < self.cues[index][1]:
+            return index
+        return None
+
+    def apply(self, frame, t):
+        index = self.active_cue(t)
+        if index is None:
+            return frame
+        sprite = self.sprite_for(index)
+        x = (frame.shape[1] - sprite.width) // 2
+        y = (frame.shape[0] - sprite.height) // 2
+        return composite(frame, sprite, x, y)
+
+
+def benchmark(font, duration=180, fps=24, size=(1080, 1920), caption_seconds=0.6, textclip_frames=200):
+    """Compare per-frame caption cost of the Pillow/NumPy path and the TextClip/CompositeVideoClip path."""
+    words = ["bro", "this", "is", "lowkey", "the", "mitochondria", "no cap", "fr fr", "photosynthesis",
+             "is", "crazy", "ong"]
+    cues = []
+    t = 0.0
+    i = 0
+    while t < duration:
+        cues.append((t, t + caption_seconds, f"{words[i % len(words)]} {words[(i * 7 + 3) % len(words)]}"))
+        t += caption_seconds
+        i += 1
+    frame_count = int(duration * fps)
+    frame = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+    print(f"{duration}s at {fps}fps: {frame_count} frames, {len(cues)} captions, {size[0]}x{size[1]}")
+
+    track = CaptionTrack(cues, CaptionRenderer(font, 70, max_width=size[0] - 40))
+    start = time.perf_counter()
+    for n in range(frame_count):
+        track.apply(frame, n / fps)
+    elapsed = time.perf_counter() - start
+    print(f"Pillow + NumPy:        {elapsed * 1000 / frame_count:7.2f} ms/frame  ({elapsed:.1f}s total)")
+
+    try:
+        from moviepy.editor import ColorClip, CompositeVideoClip, TextClip
+        sample = cues[:max(1, int(textclip_frames / fps / caption_seconds) + 1)]
+        start = time.perf_counter()
+        clips = [TextClip(text, font=font, fontsize=70, color="white", stroke_color="black", stroke_width=2,
+                          size=(size[0] - 40, None), method="caption", align="center")
+                 .set_position(("center", "center")).set_start(cue_start).set_duration(cue_end - cue_start)
+                 for cue_start, cue_end, text in sample]
+        background = ColorClip(size, color=(0, 0, 0), duration=sample[-1][1])
+        composite_clip = CompositeVideoClip([background] + clips)
+        frames = min(textclip_frames, int(sample[-1][1] * fps))
+        for n in range(frames):
+            composite_clip.get_frame(n / fps)
+        elapsed = time.perf_counter() - start
+        print(f"TextClip + Composite:  {elapsed * 1000 / frames:7.2f} ms/frame  "
+              f"(sampled {frames} frames, {elapsed * frame_count / frames:.1f}s projected)")
+    except Exception as e:
+        print(f"TextClip path skipped: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark caption compositing on a 3-minute video")
+    parser.add_argument("--font", default="ProximaNova-Semibold")
+    parser.add_argument("--duration", type=float, default=180)
+    args = parser.parse_args()
+    benchmark(args.font, duration=args.duration)
+
+
+if __name__ == "__main__":
+    main()
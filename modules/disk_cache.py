@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Even while under budget, rescan the directory this often to expire entries and pick up other processes' writes
+EVICT_INTERVAL = 60
+
+
+class DiskCache:
+    """Content-addressed file cache with age expiry and LRU eviction under a size budget.
+
+    Each entry is one file named after its key. The file mtime records when it was
+    written (for max_age) and the atime is bumped on every hit (for LRU eviction).
+    The directory is created on the first write, so importing a module that
+    declares a cache leaves nothing behind.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, max_age=None, suffix=".bin"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._known_bytes = None  # size found by the last eviction pass plus our writes since
+        self._last_evict = 0
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _is_expired(self, path, now=None):
+        if self.max_age is None:
+            return False
+        now = now or time.time()
+        return now - os.path.getmtime(path) > self.max_age
+
+    def get(self, key):
+        """Return the cached bytes for key, or None on a miss."""
+        path = self.path_for(key)
+        try:
+            if self._is_expired(path):
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (time.time(), os.path.getmtime(path)))
+            return data
+        except FileNotFoundError:
+            return None
+
+    def __contains__(self, key):
+        path = self.path_for(key)
+        try:
+            return os.path.exists(path) and not self._is_expired(path)
+        except FileNotFoundError:
+            return False
+
+    def put(self, key, data):
+        """Store bytes under key, then evict entries over the size budget."""
+        path = self.path_for(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        with self._lock:
+            if self._known_bytes is not None:
+                self._known_bytes += len(data)
+        if self._needs_eviction():
+            self.evict()
+        return path
+
+    def _needs_eviction(self):
+        """Skip the directory scan while the cache is known to be under budget and was scanned recently."""
+        if self._known_bytes is None or time.time() - self._last_evict > EVICT_INTERVAL:
+            return True
+        return self.max_bytes is not None and self._known_bytes > self.max_bytes
+
+    def get_json(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+    def put_json(self, key, value):
+        return self.put(key, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            try:
+                names = os.listdir(self.cache_dir)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if not name.endswith(self.suffix) or name.startswith(".tmp_"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    if self._is_expired(path, now):
+                        os.remove(path)
+                        continue
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            if self.max_bytes is not None:
+                for _, size, path in sorted(entries):
+                    if total <= self.max_bytes:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except FileNotFoundError:
+                        pass
+            self._known_bytes = total
+            self._last_evict = now
@@ -0,0 +1,135 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+
+
+def get_ffmpeg_binary():
+    """The ffmpeg moviepy is configured with (its bundled imageio binary by default)."""
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except ImportError:
+        return shutil.which("ffmpeg") or "ffmpeg"
+
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+STREAM_PATTERN = re.compile(r"Stream #\S+.*?: (Video|Audio): (.*)")
+SIZE_PATTERN = re.compile(r"\b(\d{2,5})x(\d{2,5})\b")
+
+
+def get_ffprobe_binary():
+    """ffprobe next to the configured ffmpeg, or the one on PATH; None if there is none.
+
+    moviepy's bundled imageio-ffmpeg ships without ffprobe, so on a stock
+    install this is only found when ffprobe is installed separately.
+    """
+    ffmpeg = get_ffmpeg_binary()
+    directory, name = os.path.split(ffmpeg)
+    candidate = os.path.join(directory, name.replace("ffmpeg", "ffprobe"))
+    if directory and os.path.exists(candidate):
+        return candidate
+    return shutil.which("ffprobe")
+
+
+def run_ffmpeg(args, loglevel="error"):
+    """Run ffmpeg with the given arguments, raising RuntimeError with its stderr on failure."""
+    command = [get_ffmpeg_binary(), "-hide_banner", "-loglevel", loglevel, "-y"] + list(args)
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return result
+
+
+def probe(path):
+    """Return ffprobe's format and stream information for a media file.
+
+    Without ffprobe, the duration and stream sizes are read from what `ffmpeg -i` prints instead.
+    """
+    ffprobe = get_ffprobe_binary()
+    if ffprobe is None:
+        return probe_with_ffmpeg(path)
+    command = [ffprobe, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+    return json.loads(result.stdout)
+
+
+def probe_with_ffmpeg(path):
+    """The subset of probe() used here (duration, stream types, video size), parsed from `ffmpeg -i`."""
+    # With no output file ffmpeg exits with an error after printing the input's details
+    result = subprocess.run([get_ffmpeg_binary(), "-hide_banner", "-i", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output = result.stderr.decode("utf-8", "replace")
+    match = DURATION_PATTERN.search(output)
+    if not match:
+        raise RuntimeError(f"ffmpeg could not read {path}: {output.strip()}")
+    hours, minutes, seconds = match.groups()
+
+    streams = []
+    for codec_type, details in STREAM_PATTERN.findall(output):
+        stream = {"codec_type": codec_type.lower()}
+        size = SIZE_PATTERN.search(details)
+        if codec_type == "Video" and size:
+            stream["width"], stream["height"] = int(size.group(1)), int(size.group(2))
+        streams.append(stream)
+    return {
+        "format": {"duration": str(int(hours) * 3600 + int(minutes) * 60 + float(seconds))},
+        "streams": streams
+    }
+
+
+def probe_duration(path):
+    """Duration of a media file in seconds."""
+    return float(probe(path)["format"]["duration"])
+
+
+def transcode_audio(input_path, output_path, codec="aac", bitrate="192k"):
+    run_ffmpeg(["-i", input_path, "-vn", "-c:a", codec, "-b:a", bitrate, output_path])
+    return output_path
+
+
+def mux(video_path, audio_path, output_path):
+    """Combine the video stream of one file with the audio stream of another, copying both."""
+    run_ffmpeg([
+        "-i", video_path,
+        "-i", audio_path,
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        "-c", "copy",
+        "-shortest",
+        "-movflags", "+faststart",
+        output_path
+    ])
+    return output_path
+
+
+def concat(paths, output_path, audio_path=None):
+    """Join identically encoded video files with the concat demuxer (stream copy), optionally adding audio."""
+    list_path = f"{os.path.splitext(output_path)[0]}_concat.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    args = ["-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+    args += ["-c", "copy", "-movflags", "+faststart", output_path]
+    try:
+        run_ffmpeg(args)
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def psnr(reference_path, distorted_path):
+    """Average PSNR in dB of distorted_path's video against reference_path's (inf if identical)."""
+    result = run_ffmpeg(["-i", distorted_path, "-i", reference_path, "-lavfi", "[0:v][1:v]psnr", "-f", "null", "-"],
+                        loglevel="info")
+    match = re.search(r"PSNR .*average:(\S+)", result.stderr.decode("utf-8", "replace"))
+    if not match:
+        raise RuntimeError("ffmpeg did not report a PSNR")
+    return float(match.group(1))
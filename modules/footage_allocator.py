@@ -0,0 +1,141 @@
+import os
+import time
+import uuid
+from modules.ffmpeg_utils import probe_duration
+from modules.keyframe_index import KeyframeIndex
+from modules.state_store import state_store
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".mkv", ".webm")
+
+
+class FootageAllocator:
+    """Hand out non-overlapping stretches of background footage from every video under videos/.
+
+    Sources are used round-robin, each from a cursor that only moves forward.
+    Every range handed out is remembered for the current cycle, so footage is
+    not handed out again until no source has room left outside those ranges;
+    then the cycle wraps and every source starts over. Leased intervals are
+    recorded until released (or until lease_ttl passes, in case a worker died),
+    and new leases never overlap a live one, in this cycle or the last. Each
+    lease is made in one state-store transaction, so concurrent render workers
+    and processes never see or hand out the same footage.
+    """
+
+    def __init__(self, videos_folder="videos", lease_ttl=4 * 3600, snap_to_keyframe=True, store=None):
+        self.videos_folder = videos_folder
+        self.store = store or state_store
+        self.lease_ttl = lease_ttl
+        self.snap_to_keyframe = snap_to_keyframe
+
+    def find_sources(self):
+        sources = []
+        for root, _, filenames in os.walk(self.videos_folder):
+            for filename in filenames:
+                if filename.lower().endswith(VIDEO_EXTENSIONS):
+                    sources.append(os.path.join(root, filename))
+        return sorted(sources)
+
+    def _scan_sources(self):
+        """Size, mtime and duration of every video, probing only new or changed ones.
+
+        Runs before the lease transaction so slow probes never hold the write lock.
+        """
+        known = self.store.get_footage_sources()
+        scanned = {}
+        for path in self.find_sources():
+            stat = os.stat(path)
+            source = known.get(path)
+            if source and source['size'] == stat.st_size and source['mtime'] == stat.st_mtime:
+                duration = source['duration']
+            else:
+                duration = probe_duration(path)
+            scanned[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'duration': duration}
+        return scanned
+
+    def _refresh_sources(self, sources, scanned):
+        """Add new videos, drop deleted ones and reset any whose file changed; returns (sources, reset paths)."""
+        refreshed = {}
+        reset = []
+        for path, source in scanned.items():
+            known = sources.get(path)
+            if known and known['size'] == source['size'] and known['mtime'] == source['mtime']:
+                refreshed[path] = known
+            else:
+                refreshed[path] = dict(source, cursor=0.0)
+                reset.append(path)
+        return refreshed, reset
+
+    def _fit(self, length, duration, start, taken, keyframes=None):
+        """Earliest start at or after start with room for duration that overlaps no taken range, or None."""
+        taken = sorted(taken)
+        while start + duration <= length:
+            if keyframes is not None:
+                start = keyframes.snap(start)
+                if start + duration > length:
+                    return None
+            overlap = next((end for taken_start, end in taken if taken_start < start + duration and start < end), None)
+            if overlap is None:
+                return start
+            start = overlap
+        return None
+
+    def _find(self, paths, sources, taken, duration, keyframes):
+        """First (path, start) in round-robin order, from each source's cursor and then from its start."""
+        for path in paths:
+            source = sources[path]
+            for start in dict.fromkeys((source['cursor'], 0.0)):
+                start = self._fit(source['duration'], duration, start, taken.get(path, []), keyframes.get(path))
+                if start is not None:
+                    return path, start
+        return None
+
+    def lease(self, duration, holder=None):
+        """Reserve duration seconds of footage and return the lease: {'id', 'path', 'start', 'end', ...}."""
+        scanned = self._scan_sources()
+        # Build missing keyframe indexes before taking the lock too; that can take a while
+        keyframes = {path: KeyframeIndex.load(path) for path in scanned} if self.snap_to_keyframe else {}
+
+        with self.store.transaction() as conn:
+            sources, leases, used, next_source = self.store.load_footage(conn)
+            sources, reset = self._refresh_sources(sources, scanned)
+            if reset:
+                self.store.clear_footage_used(conn, reset)
+                for path in reset:
+                    used.pop(path, None)
+            eligible = [path for path, source in sources.items() if source['duration'] >= duration]
+            if not eligible:
+                raise ValueError(f"No background video in {self.videos_folder} is at least {duration:.1f}s long")
+            first = next_source % len(eligible)
+            paths = eligible[first:] + eligible[:first]
+
+            live = {}
+            for lease in leases.values():
+                live.setdefault(lease['path'], []).append((lease['start'], lease['end']))
+            taken = {path: used.get(path, []) + live.get(path, []) for path in paths}
+            found = self._find(paths, sources, taken, duration, keyframes)
+            if found is None:
+                # Everything outside this cycle's ranges is too short: start a new cycle
+                for source in sources.values():
+                    source['cursor'] = 0.0
+                found = self._find(paths, sources, live, duration, keyframes)
+                if found is None:
+                    raise RuntimeError("All background footage is leased by running renders")
+                print("All background footage used, starting over from the beginning")
+                self.store.clear_footage_used(conn)
+            path, start = found
+
+            lease = {
+                'id': uuid.uuid4().hex,
+                'path': path,
+                'start': start,
+                'end': start + duration,
+                'holder': holder,
+                'expires_at': time.time() + self.lease_ttl
+            }
+            self.store.save_footage_sources(conn, sources)
+            self.store.add_footage_lease(conn, lease, (eligible.index(path) + 1) % len(eligible))
+        return lease
+
+    def release(self, lease_id):
+        """End a lease once its render finished or failed; the footage is not handed out again this cycle."""
+        self.store.release_footage_lease(lease_id)
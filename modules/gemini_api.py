@@ -1,11 +1,18 @@
 import os
-import json
+import time
 from dotenv import load_dotenv
 import google.generativeai as genai
+from modules.file_utils import sha256_file
+from modules.state_store import state_store
+
+UPLOAD_TTL = 48 * 60 * 60  # Gemini deletes uploaded files after 48 hours
+EXPIRY_MARGIN = 60 * 60  # re-upload when less than an hour of validity is left
 
 
 class PDFProcessor:
-    def __init__(self, cache_file="pdf_cache.json"):
+    model_name = "models/gemini-1.5-flash"
+
+    def __init__(self, store=None):
         load_dotenv()
         print("Initializing PDFProcessor...")
         self.api_key = os.getenv("GEMINI_API_KEY")
@@ -13,40 +20,102 @@ class PDFProcessor:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         genai.configure(api_key=self.api_key)
         self.assistant_name = "TikTok Script Generator"
-        self.cache_file = cache_file
-        self.file_cache = self.load_cache()
+        self.store = store or state_store
         print("Initialization complete.")
 
-    def load_cache(self):
-        """Load the cache from a JSON file."""
-        if os.path.exists(self.cache_file):
-            with open(self.cache_file, "r") as f:
-                return json.load(f)
-        return {}
-
-    def save_cache(self):
-        """Save the cache to a JSON file."""
-        with open(self.cache_file, "w") as f:
-            json.dump(self.file_cache, f)
+    def get_cached_upload(self, file_hash):
+        """Return a recorded upload that will stay valid for at least EXPIRY_MARGIN seconds."""
+        entry = self.store.get_upload("gemini", file_hash)
+        if not entry:
+            return None
+        if (entry['expires_at'] or 0) - time.time() < EXPIRY_MARGIN:
+            print(f"Cached upload for {entry['file_name']} is about to expire, re-uploading")
+            return None
+        return entry
 
     def upload_file(self, file_path):
-        """Upload the PDF file to Gemini."""
+        """Upload the PDF file to Gemini, reusing an unexpired upload of the same content."""
         file_name = os.path.basename(file_path)
+        file_hash = sha256_file(file_path)
 
-        if file_name in self.file_cache:
+        cached = self.get_cached_upload(file_hash)
+        if cached:
             print(f"Using cached file: {file_name}")
-            return self.file_cache[file_name]
+            return cached['remote_id']
 
         try:
             print(f"\nUploading file: {file_name}")
             uploaded_file = genai.upload_file(path=file_path, display_name=file_name)
-            self.file_cache[file_name] = uploaded_file.uri
-            self.save_cache()
+            uploaded_at = time.time()
+            expiration_time = getattr(uploaded_file, "expiration_time", None)
+            if expiration_time is not None:
+                expires_at = expiration_time.timestamp()
+            else:
+                expires_at = uploaded_at + UPLOAD_TTL
+            self.store.put_upload("gemini", file_hash, uploaded_file.uri, file_name=file_name,
+                                  uploaded_at=uploaded_at, expires_at=expires_at)
             print(f"File uploaded successfully: {uploaded_file.display_name}")
             return uploaded_file.uri
         except Exception as e:
             raise RuntimeError(f"Failed to upload file: {e}")
 
+    def build_file_prompt(self, pdf_uri, prompt_text):
+        return {
+            "role": "user",
+            "parts": [
+                {"file_data": {"file_uri": pdf_uri, "mime_type": "application/pdf"}},
+                {"text": prompt_text}
+            ]
+        }
+
+    def build_text_prompt(self, document_text, prompt_text):
+        return {
+            "role": "user",
+            "parts": [
+                {"text": f"PDF content:\n{document_text}"},
+                {"text": prompt_text}
+            ]
+        }
+
+    def generate(self, prompt):
+        """Send a single prompt to Gemini and return the response text."""
+        print("\nGenerating content...")
+        model = genai.GenerativeModel(model_name=self.model_name)
+        response = model.generate_content(
+            contents=[prompt],
+            request_options={"timeout": 600}
+        )
+
+        if response.text:
+            print("Response generated successfully!")
+            return response.text
+
+        print("No response generated.")
+        return "No response generated."
+
+    def stream_pdf(self, pdf_path, prompt_text):
+        """Yield response text chunks as Gemini generates them."""
+        try:
+            if not os.path.exists(pdf_path):
+                raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
+
+            pdf_uri = self.upload_file(pdf_path)
+
+            print("\nStreaming content...")
+            model = genai.GenerativeModel(model_name=self.model_name)
+            response = model.generate_content(
+                contents=[self.build_file_prompt(pdf_uri, prompt_text)],
+                stream=True,
+                request_options={"timeout": 600}
+            )
+            for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+
+        except Exception as e:
+            print(f"\nERROR: {str(e)}")
+            raise RuntimeError(f"Failed to stream PDF: {str(e)}")
+
     def process_pdf(self, pdf_path, prompt_text):
         """Process the PDF and generate a response using Gemini."""
         try:
@@ -58,30 +127,18 @@ class PDFProcessor:
                 raise FileNotFoundError(f"PDF file not found at path: {pdf_path}")
 
             pdf_uri = self.upload_file(pdf_path)
+            return self.generate(self.build_file_prompt(pdf_uri, prompt_text))
 
-            model_name = "models/gemini-1.5-flash"
-            prompt = {
-                "role": "user",
-                "parts": [
-                    {"file_data": {"file_uri": pdf_uri, "mime_type": "application/pdf"}},
-                    {"text": prompt_text}
-                ]
-            }
-
-            print("\nGenerating content...")
-            model = genai.GenerativeModel(model_name=model_name)
-            response = model.generate_content(
-                contents=[prompt],
-                request_options={"timeout": 600}
-            )
-
-            if response.text:
-                print("Response generated successfully!")
-                return response.text
+        except Exception as e:
+            print(f"\nERROR: {str(e)}")
+            raise RuntimeError(f"Failed to process PDF: {str(e)}")
 
-            print("No response generated.")
-            return "No response generated."
+    def process_text(self, document_text, prompt_text):
+        """Generate a response from locally extracted PDF text instead of an uploaded file."""
+        try:
+            print(f"\nSending {len(document_text)} characters of extracted text")
+            return self.generate(self.build_text_prompt(document_text, prompt_text))
 
         except Exception as e:
             print(f"\nERROR: {str(e)}")
-            raise RuntimeError(f"Failed to process PDF: {str(e)}")
+            raise RuntimeError(f"Failed to process text: {str(e)}")
@@ -0,0 +1,64 @@
+import os
+from modules.file_utils import load_json
+from modules.state_store import state_store
+
+
+class JobManifest:
+    """Per-PDF record of which pipeline stages completed and the artifacts they produced.
+
+    Stored in the shared state database; a manifest left in manifests/ by an
+    older version is imported the first time its job is opened.
+    """
+
+    def __init__(self, base_name, store=None, legacy_folder="manifests"):
+        self.base_name = base_name
+        self.store = store or state_store
+        self.legacy_path = os.path.join(legacy_folder, f"{base_name}.json")
+        if self.store.get_job(base_name) is None and os.path.exists(self.legacy_path):
+            self.import_legacy()
+
+    def import_legacy(self):
+        data = load_json(self.legacy_path, default=None) or {}
+        for stage_name, stage in data.get('stages', {}).items():
+            if stage.get('status') == 'completed':
+                # Paths were not recorded; only the hashes are needed to tell whether the stage is still valid
+                artifacts = {label: ("", digest) for label, digest in (stage.get('artifacts') or {}).items()}
+                self.store.mark_stage_complete(self.base_name, stage_name, stage.get('inputs') or {}, artifacts,
+                                               result=stage.get('result'))
+            elif stage.get('status') == 'failed':
+                self.store.mark_stage_failed(self.base_name, stage_name, stage.get('error'), stage.get('attempts', 0))
+        details = {key: value for key, value in data.items()
+                   if key not in ('base_name', 'status', 'stages', 'updated_at')}
+        self.store.set_job_status(self.base_name, data.get('status', 'pending'), **details)
+
+    def hash_paths(self, paths):
+        """Hash a {label: path} mapping; missing paths hash to None."""
+        return {label: self.store.file_hash(path) for label, path in paths.items()}
+
+    def get_stage(self, stage_name):
+        return self.store.get_stage(self.base_name, stage_name)
+
+    def is_stage_complete(self, stage_name, input_paths, output_paths):
+        """A stage is complete if it finished, its outputs are intact and its inputs are unchanged."""
+        stage = self.get_stage(stage_name)
+        if stage.get('status') != 'completed':
+            return False
+        artifacts = self.hash_paths(output_paths)
+        if None in artifacts.values() or stage.get('artifacts') != artifacts:
+            return False
+        return stage.get('inputs') == self.hash_paths(input_paths)
+
+    def mark_stage_complete(self, stage_name, input_paths, output_paths, result=None):
+        if self.store.get_job(self.base_name) is None:
+            self.store.set_job_status(self.base_name, 'pending')
+        artifacts = {label: (path, self.store.file_hash(path)) for label, path in output_paths.items()}
+        self.store.mark_stage_complete(self.base_name, stage_name, self.hash_paths(input_paths), artifacts,
+                                       result=result)
+
+    def mark_stage_failed(self, stage_name, error, attempts):
+        if self.store.get_job(self.base_name) is None:
+            self.store.set_job_status(self.base_name, 'pending')
+        self.store.mark_stage_failed(self.base_name, stage_name, error, attempts)
+
+    def set_status(self, status, **details):
+        self.store.set_job_status(self.base_name, status, **details)
@@ -0,0 +1,149 @@
+import json
+import re
+
+SMART_QUOTES = {'“': '"', '”': '"', '„': '"', '«': '"', '»': '"'}
+CLOSING = {'{': '}', '[': ']'}
+
+
+class ScriptValidationError(ValueError):
+    """Raised when a model response cannot be turned into a valid script object."""
+
+
+def strip_code_fences(text):
+    match = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if match:
+        return match.group(1)
+    return text.replace("```json", "").replace("```", "")
+
+
+def extract_json_candidate(text):
+    """Return the first {...} object in text, tolerating prose around it and a truncated end."""
+    text = strip_code_fences(text)
+    start = text.find("{")
+    if start == -1:
+        raise ScriptValidationError("No JSON object found in response")
+
+    depth = 0
+    in_string = False
+    escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return text[start:]
+
+
+def _next_significant(text, index):
+    while index < len(text) and text[index].isspace():
+        index += 1
+    return text[index] if index < len(text) else ""
+
+
+def repair_json(text):
+    """Fix common LLM JSON defects in one string-aware pass.
+
+    Handles trailing commas, raw newlines/tabs inside strings, unescaped quotes
+    inside strings, and output truncated mid-string or mid-object.
+    """
+    result = []
+    stack = []
+    in_string = False
+    escaped = False
+
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+                result.append(char)
+            elif char == "\\":
+                escaped = True
+                result.append(char)
+            elif char == '"':
+                # A quote only closes the string if JSON syntax follows it
+                if _next_significant(text, index + 1) in (",", "}", "]", ":", ""):
+                    in_string = False
+                    result.append(char)
+                else:
+                    result.append('\\"')
+            elif char == "\n":
+                result.append("\\n")
+            elif char == "\r":
+                continue
+            elif char == "\t":
+                result.append("\\t")
+            elif ord(char) < 0x20:
+                continue
+            else:
+                result.append(char)
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in CLOSING:
+            stack.append(CLOSING[char])
+        elif char in "}]":
+            if stack:
+                stack.pop()
+        elif char == ",":
+            if _next_significant(text, index + 1) in ("}", "]", ""):
+                continue  # trailing comma
+        result.append(char)
+
+    if escaped:
+        result.pop()
+    if in_string:
+        result.append('"')
+    result.extend(reversed(stack))
+    return "".join(result)
+
+
+def validate_script(data):
+    """Check the script schema: an object with a non-empty string "script" and an optional string "title"."""
+    if not isinstance(data, dict):
+        raise ScriptValidationError("Response JSON is not an object")
+
+    script = data.get("script")
+    if isinstance(script, list) and all(isinstance(line, str) for line in script):
+        script = "\n".join(script)
+    if not isinstance(script, str) or not script.strip():
+        raise ScriptValidationError("Response JSON has no non-empty 'script' string")
+
+    title = data.get("title", "")
+    if not isinstance(title, str):
+        title = str(title)
+    return dict(data, script=script, title=title)
+
+
+def parse_script_response(text):
+    """Extract, repair and validate the script object from a raw model response."""
+    candidate = extract_json_candidate(text)
+    attempts = [candidate, repair_json(candidate)]
+
+    smart_fixed = candidate
+    for smart, straight in SMART_QUOTES.items():
+        smart_fixed = smart_fixed.replace(smart, straight)
+    if smart_fixed != candidate:
+        attempts.append(repair_json(smart_fixed))
+
+    last_error = None
+    for attempt in attempts:
+        try:
+            return validate_script(json.loads(attempt))
+        except json.JSONDecodeError as e:
+            last_error = e
+        except ScriptValidationError as e:
+            last_error = e
+    raise ScriptValidationError(f"Could not recover script JSON: {last_error}")
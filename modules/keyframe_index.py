@@ -0,0 +1,116 @@
+import argparse
+import bisect
+import hashlib
+import os
+import subprocess
+import time
+from modules.ffmpeg_utils import get_ffprobe_binary
+from modules.file_utils import load_json, atomic_write_json, FileLock
+
+KEYFRAME_INDEX_FOLDER = os.path.join("cache", "keyframes")
+
+
+def read_keyframe_times(video_path):
+    """Keyframe timestamps of the first video stream, read from packet flags without decoding."""
+    command = [
+        get_ffprobe_binary(), "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        video_path
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {video_path}: {result.stderr.decode('utf-8', 'replace').strip()}")
+
+    times = []
+    for line in result.stdout.decode("utf-8", "replace").splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return sorted(times)
+
+
+class KeyframeIndex:
+    """Persisted keyframe timestamps for one video, so seeks land on a keyframe without probing again.
+
+    The index is stored under cache/keyframes and rebuilt when the video's
+    size or mtime changes.
+    """
+
+    def __init__(self, video_path, keyframes):
+        self.video_path = video_path
+        self.keyframes = keyframes
+
+    @staticmethod
+    def index_path(video_path, index_folder=KEYFRAME_INDEX_FOLDER):
+        key = hashlib.sha256(os.path.abspath(video_path).encode("utf-8")).hexdigest()
+        return os.path.join(index_folder, f"{key}.json")
+
+    @classmethod
+    def load(cls, video_path, index_folder=KEYFRAME_INDEX_FOLDER):
+        """Return the index for video_path, building and saving it if it is missing or stale.
+
+        Without ffprobe the index is empty, so starts are not snapped to keyframes.
+        """
+        stat = os.stat(video_path)
+        path = cls.index_path(video_path, index_folder)
+        saved = load_json(path)
+        if saved and saved.get("size") == stat.st_size and saved.get("mtime") == stat.st_mtime:
+            return cls(video_path, saved["keyframes"])
+
+        if get_ffprobe_binary() is None:
+            print(f"ffprobe not found, not snapping {os.path.basename(video_path)} to keyframes")
+            return cls(video_path, [])
+
+        os.makedirs(index_folder, exist_ok=True)
+        with FileLock(path, timeout=600, stale_after=900):
+            # Another process may have built it while we waited for the lock
+            saved = load_json(path)
+            if saved and saved.get("size") == stat.st_size and saved.get("mtime") == stat.st_mtime:
+                return cls(video_path, saved["keyframes"])
+
+            start = time.time()
+            keyframes = read_keyframe_times(video_path)
+            print(f"Indexed {len(keyframes)} keyframes of {os.path.basename(video_path)} "
+                  f"in {time.time() - start:.1f}s")
+            atomic_write_json(path, {
+                "video_path": os.path.abspath(video_path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "keyframes": keyframes
+            })
+        return cls(video_path, keyframes)
+
+    def keyframe_before(self, t):
+        """Latest keyframe at or before t (0 if there is none)."""
+        i = bisect.bisect_right(self.keyframes, t)
+        return self.keyframes[i - 1] if i else 0.0
+
+    def keyframe_after(self, t):
+        """Earliest keyframe at or after t, or None past the last one."""
+        i = bisect.bisect_left(self.keyframes, t)
+        return self.keyframes[i] if i < len(self.keyframes) else None
+
+    def snap(self, t, max_shift=10.0):
+        """Move t forward to the next keyframe if one is within max_shift seconds."""
+        keyframe = self.keyframe_after(t)
+        if keyframe is not None and keyframe - t <= max_shift:
+            return keyframe
+        return t
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build keyframe indexes for background videos")
+    parser.add_argument("video_paths", nargs="+")
+    args = parser.parse_args()
+
+    for video_path in args.video_paths:
+        index = KeyframeIndex.load(video_path)
+        gaps = [b - a for a, b in zip(index.keyframes, index.keyframes[1:])]
+        longest = max(gaps) if gaps else 0
+        print(f"{video_path}: {len(index.keyframes)} keyframes, longest GOP {longest:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
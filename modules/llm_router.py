@@ -0,0 +1,175 @@
+import importlib
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules.state_store import state_store
+
+# Provider name -> module exposing a PDFProcessor with process_pdf/process_text.
+# Modules are imported lazily so an unused backend's SDK does not need to be installed.
+PROVIDERS = {
+    "gemini": "modules.gemini_api",
+    "openai": "modules.assistant_api",
+}
+
+
+def get_processor_class(provider):
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {provider}")
+    return importlib.import_module(PROVIDERS[provider]).PDFProcessor
+
+
+class ProviderStats:
+    """Rolling latency samples and error counts for one provider."""
+
+    def __init__(self, max_samples=100, latencies=None, successes=0, errors=0):
+        self.latencies = deque(latencies or [], maxlen=max_samples)
+        self.successes = successes
+        self.errors = errors
+
+    def record(self, latency, success):
+        if success:
+            self.latencies.append(latency)
+            self.successes += 1
+        else:
+            self.errors += 1
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class LLMRouter:
+    """Route script generation across PDFProcessor backends with failover and optional hedging.
+
+    Without hedging, providers are tried in order until one succeeds. With
+    hedging, the next provider is also started once the current one has run
+    longer than its hedge_percentile latency, and whichever finishes first wins.
+    """
+
+    def __init__(self, providers=("gemini", "openai"), hedge=False, hedge_percentile=0.9,
+                 default_hedge_delay=60, min_samples=5, store=None):
+        self.providers = list(providers)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.store = store or state_store
+        self._processors = {}
+        self._lock = threading.Lock()
+        self.stats = self.load_stats()
+
+    @property
+    def model_name(self):
+        return get_model_name("router", self.providers)
+
+    def load_stats(self):
+        return {provider: ProviderStats(**self.store.get_provider_stats(provider)) for provider in self.providers}
+
+    def _record(self, provider, latency, success):
+        with self._lock:
+            self.stats[provider].record(latency, success)
+        # One small transaction per call; other processes' calls are added to the same rows
+        self.store.record_provider_call(provider, latency, success, self.stats[provider].latencies.maxlen)
+
+    def get_processor(self, provider):
+        with self._lock:
+            if provider not in self._processors:
+                self._processors[provider] = get_processor_class(provider)()
+            return self._processors[provider]
+
+    def hedge_delay(self, provider):
+        """How long to wait on a provider before starting the next one."""
+        stats = self.stats[provider]
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_delay
+        return stats.percentile(self.hedge_percentile)
+
+    def _call(self, provider, method, *args):
+        start = time.time()
+        try:
+            result = getattr(self.get_processor(provider), method)(*args)
+        except Exception:
+            self._record(provider, time.time() - start, success=False)
+            raise
+        latency = time.time() - start
+        self._record(provider, latency, success=True)
+        print(f"{provider} responded in {latency:.1f}s")
+        return result
+
+    def _failover(self, method, *args):
+        errors = []
+        for provider in self.providers:
+            try:
+                return self._call(provider, method, *args)
+            except Exception as e:
+                print(f"Provider {provider} failed: {e}")
+                errors.append(f"{provider}: {e}")
+        raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+
+    def _hedged(self, method, *args):
+        executor = ThreadPoolExecutor(max_workers=len(self.providers))
+        pending = {}
+        errors = []
+        remaining = list(self.providers)
+        try:
+            while remaining or pending:
+                if remaining and not pending:
+                    provider = remaining.pop(0)
+                    pending[executor.submit(self._call, provider, method, *args)] = provider
+
+                timeout = self.hedge_delay(list(pending.values())[-1]) if remaining else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    provider = remaining.pop(0)
+                    print(f"No response within hedge delay, also asking {provider}")
+                    pending[executor.submit(self._call, provider, method, *args)] = provider
+                    continue
+
+                for future in done:
+                    provider = pending.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        print(f"Provider {provider} failed: {e}")
+                        errors.append(f"{provider}: {e}")
+            raise RuntimeError(f"All LLM providers failed: {'; '.join(errors)}")
+        finally:
+            # Don't block on the slower provider; its result is simply discarded
+            executor.shutdown(wait=False)
+
+    def _route(self, method, *args):
+        if self.hedge and len(self.providers) > 1:
+            return self._hedged(method, *args)
+        return self._failover(method, *args)
+
+    def process_pdf(self, pdf_path, prompt_text):
+        return self._route("process_pdf", pdf_path, prompt_text)
+
+    def process_text(self, document_text, prompt_text):
+        return self._route("process_text", document_text, prompt_text)
+
+
+def get_model_name(provider="gemini", providers=("gemini", "openai")):
+    """Model identifier used in cache keys for a provider choice."""
+    if provider == "router":
+        return "router:" + "+".join(get_processor_class(name).model_name for name in providers)
+    return get_processor_class(provider).model_name
+
+
+# Processors hold configured API clients, so each one is built once per process and shared
+_processors = {}
+_processors_lock = threading.Lock()
+
+
+def create_processor(provider="gemini", hedge=False):
+    """Return the shared PDFProcessor for a single provider, or an LLMRouter over all of them."""
+    key = (provider, hedge and provider == "router")
+    with _processors_lock:
+        if key not in _processors:
+            _processors[key] = LLMRouter(hedge=hedge) if provider == "router" else get_processor_class(provider)()
+        return _processors[key]
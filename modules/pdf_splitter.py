@@ -0,0 +1,70 @@
+import os
+from pypdf import PdfReader, PdfWriter
+
+
+def get_section_starts(reader):
+    """Return the sorted start pages of the top-level outline entries (bookmarks)."""
+    starts = set()
+    try:
+        outline = reader.outline
+    except Exception:
+        return []
+    for entry in outline:
+        if isinstance(entry, list):  # nested children of the previous entry
+            continue
+        try:
+            starts.add(reader.get_destination_page_number(entry))
+        except Exception:
+            continue
+    return sorted(start for start in starts if start > 0)
+
+
+def plan_chunks(page_count, section_starts, max_pages):
+    """Group pages into [start, end) ranges of at most max_pages, cutting at section starts where possible."""
+    boundaries = [0] + [start for start in section_starts if 0 < start < page_count] + [page_count]
+    sections = [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)
+                if boundaries[i] < boundaries[i + 1]]
+
+    # Oversized sections are cut into page-budget pieces first
+    pieces = []
+    for start, end in sections:
+        for piece_start in range(start, end, max_pages):
+            pieces.append((piece_start, min(piece_start + max_pages, end)))
+
+    # Then consecutive pieces are merged greedily while they fit the budget
+    chunks = []
+    for start, end in pieces:
+        if chunks and end - chunks[-1][0] <= max_pages:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+    return chunks
+
+
+def split_pdf(pdf_path, output_folder, max_pages):
+    """Split a PDF into part files of at most max_pages pages.
+
+    Returns a list of (part_base_name, part_pdf_path) tuples, or an empty list
+    when the document already fits in one part.
+    """
+    reader = PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    if page_count <= max_pages:
+        return []
+
+    chunks = plan_chunks(page_count, get_section_starts(reader), max_pages)
+    base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    os.makedirs(output_folder, exist_ok=True)
+
+    parts = []
+    for index, (start, end) in enumerate(chunks, 1):
+        part_name = f"{base_name}_part{index:02d}"
+        part_path = os.path.join(output_folder, f"{part_name}.pdf")
+        writer = PdfWriter()
+        for page_number in range(start, end):
+            writer.add_page(reader.pages[page_number])
+        with open(part_path, "wb") as f:
+            writer.write(f)
+        print(f"Created {part_name} (pages {start + 1}-{end})")
+        parts.append((part_name, part_path))
+    return parts
@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+
+PAGE_NUMBER_PATTERN = re.compile(r"^\s*(page\s*)?\d+(\s*(/|of)\s*\d+)?\s*$", re.IGNORECASE)
+EDGE_LINES = 2  # lines at the top and bottom of a page checked for headers/footers
+MIN_PAGES_PER_WORKER = 8
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Extract the text of pages [start, end) as a list of strings."""
+    reader = PdfReader(pdf_path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def extract_pages(pdf_path, max_workers=None):
+    """Extract page texts, splitting the page range across a process pool for long documents."""
+    page_count = len(PdfReader(pdf_path).pages)
+    max_workers = max_workers or os.cpu_count() or 1
+    workers = max(1, min(max_workers, page_count // MIN_PAGES_PER_WORKER))
+
+    if workers == 1:
+        return _extract_page_range(pdf_path, 0, page_count)
+
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    # Spawn rather than fork: this runs on stage worker threads, and forking a threaded process can deadlock
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(_extract_page_range, pdf_path, start, end) for start, end in ranges]
+        pages = []
+        for future in futures:
+            pages.extend(future.result())
+    return pages
+
+
+def _normalize_line(line):
+    """Strip leading/trailing numbers so 'Lecture 3 - page 12' and 'Lecture 3 - page 13' compare equal."""
+    return re.sub(r"^[\d\s/|-]+|[\d\s/|-]+$", "", line.strip().lower())
+
+
+def remove_boilerplate(pages, min_repeat_ratio=0.5):
+    """Drop page numbers and header/footer lines that repeat across most pages."""
+    page_lines = [[line for line in page.splitlines() if line.strip()] for page in pages]
+
+    edge_counts = Counter()
+    for lines in page_lines:
+        edges = set(_normalize_line(line) for line in lines[:EDGE_LINES] + lines[-EDGE_LINES:])
+        edge_counts.update(edges)
+
+    repeated = set()
+    if len(pages) >= 3:
+        threshold = max(2, int(len(pages) * min_repeat_ratio))
+        repeated = {line for line, count in edge_counts.items() if count >= threshold}
+
+    cleaned_pages = []
+    for lines in page_lines:
+        kept = []
+        for index, line in enumerate(lines):
+            at_edge = index < EDGE_LINES or index >= len(lines) - EDGE_LINES
+            # Page numbers sit on a page's first or last line; a bare number anywhere else is content
+            if index in (0, len(lines) - 1) and PAGE_NUMBER_PATTERN.match(line):
+                continue
+            if at_edge and _normalize_line(line) in repeated:
+                continue
+            kept.append(re.sub(r"[ \t]+", " ", line.strip()))
+        cleaned_pages.append("\n".join(kept))
+    return cleaned_pages
+
+
+def extract_pdf_text(pdf_path, max_workers=None):
+    """Return (text, page_count) for a PDF with headers, footers and page numbers removed."""
+    pages = remove_boilerplate(extract_pages(pdf_path, max_workers))
+    return "\n\n".join(page for page in pages if page), len(pages)
+
+
+def has_usable_text(text, page_count, min_chars_per_page=200):
+    """Scanned decks extract little or no text; those still need the file upload path."""
+    return page_count > 0 and len(text) / page_count >= min_chars_per_page
+
+
+def main():
+    """Compare upload size, prompt tokens and latency of the file path against the text path."""
+    from modules.gemini_api import PDFProcessor
+    import google.generativeai as genai
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m modules.pdf_text_extractor <pdf_path> [prompt_path]")
+        return
+    pdf_path = sys.argv[1]
+    prompt_path = sys.argv[2] if len(sys.argv) > 2 else "prompts/brainrot.txt"
+    with open(prompt_path, "r", encoding="utf8") as f:
+        prompt_text = f.read()
+
+    processor = PDFProcessor()
+    model = genai.GenerativeModel(model_name=processor.model_name)
+
+    extract_start = time.time()
+    text, _ = extract_pdf_text(pdf_path)
+    extract_seconds = time.time() - extract_start
+
+    pdf_uri = processor.upload_file(pdf_path)
+    file_tokens = model.count_tokens([processor.build_file_prompt(pdf_uri, prompt_text)]).total_tokens
+    text_tokens = model.count_tokens([processor.build_text_prompt(text, prompt_text)]).total_tokens
+
+    file_start = time.time()
+    processor.process_pdf(pdf_path, prompt_text)
+    file_seconds = time.time() - file_start
+
+    text_start = time.time()
+    processor.process_text(text, prompt_text)
+    text_seconds = time.time() - text_start
+
+    print(f"\n{'path':<8}{'payload bytes':>16}{'tokens':>10}{'seconds':>10}")
+    print(f"{'file':<8}{os.path.getsize(pdf_path):>16}{file_tokens:>10}{file_seconds:>10.1f}")
+    print(f"{'text':<8}{len(text.encode('utf-8')):>16}{text_tokens:>10}{text_seconds + extract_seconds:>10.1f}")
+    print(f"(text path includes {extract_seconds:.2f}s of local extraction)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Task states reported by get_speech_synthesis_task (SNS notifications use upper case)
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Notifications for tasks nobody is waiting on yet are kept this long (and at most this many)
+EARLY_TTL = 300
+# Tasks this process waited on are remembered this long, so late notifications for them are consumed
+KNOWN_TTL = 3600
+MAX_REMEMBERED = 10000
+# Waits give up after this long, so a notification older than that has nobody left to claim it
+TASK_TIMEOUT = 1800
+
+_shared_loop = None
+_shared_waiter = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_loop():
+    """Return the process-wide event loop that task waits run on, starting it on first use."""
+    global _shared_loop
+    with _shared_lock:
+        if _shared_loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="polly-waiter", daemon=True).start()
+            _shared_loop = loop
+        return _shared_loop
+
+
+def parse_task_notification(body):
+    """Turn a Polly task notification (raw or wrapped in an SNS envelope) into an event dict."""
+    message = json.loads(body) if isinstance(body, str) else body
+    if 'Message' in message and 'taskId' not in message:
+        message = json.loads(message['Message'])
+    return {
+        'task_id': message['taskId'],
+        'status': message['taskStatus'].lower(),
+        'output_uri': message.get('outputUri'),
+        'reason': message.get('taskStatusReason')
+    }
+
+
+class LocalNotificationQueue:
+    """In-process stand-in for the SNS/SQS completion channel, for local runs and tests.
+
+    Publish Polly-style task notifications with publish(); the waiter consumes
+    them exactly as it would messages from SQS.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+
+    def publish(self, task_id, status, output_uri=None, reason=None):
+        self._queue.put(json.dumps({
+            'taskId': task_id, 'taskStatus': status, 'outputUri': output_uri, 'taskStatusReason': reason
+        }))
+
+    def receive(self, wait_seconds=1, accept=None):
+        """Block up to wait_seconds and return the notifications received (all of them: the queue is private)."""
+        try:
+            bodies = [self._queue.get(timeout=wait_seconds)]
+        except queue.Empty:
+            return []
+        while True:
+            try:
+                bodies.append(self._queue.get_nowait())
+            except queue.Empty:
+                return [parse_task_notification(body) for body in bodies]
+
+
+class SQSNotificationSource:
+    """Task notifications from an SQS queue subscribed to the SNS topic passed to Polly."""
+
+    def __init__(self, sqs_client, queue_url, topic_arn, max_age=TASK_TIMEOUT):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.topic_arn = topic_arn
+        self.max_age = max_age
+
+    def receive(self, wait_seconds=1, accept=None):
+        """Return notifications for tasks accepted by accept(task_id) and delete them from the queue.
+
+        Other notifications belong to other processes sharing the queue; they are
+        made visible again right away instead of being deleted. Unclaimed ones older
+        than max_age (e.g. for tasks of a run that crashed) are deleted, since every
+        wait that could claim them has timed out, so they don't circulate forever.
+        """
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=10,
+            WaitTimeSeconds=wait_seconds,
+            AttributeNames=['SentTimestamp']
+        )
+        events = []
+        now = time.time()
+        for message in response.get('Messages', []):
+            try:
+                event = parse_task_notification(message['Body'])
+            except (ValueError, KeyError):
+                print(f"Ignoring unexpected SQS message: {message['Body'][:200]}")
+                event = None
+            if event is not None and accept is not None and not accept(event['task_id']):
+                if self._expired(message, now):
+                    print(f"Deleting unclaimed notification for Polly task {event['task_id']}")
+                else:
+                    self.sqs_client.change_message_visibility(
+                        QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'], VisibilityTimeout=0
+                    )
+                    continue
+            elif event is not None:
+                events.append(event)
+            self.sqs_client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message['ReceiptHandle'])
+        return events
+
+    def _expired(self, message, now):
+        sent = message.get('Attributes', {}).get('SentTimestamp')
+        return sent is not None and now - int(sent) / 1000 > self.max_age
+
+
+class PollyTaskWaiter:
+    """Wait for Polly synthesis tasks on a shared event loop.
+
+    With a notification source, waits resolve as soon as the completion
+    notification arrives and only fall back to an occasional status call in case
+    a message is lost. Without one, tasks are polled with a backoff whose first
+    check is timed from the expected synthesis duration; the rate used for that
+    estimate is learned from the tasks seen so far. Any number of jobs can wait
+    at once without a thread each.
+    """
+
+    def __init__(self, polly_client, notification_source=None, min_interval=1.0, max_interval=15.0,
+                 backoff=1.5, seconds_per_kchar=1.0, base_seconds=2.0, timeout=TASK_TIMEOUT):
+        self.polly_client = polly_client
+        self.notification_source = notification_source
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.seconds_per_kchar = seconds_per_kchar
+        self.base_seconds = base_seconds
+        self.timeout = timeout
+        self.loop = get_shared_loop()
+        self._waiting = {}
+        self._early = OrderedDict()  # task_id -> (received at, event), for notifications that beat the wait
+        self._known = OrderedDict()  # task_id -> (last waited on, None), for tasks this process started
+        self._lock = threading.Lock()
+        self._dispatcher = None
+
+    def expected_seconds(self, characters):
+        return self.base_seconds + self.seconds_per_kchar * characters / 1000
+
+    def _record_duration(self, characters, elapsed):
+        if characters <= 0:
+            return
+        observed = max(0.0, elapsed - self.base_seconds) * 1000 / characters
+        # Exponential moving average so one slow task doesn't skew every later wait
+        self.seconds_per_kchar = 0.8 * self.seconds_per_kchar + 0.2 * observed
+
+    def wait_for_tasks(self, task_ids, characters=0):
+        """Block until every task has completed and return {task_id: output_uri}.
+
+        Raises RuntimeError if a task fails and TimeoutError if they take longer
+        than the waiter's timeout.
+        """
+        future = asyncio.run_coroutine_threadsafe(self.wait_all(task_ids, characters), self.loop)
+        return future.result()
+
+    async def wait_all(self, task_ids, characters=0):
+        uris = await asyncio.gather(*(self.wait_for_task(task_id, characters) for task_id in task_ids))
+        return dict(zip(task_ids, uris))
+
+    async def wait_for_task(self, task_id, characters=0):
+        start = time.time()
+        notified = self._subscribe(task_id) if self.notification_source else None
+        delay = max(self.min_interval, self.expected_seconds(characters))
+        if notified is not None:
+            # Notifications do the work; status calls are only a safety net
+            delay = max(delay, self.max_interval)
+
+        try:
+            while True:
+                remaining = self.timeout - (time.time() - start)
+                if remaining <= 0:
+                    raise TimeoutError(f"Polly task {task_id} did not finish within {self.timeout}s")
+
+                if notified is not None:
+                    try:
+                        event = await asyncio.wait_for(asyncio.shield(notified), timeout=min(delay, remaining))
+                    except asyncio.TimeoutError:
+                        event = await self._poll(task_id)
+                else:
+                    await asyncio.sleep(min(delay, remaining))
+                    event = await self._poll(task_id)
+
+                if event['status'] == COMPLETED:
+                    self._record_duration(characters, time.time() - start)
+                    return event['output_uri']
+                if event['status'] == FAILED:
+                    raise RuntimeError(f"Polly task {task_id} failed: {event.get('reason')}")
+                delay = min(max(delay * self.backoff, self.min_interval), self.max_interval)
+        finally:
+            if notified is not None:
+                with self._lock:
+                    self._waiting.pop(task_id, None)
+
+    async def _poll(self, task_id):
+        response = await self.loop.run_in_executor(
+            None, lambda: self.polly_client.get_speech_synthesis_task(TaskId=task_id)
+        )
+        task = response['SynthesisTask']
+        return {
+            'task_id': task_id,
+            'status': task['TaskStatus'].lower(),
+            'output_uri': task.get('OutputUri'),
+            'reason': task.get('TaskStatusReason')
+        }
+
+    def _forget_expired(self, now):
+        """Drop early notifications and known tasks past their TTL or over the size cap (call under _lock)."""
+        for entries, ttl in ((self._early, EARLY_TTL), (self._known, KNOWN_TTL)):
+            while entries and (len(entries) > MAX_REMEMBERED or now - next(iter(entries.values()))[0] > ttl):
+                entries.popitem(last=False)
+
+    def _accepts(self, task_id):
+        """Whether a notification is for a task of this process (waiting now or waited on recently)."""
+        with self._lock:
+            return task_id in self._waiting or task_id in self._known
+
+    def _subscribe(self, task_id):
+        future = self.loop.create_future()
+        now = time.time()
+        with self._lock:
+            self._known[task_id] = (now, None)
+            self._known.move_to_end(task_id)
+            self._forget_expired(now)
+            early = self._early.pop(task_id, None)
+            if early is not None:
+                future.set_result(early[1])
+            else:
+                self._waiting[task_id] = future
+        if self._dispatcher is None:
+            self._dispatcher = self.loop.create_task(self._dispatch())
+        return future
+
+    async def _dispatch(self):
+        """Route notifications to the tasks waiting on them."""
+        while True:
+            try:
+                events = await self.loop.run_in_executor(None, self.notification_source.receive, 1, self._accepts)
+            except RuntimeError:
+                return  # executor shut down at interpreter exit
+            except Exception as e:
+                print(f"Error receiving Polly notifications: {e}")
+                await asyncio.sleep(self.max_interval)
+                continue
+            for event in events:
+                if event['status'] not in (COMPLETED, FAILED):
+                    continue
+                with self._lock:
+                    future = self._waiting.pop(event['task_id'], None)
+                    if future is None and event['task_id'] not in self._known:
+                        # The notification beat the wait call; keep it for a while in case it is registered
+                        now = time.time()
+                        self._early[event['task_id']] = (now, event)
+                        self._forget_expired(now)
+                if future is not None and not future.done():
+                    future.set_result(event)
+
+
+def get_shared_waiter(polly_client, source_factory=None):
+    """Return the process-wide waiter, so every job's tasks share one loop and one notification consumer.
+
+    source_factory is only called when the waiter is first created.
+    """
+    global _shared_waiter
+    waiter = _shared_waiter
+    if waiter is None:
+        waiter = PollyTaskWaiter(polly_client, source_factory() if source_factory else None)
+        with _shared_lock:
+            if _shared_waiter is None:
+                _shared_waiter = waiter
+            waiter = _shared_waiter
+    return waiter
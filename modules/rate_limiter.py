@@ -0,0 +1,37 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Cap concurrent calls and space out their start times.
+
+    Use as a context manager around each API call:
+
+        with limiter:
+            processor.process_pdf(...)
+    """
+
+    def __init__(self, max_concurrent=3, min_interval=1.0):
+        self.min_interval = min_interval
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def acquire(self):
+        self._semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_start - now
+            self._next_start = max(now, self._next_start) + self.min_interval
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self):
+        self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
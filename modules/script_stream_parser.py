@@ -0,0 +1,119 @@
+import json
+import re
+
+SCRIPT_KEY_PATTERN = re.compile(r'"script"\s*:\s*"')
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def decode_unicode_escape(raw, i):
+    """Decode the \\uXXXX escape at raw[i] as (text, length consumed), or None if more input is needed.
+
+    A surrogate pair (two escapes) decodes to one character. Lone surrogates
+    become U+FFFD so the text can be UTF-8 encoded; a malformed escape only
+    consumes its backslash, leaving the rest as literal text.
+    """
+    if i + 6 > len(raw):
+        return None
+    try:
+        text = json.loads(f'"{raw[i:i + 6]}"')
+    except ValueError:
+        return "", 1
+    if '\ud800' <= text <= '\udbff':
+        next_escape = raw[i + 6:i + 8]
+        if len(raw) < i + 12 and "\\u".startswith(next_escape):
+            return None  # the low half may still be on its way
+        if next_escape == "\\u":
+            try:
+                pair = json.loads(f'"{raw[i:i + 12]}"')
+            except ValueError:
+                pair = ""
+            if len(pair) == 1:
+                return pair, 12
+        return "\ufffd", 6
+    if '\udc00' <= text <= '\udfff':
+        return "\ufffd", 6
+    return text, 6
+
+
+class ScriptStreamParser:
+    """Incrementally pull complete sentences out of the "script" field of a streamed JSON response.
+
+    Feed raw text chunks as they arrive from the model; each call returns the
+    sentences that were completed by that chunk. Call finish() once the stream
+    ends to get whatever is left.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self.position = None  # index in raw of the next undecoded script character
+        self.done = False
+        self.pending = ""  # decoded script text not yet emitted as a sentence
+        self.script = ""  # all script text decoded so far
+
+    def feed(self, chunk):
+        self.raw += chunk
+        if self.done:
+            return []
+
+        if self.position is None:
+            match = SCRIPT_KEY_PATTERN.search(self.raw)
+            if not match:
+                return []
+            self.position = match.end()
+
+        self._decode_available()
+        return self._take_sentences(final=self.done)
+
+    def finish(self):
+        """Return the remaining sentences once the stream has ended."""
+        return self._take_sentences(final=True)
+
+    def _decode_available(self):
+        raw = self.raw
+        i = self.position
+        decoded = []
+        while i < len(raw):
+            char = raw[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char == '\\':
+                if i + 1 >= len(raw):
+                    break  # wait for the rest of the escape sequence
+                escape = raw[i + 1]
+                if escape == 'u':
+                    unicode_escape = decode_unicode_escape(raw, i)
+                    if unicode_escape is None:
+                        break
+                    text, length = unicode_escape
+                    decoded.append(text)
+                    i += length
+                    continue
+                decoded.append(ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            decoded.append(char)
+            i += 1
+        self.position = i
+        text = "".join(decoded)
+        self.pending += text
+        self.script += text
+
+    def _take_sentences(self, final=False):
+        """Split off sentences that end in .!? followed by whitespace, or at a line break."""
+        sentences = []
+        start = 0
+        text = self.pending
+        for match in re.finditer(r'[.!?]+["\')\]]*(?=\s)|\n|\\n', text):
+            sentence = text[start:match.end()].replace('\\n', ' ').strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+
+        remainder = text[start:]
+        if final and remainder.strip():
+            sentences.append(remainder.replace('\\n', ' ').strip())
+            remainder = ""
+        self.pending = remainder
+        return sentences
@@ -0,0 +1,355 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from modules.file_utils import sha256_file
+
+STATE_DB = "state.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    name TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    details TEXT NOT NULL DEFAULT '{}',
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at);
+
+CREATE TABLE IF NOT EXISTS stages (
+    job TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    inputs TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job, stage)
+);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    job TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    label TEXT NOT NULL,
+    path TEXT NOT NULL,
+    sha256 TEXT,
+    PRIMARY KEY (job, stage, label)
+);
+CREATE INDEX IF NOT EXISTS artifacts_path ON artifacts (path);
+
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    sha256 TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS uploads (
+    provider TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    remote_id TEXT NOT NULL,
+    file_name TEXT,
+    uploaded_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (provider, file_hash)
+);
+
+CREATE TABLE IF NOT EXISTS footage_sources (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    duration REAL NOT NULL,
+    cursor REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS footage_leases (
+    id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    holder TEXT,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS footage_leases_path ON footage_leases (path);
+
+CREATE TABLE IF NOT EXISTS footage_used (
+    path TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS footage_used_path ON footage_used (path);
+
+CREATE TABLE IF NOT EXISTS provider_stats (
+    provider TEXT PRIMARY KEY,
+    latencies TEXT NOT NULL DEFAULT '[]',
+    successes INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class StateStore:
+    """Pipeline state in one SQLite database: jobs, stage status, artifacts, uploads and footage.
+
+    The database runs in WAL mode, so readers never block the writer, and every
+    read-modify-write happens in a BEGIN IMMEDIATE transaction, so any number of
+    threads and processes can update it concurrently. Each thread (and each
+    forked process) opens its own connection.
+    """
+
+    def __init__(self, path=STATE_DB, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Hold the write lock for the whole block; commits on success, rolls back on error."""
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    # Jobs
+
+    @staticmethod
+    def _job_from_row(row):
+        return dict(json.loads(row["details"]), name=row["name"], status=row["status"],
+                    updated_at=row["updated_at"])
+
+    def get_job(self, name):
+        row = self.connection().execute("SELECT * FROM jobs WHERE name = ?", (name,)).fetchone()
+        return self._job_from_row(row) if row else None
+
+    def set_job_status(self, name, status, **details):
+        """Set a job's status, merging details into what is already recorded for it."""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT details FROM jobs WHERE name = ?", (name,)).fetchone()
+            merged = dict(json.loads(row["details"]) if row else {}, **details)
+            conn.execute(
+                "INSERT INTO jobs (name, status, details, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET status = excluded.status, details = excluded.details, "
+                "updated_at = excluded.updated_at",
+                (name, status, json.dumps(merged), time.time())
+            )
+
+    def list_jobs(self, status=None):
+        """Jobs ordered by most recent update, optionally only those with the given status."""
+        query = "SELECT * FROM jobs"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        rows = self.connection().execute(query + " ORDER BY updated_at DESC", params).fetchall()
+        return [self._job_from_row(row) for row in rows]
+
+    # Stages and artifacts
+
+    def get_stage(self, job, stage):
+        """The recorded stage as {'status', 'inputs', 'artifacts', 'result', ...}, or {} if it never ran."""
+        conn = self.connection()
+        row = conn.execute("SELECT * FROM stages WHERE job = ? AND stage = ?", (job, stage)).fetchone()
+        if row is None:
+            return {}
+        record = {'status': row["status"], 'attempts': row["attempts"], 'updated_at': row["updated_at"]}
+        if row["status"] == 'completed':
+            record['inputs'] = json.loads(row["inputs"])
+            record['result'] = json.loads(row["result"])
+            record['artifacts'] = {artifact["label"]: artifact["sha256"] for artifact in conn.execute(
+                "SELECT label, sha256 FROM artifacts WHERE job = ? AND stage = ?", (job, stage))}
+        else:
+            record['error'] = row["error"]
+        return record
+
+    def mark_stage_complete(self, job, stage, inputs, artifacts, result=None):
+        """Record a completed stage; inputs map label -> hash, artifacts map label -> (path, hash)."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stages (job, stage, status, inputs, result, error, attempts, updated_at) "
+                "VALUES (?, ?, 'completed', ?, ?, NULL, 0, ?)",
+                (job, stage, json.dumps(inputs), json.dumps(result), time.time())
+            )
+            conn.execute("DELETE FROM artifacts WHERE job = ? AND stage = ?", (job, stage))
+            conn.executemany(
+                "INSERT INTO artifacts (job, stage, label, path, sha256) VALUES (?, ?, ?, ?, ?)",
+                [(job, stage, label, path, digest) for label, (path, digest) in artifacts.items()]
+            )
+
+    def mark_stage_failed(self, job, stage, error, attempts):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stages (job, stage, status, inputs, result, error, attempts, updated_at) "
+                "VALUES (?, ?, 'failed', NULL, NULL, ?, ?, ?)",
+                (job, stage, str(error), attempts, time.time())
+            )
+            conn.execute("DELETE FROM artifacts WHERE job = ? AND stage = ?", (job, stage))
+
+    def file_hash(self, path):
+        """SHA-256 of a file, reused from the last hash while its size and mtime are unchanged; None if missing."""
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        conn = self.connection()
+        row = conn.execute("SELECT size, mtime, sha256 FROM file_hashes WHERE path = ?", (key,)).fetchone()
+        if row and row["size"] == stat.st_size and row["mtime"] == stat.st_mtime:
+            return row["sha256"]
+        digest = sha256_file(path)
+        conn.execute("INSERT OR REPLACE INTO file_hashes (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+                     (key, stat.st_size, stat.st_mtime, digest))
+        return digest
+
+    # Uploads
+
+    def get_upload(self, provider, file_hash):
+        row = self.connection().execute(
+            "SELECT * FROM uploads WHERE provider = ? AND file_hash = ?", (provider, file_hash)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def put_upload(self, provider, file_hash, remote_id, file_name=None, uploaded_at=None, expires_at=None):
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO uploads (provider, file_hash, remote_id, file_name, uploaded_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (provider, file_hash, remote_id, file_name, uploaded_at or time.time(), expires_at)
+            )
+            conn.execute("DELETE FROM uploads WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def delete_upload(self, provider, file_hash):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM uploads WHERE provider = ? AND file_hash = ?", (provider, file_hash))
+
+    # LLM provider stats
+
+    def get_provider_stats(self, provider):
+        """{'latencies', 'successes', 'errors'} recorded for a provider, or {} if it was never called."""
+        row = self.connection().execute("SELECT * FROM provider_stats WHERE provider = ?", (provider,)).fetchone()
+        if row is None:
+            return {}
+        return {'latencies': json.loads(row["latencies"]), 'successes': row["successes"], 'errors': row["errors"]}
+
+    def record_provider_call(self, provider, latency, success, max_samples=100):
+        """Add one call's outcome to a provider's stats, keeping the last max_samples successful latencies."""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT latencies FROM provider_stats WHERE provider = ?", (provider,)).fetchone()
+            latencies = json.loads(row["latencies"]) if row else []
+            if success:
+                latencies = (latencies + [latency])[-max_samples:]
+            conn.execute(
+                "INSERT INTO provider_stats (provider, latencies, successes, errors) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (provider) DO UPDATE SET latencies = excluded.latencies, "
+                "successes = successes + excluded.successes, errors = errors + excluded.errors",
+                (provider, json.dumps(latencies), int(success), int(not success))
+            )
+
+    # Settings
+
+    def get_setting(self, key, default=None):
+        row = self.connection().execute("SELECT value FROM settings WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+    def set_setting(self, key, value):
+        """Set or remove (value=None) one setting."""
+        with self.transaction() as conn:
+            if value is None:
+                conn.execute("DELETE FROM settings WHERE key = ?", (key,))
+            else:
+                conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
+
+    # Footage (call these inside transaction(), except get_footage_sources)
+
+    def get_footage_sources(self):
+        """The known sources, read without taking the write lock."""
+        return {row["path"]: dict(row) for row in self.connection().execute("SELECT * FROM footage_sources")}
+
+    def load_footage(self, conn):
+        """Return (sources, live leases, ranges used this cycle by path, next source index), dropping expired leases."""
+        conn.execute("DELETE FROM footage_leases WHERE expires_at <= ?", (time.time(),))
+        sources = {row["path"]: dict(row) for row in conn.execute("SELECT * FROM footage_sources")}
+        leases = {row["id"]: dict(row) for row in conn.execute("SELECT * FROM footage_leases")}
+        used = {}
+        for row in conn.execute("SELECT path, start, end FROM footage_used"):
+            used.setdefault(row["path"], []).append((row["start"], row["end"]))
+        row = conn.execute("SELECT value FROM settings WHERE key = 'footage_next_source'").fetchone()
+        return sources, leases, used, int(row["value"]) if row else 0
+
+    def save_footage_sources(self, conn, sources):
+        """Replace the known sources (and their cursors); leases and used ranges of removed sources go with them."""
+        placeholders = ", ".join("?" for _ in sources)
+        conn.execute(f"DELETE FROM footage_sources WHERE path NOT IN ({placeholders})", list(sources))
+        conn.execute(f"DELETE FROM footage_leases WHERE path NOT IN ({placeholders})", list(sources))
+        conn.execute(f"DELETE FROM footage_used WHERE path NOT IN ({placeholders})", list(sources))
+        conn.executemany(
+            "INSERT OR REPLACE INTO footage_sources (path, size, mtime, duration, cursor) VALUES (?, ?, ?, ?, ?)",
+            [(path, source['size'], source['mtime'], source['duration'], source['cursor'])
+             for path, source in sources.items()]
+        )
+
+    def add_footage_lease(self, conn, lease, next_source):
+        conn.execute(
+            "INSERT INTO footage_leases (id, path, start, end, holder, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (lease['id'], lease['path'], lease['start'], lease['end'], lease['holder'], lease['expires_at'])
+        )
+        conn.execute("INSERT INTO footage_used (path, start, end) VALUES (?, ?, ?)",
+                     (lease['path'], lease['start'], lease['end']))
+        conn.execute("UPDATE footage_sources SET cursor = MAX(cursor, ?) WHERE path = ?", (lease['end'], lease['path']))
+        conn.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('footage_next_source', ?)",
+                     (str(next_source),))
+
+    def clear_footage_used(self, conn, paths=None):
+        """Start a new cycle for the given sources (all of them by default)."""
+        if paths is None:
+            conn.execute("DELETE FROM footage_used")
+        else:
+            conn.executemany("DELETE FROM footage_used WHERE path = ?", [(path,) for path in paths])
+
+    def release_footage_lease(self, lease_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM footage_leases WHERE id = ?", (lease_id,))
+
+
+# Shared by everything in the process; connections are opened lazily per thread
+state_store = StateStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show pipeline jobs recorded in the state database")
+    parser.add_argument("--status", default=None, help="Only show jobs with this status")
+    parser.add_argument("--db", default=STATE_DB)
+    args = parser.parse_args()
+
+    store = StateStore(args.db)
+    for job in store.list_jobs(args.status):
+        updated = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job['updated_at']))
+        print(f"{updated}  {job['status']:<12} {job['name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import argparse
+import io
+import os
+import random
+import re
+import time
+from html import unescape
+from modules.file_utils import load_json, atomic_write_json
+
+MARKS_FOLDER = os.path.join("audio", "marks")
+SUBTITLES_FOLDER = os.path.join("audio", "subtitles")
+DEFAULT_MAX_CHARS = 12
+# How long the last caption stays up when the audio duration is unknown
+LAST_CAPTION_MS = 1000
+
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*$')
+SRT_CUE_START = re.compile(r'^(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->', re.MULTILINE)
+ASS_CUE_START = re.compile(r'^Dialogue:\s*[^,]*,(\d+):(\d{2}):(\d{2})\.(\d{2}),', re.MULTILINE)
+
+
+def words_from_marks(ssml_text, marks):
+    """Attach Polly word marks to the whitespace-delimited tokens of the SSML they were made from.
+
+    Word marks carry byte offsets into the SSML and omit punctuation, so each
+    token of the original text takes the time of the first mark inside it;
+    tokens without a mark (a lone dash, say) are glued onto the previous word.
+    Returns [{'time': ms, 'text': token}, ...] in speaking order.
+    """
+    data = ssml_text.encode('utf-8')
+    body_start = data.find(b'>') + 1 if data.startswith(b'<speak') else 0
+    body_end = data.rfind(b'</speak>')
+    if body_end == -1:
+        body_end = len(data)
+
+    word_marks = sorted((m for m in marks if m['type'] == 'word'), key=lambda m: m['start'])
+    words = []
+    pending = ""
+    mark_index = 0
+    for match in re.finditer(rb'\S+', data[body_start:body_end]):
+        start = body_start + match.start()
+        end = body_start + match.end()
+        text = unescape(match.group().decode('utf-8'))
+
+        while mark_index < len(word_marks) and word_marks[mark_index]['start'] < start:
+            mark_index += 1
+        if mark_index < len(word_marks) and word_marks[mark_index]['start'] < end:
+            words.append({'time': word_marks[mark_index]['time'], 'text': pending + text})
+            pending = ""
+        elif words:
+            words[-1]['text'] += " " + text
+        else:
+            pending += text + " "
+    return words
+
+
+def shift_words(words, offset_ms):
+    return [dict(word, time=word['time'] + offset_ms) for word in words]
+
+
+def chunk_words(words, max_chars=DEFAULT_MAX_CHARS):
+    """Yield caption lines of at most max_chars as word lists, never spanning a sentence end.
+
+    A word longer than max_chars gets a caption of its own.
+    """
+    chunk = []
+    length = 0
+    for word in words:
+        word_length = len(word['text'])
+        if chunk and (word_length > max_chars or length + 1 + word_length > max_chars):
+            yield chunk
+            chunk = []
+            length = 0
+        chunk.append(word)
+        length = word_length if length == 0 else length + 1 + word_length
+        if word_length > max_chars or SENTENCE_END.search(word['text']):
+            yield chunk
+            chunk = []
+            length = 0
+    if chunk:
+        yield chunk
+
+
+def iter_cues(words, duration_ms=None, max_chars=DEFAULT_MAX_CHARS):
+    """Yield (start_ms, end_ms, words) cues in one pass; each cue lasts until the next one starts."""
+    previous = None
+    for chunk in chunk_words(words, max_chars):
+        if previous is not None:
+            yield previous[0]['time'], chunk[0]['time'], previous
+        previous = chunk
+    if previous is not None:
+        end = max(duration_ms or 0, previous[-1]['time'] + LAST_CAPTION_MS)
+        yield previous[0]['time'], end, previous
+
+
+def format_srt_time(ms):
+    hours, ms = divmod(int(ms), 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def format_ass_time(ms):
+    hours, ms = divmod(int(ms), 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}.{ms // 10:02d}"
+
+
+def iter_srt(cues):
+    """Yield SRT blocks for (start_ms, end_ms, words) cues."""
+    for i, (start, end, chunk) in enumerate(cues, 1):
+        text = ' '.join(word['text'] for word in chunk)
+        yield f"{i}\n{format_srt_time(start)} --> {format_srt_time(end)}\n{text}\n\n"
+
+
+def iter_ass(cues, width=1080, height=1920, font="Arial", font_size=70):
+    """Yield an ASS script with karaoke tags so each word is highlighted as it is spoken."""
+    yield (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {width}\n"
+        f"PlayResY: {height}\n"
+        "WrapStyle: 0\n\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        f"Style: Default,{font},{font_size},&H0000FFFF,&H00FFFFFF,&H00000000,&H00000000,"
+        "-1,0,0,0,100,100,0,0,1,4,0,5,20,20,20,1\n\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    for start, end, chunk in cues:
+        parts = []
+        for i, word in enumerate(chunk):
+            word_end = chunk[i + 1]['time'] if i + 1 < len(chunk) else end
+            # \k durations are in centiseconds
+            centiseconds = max(0, (word_end - word['time']) // 10)
+            text = word['text'].replace('{', '(').replace('}', ')')
+            parts.append(f"{{\\k{centiseconds}}}{text}")
+        yield f"Dialogue: 0,{format_ass_time(start)},{format_ass_time(end)},Default,,0,0,0,,{' '.join(parts)}\n"
+
+
+SUBTITLE_FORMATS = {
+    'srt': iter_srt,
+    'ass': iter_ass,
+}
+
+
+def write_subtitles(lines, path):
+    """Write generated subtitle text to path as it is produced."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+
+def read_cue_starts(path):
+    """Start times in seconds of every cue in an SRT or ASS file, in order."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith('.ass'):
+        starts = [int(h) * 3600 + int(m) * 60 + int(s) + int(cs) / 100
+                  for h, m, s, cs in ASS_CUE_START.findall(text)]
+    else:
+        starts = [int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+                  for h, m, s, ms in SRT_CUE_START.findall(text)]
+    return sorted(starts)
+
+
+def get_marks_path(base_name, marks_folder=MARKS_FOLDER):
+    return os.path.join(marks_folder, f"{base_name}.json")
+
+
+def save_marks(base_name, words, duration_ms, marks_folder=MARKS_FOLDER):
+    """Persist aligned word timings so subtitles can be laid out again without re-synthesis."""
+    os.makedirs(marks_folder, exist_ok=True)
+    marks_path = get_marks_path(base_name, marks_folder)
+    atomic_write_json(marks_path, {'duration_ms': duration_ms, 'words': words})
+    return marks_path
+
+
+def relayout_subtitles(base_name, max_chars=DEFAULT_MAX_CHARS, subtitle_format='srt', marks_folder=MARKS_FOLDER,
+                       subtitles_folder=SUBTITLES_FOLDER):
+    """Regenerate audio/subtitles/<base_name>.<format> from saved word marks with a new chunking policy."""
+    if subtitle_format not in SUBTITLE_FORMATS:
+        raise ValueError(f"Unknown subtitle format: {subtitle_format}")
+    marks = load_json(get_marks_path(base_name, marks_folder))
+    if marks is None:
+        raise FileNotFoundError(f"No speech marks saved for {base_name}")
+
+    os.makedirs(subtitles_folder, exist_ok=True)
+    path = os.path.join(subtitles_folder, f"{base_name}.{subtitle_format}")
+    cues = iter_cues(marks['words'], marks.get('duration_ms'), max_chars)
+    write_subtitles(SUBTITLE_FORMATS[subtitle_format](cues), path)
+    return path
+
+
+def synthetic_words(count, seed=0):
+    """Word timings shaped like real speech marks, for benchmarking."""
+    rng = random.Random(seed)
+    vocabulary = ["the", "brain", "is", "basically", "a", "neural", "network", "of", "cells,", "fr.",
+                  "mitochondria", "no", "cap!", "which", "means", "photosynthesis?", "lowkey", "insane."]
+    time_ms = 0
+    words = []
+    for _ in range(count):
+        words.append({'time': time_ms, 'text': rng.choice(vocabulary)})
+        time_ms += rng.randint(150, 450)
+    return words
+
+
+def benchmark(sizes=(1000, 5000, 20000, 50000), repeat=3):
+    """Time cue layout plus SRT and ASS generation for synthetic scripts of increasing length."""
+    for size in sizes:
+        words = synthetic_words(size)
+        for subtitle_format, formatter in SUBTITLE_FORMATS.items():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = io.StringIO()
+                output.writelines(formatter(iter_cues(words)))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{size:>6} words  {subtitle_format}: {best * 1000:8.1f} ms  "
+                  f"({size / best / 1000:.0f}k words/s, {len(output.getvalue()) // 1024} KiB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild subtitles from saved speech marks")
+    parser.add_argument("base_names", nargs="*", help="Names of the audio files to re-layout")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_MAX_CHARS,
+                        help="Maximum characters per caption")
+    parser.add_argument("--format", choices=sorted(SUBTITLE_FORMATS), default="srt",
+                        help="Subtitle format; 'ass' adds per-word karaoke highlighting")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time subtitle generation on synthetic scripts of 1k-50k words")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    for base_name in args.base_names:
+        print(f"Subtitles written: {relayout_subtitles(base_name, args.max_chars, args.format)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,36 @@
-from datetime import timedelta
 import boto3
 import os
 import json
+import hashlib
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from modules.audio_utils import concat_mp3, mp3_duration_ms, split_mp3
+from modules.disk_cache import DiskCache
+from modules.polly_waiter import get_shared_waiter, SQSNotificationSource
+from modules.subtitles import (
+    MARKS_FOLDER, SUBTITLES_FOLDER, words_from_marks, shift_words, save_marks, relayout_subtitles
+)
+
+# synthesize_speech accepts at most 3000 billed characters (6000 in total including tags);
+# chunks are sized on their full SSML length to stay under both limits.
+SYNC_SSML_LIMIT = 2800
+# Scripts needing more chunks than this use the asynchronous S3 task path instead.
+MAX_SYNC_CHUNKS = 40
+
+TTS_CACHE_FOLDER = os.path.join("cache", "tts")
+TTS_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+
+def tts_cache_key(ssml_text, voice_id, engine, output_format):
+    """Key synthesized output by the exact SSML sent plus the voice settings and output format."""
+    payload = json.dumps([ssml_text, voice_id, engine, output_format])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
 
 
 class PollyTTS:
-    def __init__(self):
+    def __init__(self, use_cache=True):
         load_dotenv()
         self.polly_client = boto3.client(
             'polly',
@@ -23,8 +45,15 @@ class PollyTTS:
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
         )
         self.bucket_name = 'akina-brainrot'
+        # Optional SNS topic for task completion, delivered to us through an SQS subscription
+        self.sns_topic_arn = os.getenv('POLLY_SNS_TOPIC_ARN')
+        self.sqs_queue_url = os.getenv('POLLY_SQS_QUEUE_URL')
+        self.voice_id = 'Matthew'
+        self.engine = 'neural'
+        self.cache = DiskCache(TTS_CACHE_FOLDER, max_bytes=TTS_CACHE_MAX_BYTES) if use_cache else None
         self.audio_folder = "audio"
-        self.subtitles_folder = "audio/subtitles"
+        self.subtitles_folder = SUBTITLES_FOLDER
+        self.marks_folder = MARKS_FOLDER
         os.makedirs(self.audio_folder, exist_ok=True)
         os.makedirs(self.subtitles_folder, exist_ok=True)
 
@@ -46,45 +75,44 @@ class PollyTTS:
 
         return ' '.join(cleaned_sentences)
 
-    def split_into_segments(self, text):
-        """Split text into segments based on character count."""
+    def split_into_sentences(self, text):
+        """Clean text and split it into sentences."""
         text = self.clean_text(text)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        segments = []
+        return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text) if sentence.strip()]
 
+    def split_into_sync_chunks(self, sentences):
+        """Group whole sentences into lists whose SSML fits one synthesize_speech call."""
+        chunks = []
+        current = []
+        for sentence in sentences:
+            if current and len(self.build_ssml(current + [sentence])) > SYNC_SSML_LIMIT:
+                chunks.append(current)
+                current = []
+            current.append(sentence)
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def split_into_synthesis_units(self, sentences):
+        """Sentence lists to synthesize one call each, packed into as few synchronous calls as possible.
+
+        With the cache enabled, cached sentences are units of their own (read back
+        from disk) and only runs of uncached sentences are packed; synthesize_unit
+        then caches each sentence of a packed call under its own key.
+        """
+        if self.cache is None:
+            return self.split_into_sync_chunks(sentences)
+        units = []
+        misses = []
         for sentence in sentences:
-            if not sentence.strip():
-                continue
-
-            words = sentence.split()
-            chunk = []
-            chunk_length = 0
-
-            for word in words:
-                word_length = len(word)
-
-                # If single word is longer than 12 chars, make it its own segment
-                if word_length > 12:
-                    if chunk:
-                        segments.append(' '.join(chunk))
-                    segments.append(word)
-                    chunk = []
-                    chunk_length = 0
-                    continue
-
-                # If adding this word would exceed 12 chars, start new segment
-                if chunk_length + word_length + len(chunk) > 12:
-                    segments.append(' '.join(chunk))
-                    chunk = [word]
-                    chunk_length = word_length
-                else:
-                    chunk.append(word)
-                    chunk_length += word_length
-
-            if chunk:
-                segments.append(' '.join(chunk))
-
-        return segments
+            if self.is_cached(self.build_ssml([sentence])):
+                units.extend(self.split_into_sync_chunks(misses))
+                units.append([sentence])
+                misses = []
+            else:
+                misses.append(sentence)
+        units.extend(self.split_into_sync_chunks(misses))
+        return units
 
     def parse_speech_marks(self, s3_key):
         """Get timing information from speech marks."""
@@ -98,111 +126,258 @@ class PollyTTS:
 
         return marks
 
-    def convert_script_to_audio(self, script_path):
+    def build_ssml(self, sentences):
+        """Wrap sentences in plain SSML; caption layout is done afterwards from word marks."""
+        text = ' '.join(sentences).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        return f'<speak>{text}</speak>'
+
+    def cache_keys(self, ssml_text):
+        """(audio key, speech marks key) of the TTS cache entries for some SSML."""
+        return (tts_cache_key(ssml_text, self.voice_id, self.engine, 'mp3'),
+                tts_cache_key(ssml_text, self.voice_id, self.engine, 'json'))
+
+    def is_cached(self, ssml_text):
+        return self.cache is not None and all(key in self.cache for key in self.cache_keys(ssml_text))
+
+    def synthesize_ssml(self, ssml_text):
+        """Synthesize SSML synchronously and return (mp3_bytes, speech_marks), using the TTS cache."""
+        if self.cache is not None:
+            audio_key, marks_key = self.cache_keys(ssml_text)
+            audio = self.cache.get(audio_key)
+            marks = self.cache.get_json(marks_key)
+            if audio is not None and marks is not None:
+                return audio, marks
+
+        audio, marks = self.request_speech(ssml_text)
+        if self.cache is not None:
+            self.cache.put(audio_key, audio)
+            self.cache.put_json(marks_key, marks)
+        return audio, marks
+
+    def request_speech(self, ssml_text):
+        """Call synthesize_speech for the audio and the word marks of some SSML."""
+        audio_response = self.polly_client.synthesize_speech(
+            Text=ssml_text,
+            TextType='ssml',
+            OutputFormat='mp3',
+            VoiceId=self.voice_id,
+            Engine=self.engine
+        )
+        marks_response = self.polly_client.synthesize_speech(
+            Text=ssml_text,
+            TextType='ssml',
+            OutputFormat='json',
+            SpeechMarkTypes=['word'],
+            VoiceId=self.voice_id,
+            Engine=self.engine
+        )
+        audio = audio_response['AudioStream'].read()
+        marks_data = marks_response['AudioStream'].read().decode('utf-8')
+        marks = [json.loads(line) for line in marks_data.strip().split('\n') if line]
+        return audio, marks
+
+    def synthesize_unit(self, sentences):
+        """Synthesize one unit and return (mp3_bytes, words) with word times relative to the unit."""
+        ssml_text = self.build_ssml(sentences)
+        if self.cache is not None and len(sentences) > 1:
+            audio, marks = self.request_speech(ssml_text)
+            self.cache_sentences(sentences, audio, marks)
+        else:
+            audio, marks = self.synthesize_ssml(ssml_text)
+        return audio, words_from_marks(ssml_text, marks)
+
+    def cache_sentences(self, sentences, audio, marks):
+        """Store each sentence of a packed call as if it had been synthesized on its own.
+
+        The audio is cut at the frame where each sentence's first word starts, and
+        word times and byte offsets are made relative to the sentence's own audio
+        and SSML. Nothing is cached if a sentence has no word marks to cut at.
+        """
+        body_start = len('<speak>')
+        tags_length = len(self.build_ssml([]))
+        word_marks = [mark for mark in marks if mark['type'] == 'word']
+        offsets = []
+        sentence_marks = []
+        offset = body_start
+        for sentence in sentences:
+            end = offset + len(self.build_ssml([sentence]).encode('utf-8')) - tags_length
+            offsets.append(offset)
+            sentence_marks.append(sorted((mark for mark in word_marks if offset <= mark['start'] < end),
+                                         key=lambda mark: mark['start']))
+            offset = end + 1  # the space build_ssml joins sentences with
+        if not all(sentence_marks):
+            return
+
+        pieces, start_times = split_mp3(audio, [own[0]['time'] for own in sentence_marks[1:]])
+        if not all(pieces):
+            return
+        for sentence, piece, start_time, sentence_offset, own in zip(sentences, pieces, start_times, offsets,
+                                                                     sentence_marks):
+            shift = body_start - sentence_offset
+            audio_key, marks_key = self.cache_keys(self.build_ssml([sentence]))
+            self.cache.put(audio_key, piece)
+            self.cache.put_json(marks_key, [
+                dict(mark, time=mark['time'] - start_time, start=mark['start'] + shift, end=mark['end'] + shift)
+                for mark in own
+            ])
+
+    def stitch_chunks(self, chunk_results):
+        """Join per-chunk (audio, words) results into (mp3_bytes, words, duration_ms).
+
+        Each chunk's word times are shifted by the chunk's start time in the joined audio.
+        """
+        audio, offsets = concat_mp3([chunk_audio for chunk_audio, _ in chunk_results])
+        words = []
+        for offset, (_, chunk_words) in zip(offsets, chunk_results):
+            words.extend(shift_words(chunk_words, offset))
+        return audio, words, mp3_duration_ms(audio)
+
+    def write_outputs(self, base_name, words, duration_ms):
+        """Save the word marks and lay out the default subtitles from them."""
+        save_marks(base_name, words, duration_ms, self.marks_folder)
+        return relayout_subtitles(base_name, marks_folder=self.marks_folder, subtitles_folder=self.subtitles_folder)
+
+    def convert_sentence_stream_to_audio(self, sentence_batches, base_name, max_workers=4):
+        """Synthesize batches of sentences as they arrive and stitch them into one audio/SRT pair.
+
+        sentence_batches can be a generator that is still waiting on the LLM; each
+        batch is sent to Polly as soon as it is yielded.
+        """
         try:
-            print(f"Processing script: {script_path}")
+            futures = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for batch in sentence_batches:
+                    units = self.split_into_synthesis_units(self.split_into_sentences('\n'.join(batch)))
+                    for unit in units:
+                        futures.append(executor.submit(self.synthesize_unit, unit))
+                    print(f"Queued {len(units)} synthesis calls ({len(futures)} so far)")
+                chunk_results = [future.result() for future in futures]
 
-            with open(script_path, 'r', encoding='utf-8') as f:
-                script_data = json.load(f)
+            if not chunk_results:
+                raise ValueError("No script text received from stream")
 
-            text = script_data.get('script', '')
-            if not text:
-                raise ValueError("No script text found in JSON")
+            audio, words, duration_ms = self.stitch_chunks(chunk_results)
 
-            segments = self.split_into_segments(text)
-            print(f"Split text into {len(segments)} segments")
+            audio_path = os.path.join(self.audio_folder, f"{base_name}.mp3")
+            with open(audio_path, 'wb') as f:
+                f.write(audio)
+            srt_path = self.write_outputs(base_name, words, duration_ms)
 
-            ssml_text = '<speak>'
-            for i, segment in enumerate(segments):
-                segment = segment.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-                ssml_text += f'<mark name="segment_{i}"/>{segment} '
-            ssml_text += '</speak>'
+            print("Streaming synthesis completed successfully")
+            return {
+                'audio_path': audio_path,
+                'subtitle_path': srt_path
+            }
 
-            base_name = os.path.splitext(os.path.basename(script_path))[0]
-            s3_prefix = f"polly-output/{base_name.replace(' ', '_')}_{int(time.time())}"
-
-            # Generate audio
-            print("Starting speech synthesis task...")
-            audio_response = self.polly_client.start_speech_synthesis_task(
-                Text=ssml_text,
-                TextType='ssml',
-                OutputFormat='mp3',
-                VoiceId='Matthew',
-                Engine='neural',
-                OutputS3BucketName=self.bucket_name,
-                OutputS3KeyPrefix=s3_prefix
+        except Exception as e:
+            print(f"Error during streaming synthesis: {str(e)}")
+            raise RuntimeError(f"Error converting sentence stream to audio: {str(e)}")
+
+    def synthesize_units(self, units, max_workers=8):
+        """Synthesize sentence lists concurrently and stitch them in order into (mp3_bytes, words, duration_ms)."""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(self.synthesize_unit, units))
+        return self.stitch_chunks(chunk_results)
+
+    def notification_args(self):
+        """Ask Polly to announce task completion on SNS when a topic is configured."""
+        return {'SnsTopicArn': self.sns_topic_arn} if self.sns_topic_arn else {}
+
+    def get_task_waiter(self):
+        """Shared waiter for async tasks, consuming completion notifications from SQS when configured."""
+        def create_source():
+            if not (self.sns_topic_arn and self.sqs_queue_url):
+                return None
+            sqs_client = boto3.client(
+                'sqs',
+                region_name='eu-west-1',
+                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
             )
+            return SQSNotificationSource(sqs_client, self.sqs_queue_url, self.sns_topic_arn)
+
+        return get_shared_waiter(self.polly_client, create_source)
+
+    def synthesize_async(self, ssml_text, base_name, audio_path):
+        """Run Polly synthesis tasks through S3 for scripts too long for the synchronous API.
+
+        Downloads the audio to audio_path and returns the speech marks.
+        """
+        s3_prefix = f"polly-output/{base_name.replace(' ', '_')}_{int(time.time())}"
+
+        # Generate audio
+        print("Starting speech synthesis task...")
+        audio_response = self.polly_client.start_speech_synthesis_task(
+            Text=ssml_text,
+            TextType='ssml',
+            OutputFormat='mp3',
+            VoiceId=self.voice_id,
+            Engine=self.engine,
+            OutputS3BucketName=self.bucket_name,
+            OutputS3KeyPrefix=s3_prefix,
+            **self.notification_args()
+        )
 
-            # Generate speech marks in parallel
-            marks_response = self.polly_client.start_speech_synthesis_task(
-                Text=ssml_text,
-                TextType='ssml',
-                OutputFormat='json',
-                SpeechMarkTypes=['ssml', 'word'],
-                VoiceId='Matthew',
-                Engine='neural',
-                OutputS3BucketName=self.bucket_name,
-                OutputS3KeyPrefix=f"{s3_prefix}_marks"
-            )
+        # Generate speech marks in parallel
+        marks_response = self.polly_client.start_speech_synthesis_task(
+            Text=ssml_text,
+            TextType='ssml',
+            OutputFormat='json',
+            SpeechMarkTypes=['word'],
+            VoiceId=self.voice_id,
+            Engine=self.engine,
+            OutputS3BucketName=self.bucket_name,
+            OutputS3KeyPrefix=f"{s3_prefix}_marks",
+            **self.notification_args()
+        )
 
-            # Wait for both tasks to complete
-            audio_task_id = audio_response['SynthesisTask']['TaskId']
-            marks_task_id = marks_response['SynthesisTask']['TaskId']
+        # Wait for both tasks to complete
+        audio_task_id = audio_response['SynthesisTask']['TaskId']
+        marks_task_id = marks_response['SynthesisTask']['TaskId']
+        uris = self.get_task_waiter().wait_for_tasks([audio_task_id, marks_task_id], characters=len(ssml_text))
+        audio_key = uris[audio_task_id].split(self.bucket_name + '/')[1]
+        marks_key = uris[marks_task_id].split(self.bucket_name + '/')[1]
 
-            while True:
-                audio_status = self.polly_client.get_speech_synthesis_task(TaskId=audio_task_id)
-                marks_status = self.polly_client.get_speech_synthesis_task(TaskId=marks_task_id)
+        print("Downloading audio file...")
+        self.s3_client.download_file(self.bucket_name, audio_key, audio_path)
+        return self.parse_speech_marks(marks_key)
 
-                print(f"Audio status: {audio_status['SynthesisTask']['TaskStatus']}")
-                print(f"Marks status: {marks_status['SynthesisTask']['TaskStatus']}")
+    def convert_script_to_audio(self, script_path):
+        try:
+            print(f"Processing script: {script_path}")
 
-                if (audio_status['SynthesisTask']['TaskStatus'] == 'completed' and
-                        marks_status['SynthesisTask']['TaskStatus'] == 'completed'):
-                    audio_uri = audio_status['SynthesisTask']['OutputUri']
-                    marks_uri = marks_status['SynthesisTask']['OutputUri']
-                    audio_key = audio_uri.split(self.bucket_name + '/')[1]
-                    marks_key = marks_uri.split(self.bucket_name + '/')[1]
-                    break
-                elif any(status['SynthesisTask']['TaskStatus'] in ['failed', 'error']
-                         for status in [audio_status, marks_status]):
-                    raise Exception("Speech synthesis task failed")
+            with open(script_path, 'r', encoding='utf-8') as f:
+                script_data = json.load(f)
 
-                time.sleep(5)
+            text = script_data.get('script', '')
+            if not text:
+                raise ValueError("No script text found in JSON")
 
-            # Download files
+            base_name = os.path.splitext(os.path.basename(script_path))[0]
             audio_path = os.path.join(self.audio_folder, f"{base_name}.mp3")
-            srt_path = os.path.join(self.subtitles_folder, f"{base_name}.srt")
-
-            print("Downloading audio file...")
-            self.s3_client.download_file(self.bucket_name, audio_key, audio_path)
 
-            # Generate SRT using speech marks
+            sentences = self.split_into_sentences(text)
+            print(f"Split text into {len(sentences)} sentences")
+
+            sync_chunks = self.split_into_sync_chunks(sentences)
+            if (len(sync_chunks) <= MAX_SYNC_CHUNKS
+                    and all(len(self.build_ssml(chunk)) <= SYNC_SSML_LIMIT for chunk in sync_chunks)):
+                # Fast path: synchronous synthesis of all units at once, straight to local disk
+                units = self.split_into_synthesis_units(sentences)
+                print(f"Synthesizing {len(units)} units directly...")
+                audio, words, duration_ms = self.synthesize_units(units)
+                with open(audio_path, 'wb') as f:
+                    f.write(audio)
+            else:
+                ssml_text = self.build_ssml(sentences)
+                marks = self.synthesize_async(ssml_text, base_name, audio_path)
+                words = words_from_marks(ssml_text, marks)
+                with open(audio_path, 'rb') as f:
+                    duration_ms = mp3_duration_ms(f.read())
+
+            # Generate SRT from the word marks
             print("Generating subtitles with accurate timing...")
-            marks = self.parse_speech_marks(marks_key)
-
-            # Separate word and SSML marks
-            word_marks = [m for m in marks if m['type'] == 'word']
-            ssml_marks = [m for m in marks if m['type'] == 'ssml']
-
-            with open(srt_path, 'w', encoding='utf-8') as srt_file:
-                for i, segment in enumerate(segments, 1):
-                    # Find start time from SSML mark
-                    start_mark = next(m for m in ssml_marks if m['value'] == f'segment_{i - 1}')
-                    start_time = timedelta(milliseconds=start_mark['time'])
-
-                    # Find end time from next SSML mark or last word
-                    if i < len(segments):
-                        end_mark = next(m for m in ssml_marks if m['value'] == f'segment_{i}')
-                        end_time = timedelta(milliseconds=end_mark['time'])
-                    else:
-                        # For last segment, use the time of the last word plus a buffer
-                        last_word = word_marks[-1]
-                        end_time = timedelta(milliseconds=last_word['time'] + 1000)
-
-                    srt_file.write(f"{i}\n")
-                    srt_file.write(
-                        f"{str(start_time).replace('.', ',')[:11]} --> {str(end_time).replace('.', ',')[:11]}\n")
-                    srt_file.write(f"{segment}\n\n")
+            srt_path = self.write_outputs(base_name, words, duration_ms)
 
             print("Processing completed successfully")
             return {
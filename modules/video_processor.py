@@ -1,78 +1,359 @@
-from moviepy.editor import VideoFileClip, AudioFileClip, TextClip, CompositeVideoClip
-import json
+import argparse
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pysrt
-from moviepy.config import change_settings
-change_settings({"IMAGEMAGICK_BINARY": r"C:\Program Files\ImageMagick-7.1.1-Q16-HDRI\magick.exe"})
+from modules.disk_cache import DiskCache
+from modules.file_utils import sha256_file
+from modules.background_reader import BackgroundReader, scale_filter
+from modules.caption_renderer import CaptionRenderer, CaptionTrack
+from modules.keyframe_index import KeyframeIndex
+from modules.subtitles import read_cue_starts
+from modules.ffmpeg_utils import concat, mux, probe, probe_duration, psnr, run_ffmpeg, transcode_audio
+
+# Mux-ready AAC transcodes of the TTS audio, keyed by the MP3 content, so it is encoded once
+mux_audio_cache = DiskCache("cache/aac", max_bytes=500 * 1024 * 1024, suffix=".m4a")
+AAC_BITRATE = "192k"
+
+
+OUTPUT_FPS = 24
+# Output size and frame rate, applied on the decode side so footage is never processed at source size
+OUTPUT_PROFILES = {
+    "720x1280@24": (720, 1280, 24),
+    "720x1280@30": (720, 1280, 30),
+    "1080x1920@24": (1080, 1920, 24),
+    "1080x1920@30": (1080, 1920, 30),
+}
+SUBTITLE_FONT = "ProximaNova-Semibold"
+SUBTITLE_FONT_SIZE = 70
+SUBTITLE_STROKE_WIDTH = 2
+SUBTITLE_MARGIN = 20
+
+# Parallel chunk rendering: libx264 keeps a few cores busy per encode, and short chunks
+# cost more in process start-up than they save
+CORES_PER_CHUNK = 4
+MIN_CHUNK_SECONDS = 15
+
 
 class VideoProcessor:
-    def __init__(self):
-        self.progress_file = "progress.json"
-
-    def load_progress(self, video_path):
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r') as f:
-                progress = json.load(f)
-                return progress.get(video_path, 0)
-        return 0
-
-    def save_progress(self, video_path, timestamp):
-        progress = {}
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r') as f:
-                progress = json.load(f)
-        progress[video_path] = timestamp
-        with open(self.progress_file, 'w') as f:
-            json.dump(progress, f)
-
-    def create_subtitle_clips(self, srt_path, video_size):
-        subs = pysrt.open(srt_path)
-        subtitle_clips = []
-        for sub in subs:
-            start_time = sub.start.ordinal / 1000
-            end_time = sub.end.ordinal / 1000
-            text_clip = (TextClip(sub.text,
-                                font="ProximaNova-Semibold",
-                                fontsize=70,
-                                color='white',
-                                stroke_color='black',
-                                stroke_width=2,
-                                size=(video_size[0]-40, None),
-                                method='caption',
-                                align='center')
-                        .set_position(('center', 'center'))
-                        .set_start(start_time)
-                        .set_duration(end_time - start_time))
-            subtitle_clips.append(text_clip)
-        return subtitle_clips
-
-    def process_video(self, video_path, audio_path, srt_path, output_path):
+    BACKENDS = ("moviepy", "ffmpeg")
+
+    def __init__(self, audio_format="aac", backend="moviepy", snap_to_keyframe=True, profile=None,
+                 chunks=None, cores=None):
+        """audio_format is "aac" (transcoded once and cached) or "mp3" (Polly's MP3 muxed as-is).
+
+        backend "moviepy" blends captions in Python; "ffmpeg" burns them in
+        with libass in one ffmpeg run (needs an ffmpeg built with libass).
+        profile names an entry of OUTPUT_PROFILES; None keeps the footage's size at 24fps.
+        chunks fixes how many parts a video is rendered in parallel; by default it
+        is chosen from cores (all CPU cores unless given) and the video length.
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown render backend: {backend}")
+        if profile is not None and profile not in OUTPUT_PROFILES:
+            raise ValueError(f"Unknown output profile: {profile}")
+        self.profile = profile
+        self.chunks = chunks
+        self.cores = cores
+        self.audio_format = audio_format
+        self.backend = backend
+        self.snap_to_keyframe = snap_to_keyframe
+
+    def prepare_audio(self, audio_path):
+        """Return a path to audio that can be muxed into the MP4 without re-encoding."""
+        if self.audio_format == "mp3":
+            return audio_path
+
+        key = f"{sha256_file(audio_path)}_{AAC_BITRATE}"
+        if mux_audio_cache.get(key) is not None:
+            return mux_audio_cache.path_for(key)
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".m4a")
+        os.close(fd)
+        try:
+            transcode_audio(audio_path, tmp_path, codec="aac", bitrate=AAC_BITRATE)
+            with open(tmp_path, "rb") as f:
+                return mux_audio_cache.put(key, f.read())
+        finally:
+            os.remove(tmp_path)
+
+    def load_caption_cues(self, srt_path, offset=0.0, duration=None):
+        """(start, end, text) for the cues inside [offset, offset + duration), timed relative to offset."""
+        cues = []
+        for sub in pysrt.open(srt_path):
+            start_time = sub.start.ordinal / 1000 - offset
+            end_time = sub.end.ordinal / 1000 - offset
+            if end_time <= 0 or (duration is not None and start_time >= duration):
+                continue
+            cues.append((max(0.0, start_time), end_time, sub.text))
+        return cues
+
+    def create_caption_renderer(self, width, scale=1.0):
+        return CaptionRenderer(
+            SUBTITLE_FONT,
+            round(SUBTITLE_FONT_SIZE * scale),
+            color='white',
+            stroke_color='black',
+            stroke_width=max(1, round(SUBTITLE_STROKE_WIDTH * scale)),
+            max_width=width - round(2 * SUBTITLE_MARGIN * scale)
+        )
+
+    def render_moviepy(self, video_path, srt_path, output_path, start_time, duration, output_format,
+                       subtitle_offset=0.0, frame_count=None):
+        """Blend pre-rasterized captions into each frame with NumPy and encode the picture only.
+
+        With frame_count, exactly that many frames are written.
+        """
+        width, height, fps, source_height = output_format
+        if frame_count is not None:
+            # moviepy writes int(duration * fps) frames; half a frame of slack keeps float error from losing one
+            duration = (frame_count + 0.5) / fps
+        reader = BackgroundReader(video_path, start_time, duration, fps, width, height)
+        track = CaptionTrack(self.load_caption_cues(srt_path, subtitle_offset, duration),
+                             self.create_caption_renderer(width, height / source_height))
+        final_video = reader.to_clip().fl(lambda get_frame, t: track.apply(get_frame(t), t))
+
+        final_video.write_videofile(
+            output_path,
+            codec='libx264',
+            audio=False,
+            fps=fps
+        )
+        reader.close()
+        final_video.close()
+
+    def render_ffmpeg(self, video_path, srt_path, output_path, start_time, duration, output_format,
+                      subtitle_offset=0.0, audio_path=None, frame_count=None):
+        """Seek, trim and burn in subtitles (and mux audio, if given) in a single ffmpeg run.
+
+        Frames never pass through Python. For a chunk starting subtitle_offset
+        seconds into the video, timestamps are shifted around the subtitles
+        filter so the full subtitle file lines up. With frame_count, exactly
+        that many frames are written.
+        """
+        width, height, fps, source_height = output_format
+        if frame_count is not None:
+            # Read a frame's worth extra and let -frames:v cut the output at the exact count
+            duration = (frame_count + 1) / fps
+        filters = [f"fps={fps}", scale_filter(width, height)]
+        if subtitle_offset:
+            filters.append(f"setpts=PTS+{subtitle_offset:.6f}/TB")
+        filters.append(subtitles_filter(srt_path, source_height))
+        if subtitle_offset:
+            filters.append("setpts=PTS-STARTPTS")
+
+        args = ["-ss", f"{start_time:.3f}", "-t", f"{duration:.3f}", "-i", video_path]
+        if audio_path:
+            args += ["-i", audio_path]
+        args += ["-filter_complex", f"[0:v]{','.join(filters)}[v]", "-map", "[v]"]
+        if frame_count is not None:
+            args += ["-frames:v", str(frame_count)]
+        if audio_path:
+            args += ["-map", "1:a:0", "-c:a", "copy", "-shortest"]
+        args += ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-r", str(fps), "-movflags", "+faststart", output_path]
+        run_ffmpeg(args)
+
+    def render_segment(self, video_path, srt_path, output_path, start_time, duration, output_format,
+                       subtitle_offset=0.0, frame_count=None):
+        """Render the picture for one stretch of the video; runs in a worker process for chunked renders."""
+        renderer = self.render_ffmpeg if self.backend == "ffmpeg" else self.render_moviepy
+        renderer(video_path, srt_path, output_path, start_time, duration, output_format, subtitle_offset,
+                 frame_count=frame_count)
+        return output_path
+
+    def chunk_count(self, duration):
+        """How many chunks to render a video in, from the cores available and its length."""
+        if self.chunks:
+            return max(1, self.chunks)
+        cores = self.cores or os.cpu_count() or 1
+        return max(1, min(cores // CORES_PER_CHUNK, int(duration // MIN_CHUNK_SECONDS)))
+
+    def render_chunked(self, video_path, audio_path, srt_path, output_path, start_time, duration, output_format,
+                       chunk_count):
+        """Render chunks cut at subtitle boundaries in parallel, then join them with stream copy.
+
+        Chunks are planned in whole frames and each is rendered to its exact frame
+        count, so the joined video stays in sync with the audio.
+        """
+        fps = output_format[2]
+        bounds = plan_chunk_frames(read_cue_starts(srt_path), duration, chunk_count, fps)
+        print(f"Rendering {len(bounds)} chunks in parallel")
+
+        chunk_dir = tempfile.mkdtemp(prefix="chunks_", dir=os.path.dirname(output_path))
         try:
-            start_time = self.load_progress(video_path)
-            video = VideoFileClip(video_path).subclip(start_time)
-            audio = AudioFileClip(audio_path)
-            video = video.subclip(0, audio.duration)
-            subtitle_clips = self.create_subtitle_clips(srt_path, video.size)
-            final_video = CompositeVideoClip([video] + subtitle_clips)
-            final_video = final_video.set_audio(audio.set_start(0))
-
-            # Create output directory if it doesn't exist
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-            final_video.write_videofile(
-                output_path,
-                codec='libx264',
-                audio_codec='aac',
-                fps=24
-            )
-
-            self.save_progress(video_path, start_time + audio.duration)
-
-            video.close()
-            audio.close()
-            final_video.close()
+            with ProcessPoolExecutor(max_workers=len(bounds), mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [
+                    pool.submit(self.render_segment, video_path, srt_path,
+                                os.path.join(chunk_dir, f"chunk_{i:03d}.mp4"),
+                                start_time + first_frame / fps, (end_frame - first_frame) / fps, output_format,
+                                first_frame / fps, end_frame - first_frame)
+                    for i, (first_frame, end_frame) in enumerate(bounds)
+                ]
+                chunk_paths = [future.result() for future in futures]
+            concat(chunk_paths, output_path, audio_path)
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
+    def output_format(self, video_path):
+        """(width, height, fps, source_height) to render at; without a profile the source size is kept."""
+        stream = next(s for s in probe(video_path)["streams"] if s["codec_type"] == "video")
+        source_height = int(stream["height"])
+        if self.profile is None:
+            return int(stream["width"]), source_height, OUTPUT_FPS, source_height
+        width, height, fps = OUTPUT_PROFILES[self.profile]
+        return width, height, fps, source_height
+
+    def render(self, video_path, audio_path, srt_path, output_path, start_time=0):
+        """Render one video from start_time in the background footage, for as long as the audio lasts.
 
+        The start is moved forward to the next keyframe (when snap_to_keyframe is
+        set) so decoding begins exactly where the clip does. Returns the
+        (start, duration) actually used.
+        """
+        mux_audio_path = self.prepare_audio(audio_path)
+        duration = probe_duration(mux_audio_path)
+        if self.snap_to_keyframe:
+            start_time = KeyframeIndex.load(video_path).snap(start_time)
+
+        # Create output directory if it doesn't exist
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        output_format = self.output_format(video_path)
+        chunk_count = self.chunk_count(duration)
+        if chunk_count > 1:
+            self.render_chunked(video_path, mux_audio_path, srt_path, output_path, start_time, duration,
+                                output_format, chunk_count)
+        elif self.backend == "ffmpeg":
+            self.render_ffmpeg(video_path, srt_path, output_path, start_time, duration, output_format,
+                               audio_path=mux_audio_path)
+        else:
+            # Encode the picture only; the audio stream is copied in afterwards
+            silent_path = f"{os.path.splitext(output_path)[0]}_video.mp4"
+            self.render_moviepy(video_path, srt_path, silent_path, start_time, duration, output_format)
+            try:
+                mux(silent_path, mux_audio_path, output_path)
+            finally:
+                os.remove(silent_path)
+        return start_time, duration
+
+    def process_video(self, video_path, audio_path, srt_path, output_path, start_time=0):
+        try:
+            self.render(video_path, audio_path, srt_path, output_path, start_time)
             return output_path
 
         except Exception as e:
             raise RuntimeError(f"Error processing video: {str(e)}")
+
+
+def plan_chunk_frames(cue_starts, duration, chunk_count, fps, tolerance=MIN_CHUNK_SECONDS / 2):
+    """Split the round(duration * fps) frames of a video into up to chunk_count (first, end) frame ranges.
+
+    Cuts go at the subtitle cue start nearest each even split point, so no
+    caption spans two chunks. A cue more than tolerance seconds from the split
+    point is ignored and the cut goes at the split point itself, so clustered
+    cues cannot produce tiny chunks. Working in whole frames makes the chunk
+    frame counts add up to the full video exactly.
+    """
+    total = round(duration * fps)
+    cuts = []
+    for i in range(1, chunk_count):
+        target = duration * i / chunk_count
+        previous = cuts[-1] / fps if cuts else 0
+        candidates = [t for t in cue_starts if previous < t < duration and abs(t - target) <= tolerance]
+        cut = round((min(candidates, key=lambda t: abs(t - target)) if candidates else target) * fps)
+        if (cuts[-1] if cuts else 0) < cut < total:
+            cuts.append(cut)
+
+    points = [0] + cuts + [total]
+    return list(zip(points, points[1:]))
+
+
+def escape_filter_value(value):
+    """Escape a filter option value for both levels of ffmpeg filtergraph parsing."""
+    option_level = "".join("\\" + c if c in "\\':" else c for c in value)
+    return "".join("\\" + c if c in "\\'[],;" else c for c in option_level)
+
+
+def subtitles_filter(subtitle_path, source_height):
+    """libass subtitles filter matching the moviepy caption style.
+
+    ASS files carry their own styling; SRT styles are scaled from pixels of the
+    source footage to libass' default 288-line script resolution, so captions
+    keep their proportions at any output size.
+    """
+    if subtitle_path.endswith(".ass"):
+        return f"subtitles=filename={escape_filter_value(os.path.abspath(subtitle_path))}"
+
+    scale = 288 / source_height
+    style = ",".join([
+        f"FontName={SUBTITLE_FONT}",
+        f"FontSize={round(SUBTITLE_FONT_SIZE * scale)}",
+        "PrimaryColour=&H00FFFFFF",
+        "OutlineColour=&H00000000",
+        "BorderStyle=1",
+        f"Outline={SUBTITLE_STROKE_WIDTH * scale:.2f}",
+        "Shadow=0",
+        "Alignment=5",
+        f"MarginL={round(SUBTITLE_MARGIN * scale)}",
+        f"MarginR={round(SUBTITLE_MARGIN * scale)}",
+    ])
+    return (f"subtitles=filename={escape_filter_value(os.path.abspath(subtitle_path))}"
+            f":force_style={escape_filter_value(style)}")
+
+
+def check_parity(video_path, audio_path, srt_path, output_dir="parity", start_time=0, min_psnr=25.0):
+    """Render the same input with both backends and compare the results.
+
+    Container properties must match exactly (duration within a frame); the
+    picture is compared by PSNR, which won't be infinite because Pillow
+    and libass rasterize the captions differently.
+    """
+    outputs = {}
+    for backend in VideoProcessor.BACKENDS:
+        outputs[backend] = os.path.join(output_dir, f"{backend}.mp4")
+        start = time.time()
+        VideoProcessor(backend=backend).render(video_path, audio_path, srt_path, outputs[backend], start_time)
+        print(f"{backend}: rendered in {time.time() - start:.1f}s")
+
+    infos = {backend: probe(path) for backend, path in outputs.items()}
+    checks = {}
+    reference, candidate = (infos[backend] for backend in VideoProcessor.BACKENDS)
+    ref_video, cand_video = (next(s for s in info["streams"] if s["codec_type"] == "video")
+                             for info in (reference, candidate))
+    ref_audio, cand_audio = (next(s for s in info["streams"] if s["codec_type"] == "audio")
+                             for info in (reference, candidate))
+
+    duration_diff = abs(float(reference["format"]["duration"]) - float(candidate["format"]["duration"]))
+    checks["duration"] = duration_diff <= 1 / OUTPUT_FPS
+    checks["resolution"] = (ref_video["width"], ref_video["height"]) == (cand_video["width"], cand_video["height"])
+    checks["frame_rate"] = ref_video["avg_frame_rate"] == cand_video["avg_frame_rate"]
+    checks["audio"] = (ref_audio["codec_name"], ref_audio.get("sample_rate")) == \
+        (cand_audio["codec_name"], cand_audio.get("sample_rate"))
+    score = psnr(*outputs.values())
+    checks["psnr"] = score >= min_psnr
+
+    print(f"Duration difference: {duration_diff:.3f}s, PSNR: {score:.2f} dB")
+    for name, passed in checks.items():
+        print(f"{name:>10}: {'ok' if passed else 'MISMATCH'}")
+    return all(checks.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the moviepy and ffmpeg render backends")
+    parser.add_argument("video_path")
+    parser.add_argument("audio_path")
+    parser.add_argument("subtitle_path")
+    parser.add_argument("--start", type=float, default=0, help="Offset into the background video")
+    parser.add_argument("--output-dir", default="parity")
+    args = parser.parse_args()
+
+    passed = check_parity(args.video_path, args.audio_path, args.subtitle_path, args.output_dir, args.start)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
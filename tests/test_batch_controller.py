@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import Future
+import pytest
+
+pytest.importorskip("pypdf")
+pytest.importorskip("boto3")
+pytest.importorskip("dotenv")
+pytest.importorskip("moviepy.editor")
+
+from controllers import batch_controller
+from controllers.batch_controller import BatchController
+
+
+class InlinePool:
+    """ProcessPoolExecutor stand-in that runs submissions on the calling render thread."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class FakeManifest:
+    statuses = []
+
+    def __init__(self, base_name):
+        self.base_name = base_name
+
+    def set_status(self, status, **details):
+        self.statuses.append((self.base_name, status))
+
+
+# source name -> stage it fails at
+FAILURES = {"broken": "script", "mute": "tts", "glitch": "render"}
+
+
+def fake_execute_stage(stage_name, job, **kwargs):
+    if FAILURES.get(job['source_name']) == stage_name:
+        raise RuntimeError(f"{stage_name} exploded")
+    if stage_name == "script" and job['source_name'] == "series":
+        job['parts'] = ["series_part01", "series_part02", "series_part03"]
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    quarantined = []
+    FakeManifest.statuses = []
+    monkeypatch.setattr(batch_controller, "execute_stage", fake_execute_stage)
+    monkeypatch.setattr(batch_controller, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(batch_controller, "TTSController", lambda use_cache=True: None)
+    monkeypatch.setattr(batch_controller, "JobManifest", FakeManifest)
+    monkeypatch.setattr(batch_controller, "quarantine_job", lambda job, error: quarantined.append(job['base_name']))
+    return quarantined
+
+
+def run_batch(controller, pdf_paths):
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(zip(("completed", "failed"), controller.run(pdf_paths))))
+    thread.start()
+    thread.join(10)
+    # Every stage only exits on stop markers from the one before it; a lost marker hangs the batch
+    assert not thread.is_alive(), "batch did not shut down"
+    return result["completed"], result["failed"]
+
+
+def test_batch_finishes_and_quarantines_each_failure_at_its_stage(batch):
+    controller = BatchController(script_workers=2, tts_workers=3, render_workers=2)
+    completed, failed = run_batch(controller, [f"input/{name}.pdf" for name in
+                                               ("deck", "broken", "mute", "series", "glitch")])
+
+    assert sorted(name for name, _ in completed) == ["deck", "series_part01", "series_part02", "series_part03"]
+    assert sorted((name, stage) for name, stage, _ in failed) == [
+        ("broken", "script"), ("glitch", "render"), ("mute", "tts")
+    ]
+    assert sorted(batch) == ["broken", "glitch", "mute"]
+
+
+def test_split_source_completes_once_after_its_last_part(batch):
+    controller = BatchController(script_workers=1, tts_workers=2, render_workers=2)
+    run_batch(controller, ["input/series.pdf"])
+
+    assert FakeManifest.statuses.count(("series", "completed")) == 1
+    assert FakeManifest.statuses.index(("series", "completed")) == len(FakeManifest.statuses) - 1
+    assert controller._remaining_parts == {"series": 0}
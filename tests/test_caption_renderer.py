@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from modules.caption_renderer import SpriteCache
+
+
+class FakeSprite:
+    """Stands in for a CaptionSprite; the memory cache only looks at its size."""
+
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+
+def test_memory_cache_is_bounded_by_bytes():
+    cache = SpriteCache(disk_cache=None, max_bytes=3000)
+    for i in range(10):
+        cache.put(f"caption-{i}", FakeSprite(1000))
+
+    assert cache.memory_bytes == 3000
+    assert list(cache.memory) == ["caption-7", "caption-8", "caption-9"]
+    assert cache.get("caption-9") is not None
+    assert cache.get("caption-0") is None
+
+
+def test_replacing_a_sprite_does_not_count_it_twice():
+    cache = SpriteCache(disk_cache=None, max_bytes=3000)
+    cache.put("caption", FakeSprite(1000))
+    cache.put("caption", FakeSprite(1500))
+    assert cache.memory_bytes == 1500
+
+
+def test_sprite_larger_than_the_cache_is_not_kept():
+    cache = SpriteCache(disk_cache=None, max_bytes=1000)
+    cache.put("huge", FakeSprite(5000))
+    assert cache.memory_bytes == 0
+    assert cache.get("huge") is None
@@ -0,0 +1,14 @@
+from modules.disk_cache import DiskCache
+
+
+def test_directory_is_created_on_first_write(tmp_path):
+    cache_dir = tmp_path / "cache" / "scripts"
+    cache = DiskCache(str(cache_dir), max_bytes=1024, suffix=".json")
+    assert not cache_dir.exists()
+    assert cache.get("missing") is None
+    cache.evict()
+    assert not cache_dir.exists()
+
+    cache.put_json("key", {"script": "Hello."})
+    assert cache.get_json("key") == {"script": "Hello."}
+    assert cache_dir.is_dir()
@@ -0,0 +1,55 @@
+import pytest
+from modules import footage_allocator
+from modules.footage_allocator import FootageAllocator
+from modules.state_store import StateStore
+
+
+@pytest.fixture
+def allocator(tmp_path, monkeypatch):
+    """Allocator over two 100s videos, with durations faked instead of probed."""
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    for name in ("a.mp4", "b.mp4"):
+        (videos / name).write_bytes(b"video")
+    monkeypatch.setattr(footage_allocator, "probe_duration", lambda path: 100.0)
+    return FootageAllocator(str(videos), snap_to_keyframe=False, store=StateStore(str(tmp_path / "state.db")))
+
+
+def overlaps(first, second):
+    return first['path'] == second['path'] and first['start'] < second['end'] and second['start'] < first['end']
+
+
+def test_live_leases_never_overlap(allocator):
+    leases = [allocator.lease(30) for _ in range(6)]
+    assert not any(overlaps(a, b) for i, a in enumerate(leases) for b in leases[i + 1:])
+    assert {lease['path'] for lease in leases} == set(allocator.find_sources())
+
+    with pytest.raises(RuntimeError):
+        allocator.lease(30)
+
+
+def test_released_footage_is_not_reused_before_the_cycle_wraps(allocator):
+    held = allocator.lease(30)
+    handed_out = [held]
+    for _ in range(5):
+        lease = allocator.lease(30)
+        allocator.release(lease['id'])
+        handed_out.append(lease)
+    assert not any(overlaps(a, b) for i, a in enumerate(handed_out) for b in handed_out[i + 1:])
+
+    # Every source is used up: the next lease wraps, but still avoids the live lease
+    wrapped = allocator.lease(30)
+    assert not overlaps(wrapped, held)
+
+
+def test_wrap_starts_each_source_over(allocator):
+    for _ in range(6):
+        allocator.release(allocator.lease(30)['id'])
+    after_wrap = [allocator.lease(30) for _ in range(6)]
+    assert sorted((lease['path'], lease['start']) for lease in after_wrap) == sorted(
+        (path, start) for path in allocator.find_sources() for start in (0.0, 30.0, 60.0))
+
+
+def test_too_long_request_is_rejected(allocator):
+    with pytest.raises(ValueError):
+        allocator.lease(150)
@@ -0,0 +1,46 @@
+import pytest
+from modules.json_repair import parse_script_response, repair_json, ScriptValidationError
+
+
+def test_fenced_output_with_surrounding_prose():
+    text = 'Here is your script:\n```json\n{"title": "Fenced", "script": "Line one."}\n```\nEnjoy!'
+    assert parse_script_response(text) == {"title": "Fenced", "script": "Line one."}
+
+
+def test_trailing_commas():
+    text = '{"title": "Commas", "script": "Hi.", "tags": ["a", "b",],}'
+    assert parse_script_response(text) == {"title": "Commas", "script": "Hi.", "tags": ["a", "b"]}
+
+
+def test_smart_quotes_around_keys_and_values():
+    text = '{“title”: “Curly”, “script”: “Quoted text.”}'
+    assert parse_script_response(text) == {"title": "Curly", "script": "Quoted text."}
+
+
+def test_truncated_string_and_object():
+    text = '{"title": "Cut", "script": "This response stops mid-sent'
+    assert parse_script_response(text) == {"title": "Cut", "script": "This response stops mid-sent"}
+
+
+def test_truncated_after_escape():
+    assert repair_json('{"script": "ends with \\') == '{"script": "ends with "}'
+
+
+def test_unescaped_inner_quotes():
+    text = '{"title": "Quotes", "script": "He said "no cap" and left."}'
+    assert parse_script_response(text)["script"] == 'He said "no cap" and left.'
+
+
+def test_raw_newlines_inside_strings():
+    text = '{"title": "Lines", "script": "First line.\nSecond line."}'
+    assert parse_script_response(text)["script"] == "First line.\nSecond line."
+
+
+def test_missing_script_is_rejected():
+    with pytest.raises(ScriptValidationError):
+        parse_script_response('{"title": "No script"}')
+
+
+def test_no_json_is_rejected():
+    with pytest.raises(ScriptValidationError):
+        parse_script_response("Sorry, I can't help with that.")
@@ -0,0 +1,20 @@
+import pytest
+
+pytest.importorskip("pypdf")
+
+from modules.pdf_text_extractor import remove_boilerplate
+
+
+def test_numbers_in_the_body_are_kept():
+    assert remove_boilerplate(["The answer is\n42\nfor this"]) == ["The answer is\n42\nfor this"]
+
+
+def test_page_numbers_and_repeated_headers_are_removed():
+    pages = [f"Lecture 3 - Sorting\nBody line {n}.\nResult:\n{n * 10}\nSee part {n}.\nPage {n} of 4" for n in range(1, 5)]
+    cleaned = remove_boilerplate(pages)
+    assert cleaned[0] == "Body line 1.\nResult:\n10\nSee part 1."
+    assert cleaned[3] == "Body line 4.\nResult:\n40\nSee part 4."
+
+
+def test_bare_page_number_on_the_last_line_is_removed():
+    assert remove_boilerplate(["Intro\nSome text\n7"]) == ["Intro\nSome text"]
@@ -0,0 +1,117 @@
+import os
+import pytest
+
+pytest.importorskip("pypdf")
+pytest.importorskip("boto3")
+pytest.importorskip("dotenv")
+pytest.importorskip("moviepy.editor")
+
+from controllers import pdf_to_script_controller, pipeline_controller
+from controllers.pipeline_controller import (
+    SCRIPT_STAGE, TTS_STAGE, StageFailedError, create_job, execute_stage, quarantine_job, run_script_stage
+)
+from modules import job_manifest
+from modules.job_manifest import JobManifest
+from modules.state_store import StateStore
+
+
+class FakeScriptRunner:
+    """Writes scripts/<name>.json like the real script stage, failing the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, job, **kwargs):
+        self.calls += 1
+        os.makedirs("scripts", exist_ok=True)
+        with open(os.path.join("scripts", f"{job['base_name']}.json"), "w", encoding="utf8") as f:
+            f.write('{"title": "Deck", "script": "Hello."}' if self.calls > self.failures else '{"tit')
+        if self.calls <= self.failures:
+            raise RuntimeError("model timed out")
+        return [job['base_name']]
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    """A working directory with input/deck.pdf and a private state database."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(job_manifest, "state_store", StateStore(str(tmp_path / "state.db")))
+    (tmp_path / "input").mkdir()
+    (tmp_path / "prompts").mkdir()
+    (tmp_path / "prompts" / "brainrot.txt").write_text("Write a script.", encoding="utf8")
+    (tmp_path / "input" / "deck.pdf").write_bytes(b"%PDF-1.4 deck")
+    return tmp_path
+
+
+def use_runner(monkeypatch, runner):
+    monkeypatch.setitem(pipeline_controller.PIPELINE_STAGES[SCRIPT_STAGE], 'runner', runner)
+    return runner
+
+
+def test_completed_stage_is_skipped_and_its_pdf_moved_to_processed(workspace, monkeypatch):
+    runner = use_runner(monkeypatch, FakeScriptRunner())
+    job = create_job(os.path.join("input", "deck.pdf"))
+
+    assert execute_stage(SCRIPT_STAGE, job) == ["deck"]
+    assert execute_stage(SCRIPT_STAGE, create_job(job['pdf_path'])) == ["deck"]
+
+    assert runner.calls == 1
+    assert not (workspace / "input" / "deck.pdf").exists()
+    assert (workspace / "processed" / "deck.pdf").exists()
+
+
+def test_stage_reruns_when_its_output_is_missing(workspace, monkeypatch):
+    runner = use_runner(monkeypatch, FakeScriptRunner())
+    job = create_job(os.path.join("input", "deck.pdf"))
+    execute_stage(SCRIPT_STAGE, job)
+    os.remove(os.path.join("scripts", "deck.json"))
+
+    execute_stage(SCRIPT_STAGE, create_job(job['pdf_path']))
+    assert runner.calls == 2
+
+
+def test_failed_attempts_are_cleaned_up_and_retried(workspace, monkeypatch):
+    runner = use_runner(monkeypatch, FakeScriptRunner(failures=2))
+    job = create_job(os.path.join("input", "deck.pdf"))
+
+    assert execute_stage(SCRIPT_STAGE, job, retry_delay=0) == ["deck"]
+    assert runner.calls == 3
+    assert JobManifest("deck").get_stage(SCRIPT_STAGE)['status'] == 'completed'
+
+
+def test_stage_is_marked_failed_once_retries_run_out(workspace, monkeypatch):
+    runner = use_runner(monkeypatch, FakeScriptRunner(failures=10))
+    job = create_job(os.path.join("input", "deck.pdf"))
+
+    with pytest.raises(StageFailedError) as raised:
+        execute_stage(SCRIPT_STAGE, job, max_retries=3, retry_delay=0)
+    assert raised.value.stage_name == SCRIPT_STAGE
+    assert runner.calls == 3
+    assert JobManifest("deck").get_stage(SCRIPT_STAGE)['status'] == 'failed'
+
+    with pytest.raises(StageFailedError, match="upstream stage 'script'"):
+        execute_stage(TTS_STAGE, job)
+
+
+def test_quarantine_moves_the_pdf_from_processed(workspace):
+    os.makedirs("processed")
+    os.replace(os.path.join("input", "deck.pdf"), os.path.join("processed", "deck.pdf"))
+    job = create_job(os.path.join("input", "deck.pdf"))
+
+    quarantine_job(job, RuntimeError("render crashed"))
+
+    assert (workspace / "quarantine" / "deck.pdf").exists()
+    assert not (workspace / "processed" / "deck.pdf").exists()
+    assert job_manifest.state_store.get_job("deck")['status'] == 'quarantined'
+    assert job_manifest.state_store.get_job("deck")['error'] == "render crashed"
+
+
+def test_script_stage_raises_the_underlying_error(workspace, monkeypatch):
+    def generate_script(*args, **kwargs):
+        raise ValueError("429 quota exceeded")
+
+    monkeypatch.setattr(pdf_to_script_controller, "generate_script", generate_script)
+    with pytest.raises(ValueError, match="quota exceeded"):
+        run_script_stage(os.path.join("input", "deck.pdf"))
+    assert (workspace / "input" / "deck.pdf").exists()
@@ -0,0 +1,109 @@
+import threading
+import time
+from modules import polly_waiter
+from modules.polly_waiter import LocalNotificationQueue, PollyTaskWaiter, SQSNotificationSource
+
+
+class NoPollingClient:
+    """Polly client stand-in that counts status calls; notification tests expect none."""
+
+    def __init__(self):
+        self.polls = 0
+
+    def get_speech_synthesis_task(self, TaskId):
+        self.polls += 1
+        return {'SynthesisTask': {'TaskStatus': 'inProgress'}}
+
+
+def make_waiter(source):
+    client = NoPollingClient()
+    # A long safety-net interval: anything resolving quickly came from a notification
+    return PollyTaskWaiter(client, source, max_interval=60, timeout=30), client
+
+
+def test_local_queue_notifications_resolve_waits_without_polling():
+    source = LocalNotificationQueue()
+    waiter, client = make_waiter(source)
+
+    def publish_later():
+        time.sleep(0.2)
+        source.publish("task-1", "COMPLETED", output_uri="s3://bucket/task-1.mp3")
+        source.publish("task-2", "COMPLETED", output_uri="s3://bucket/task-2.mp3")
+
+    threading.Thread(target=publish_later).start()
+    start = time.time()
+    uris = waiter.wait_for_tasks(["task-1", "task-2"], characters=5000)
+
+    assert uris == {"task-1": "s3://bucket/task-1.mp3", "task-2": "s3://bucket/task-2.mp3"}
+    assert client.polls == 0
+    assert time.time() - start < 5
+
+
+def test_notification_arriving_before_the_wait_is_kept():
+    source = LocalNotificationQueue()
+    waiter, client = make_waiter(source)
+    # Start the dispatcher with an unrelated wait, then publish before task-3 is waited on
+    source.publish("task-0", "COMPLETED", output_uri="s3://bucket/task-0.mp3")
+    waiter.wait_for_tasks(["task-0"])
+    source.publish("task-3", "COMPLETED", output_uri="s3://bucket/task-3.mp3")
+    time.sleep(1.5)
+
+    assert waiter.wait_for_tasks(["task-3"]) == {"task-3": "s3://bucket/task-3.mp3"}
+    assert client.polls == 0
+
+
+def test_unclaimed_notifications_are_bounded(monkeypatch):
+    monkeypatch.setattr(polly_waiter, "MAX_REMEMBERED", 5)
+    source = LocalNotificationQueue()
+    waiter, _ = make_waiter(source)
+    source.publish("task-0", "COMPLETED")
+    waiter.wait_for_tasks(["task-0"])
+    for i in range(20):
+        source.publish(f"stranger-{i}", "COMPLETED")
+    time.sleep(1.5)
+
+    assert len(waiter._early) == 5
+    assert "stranger-19" in waiter._early
+
+
+class FakeSQS:
+    def __init__(self, bodies, sent_at=None):
+        sent_at = sent_at or time.time()
+        self.messages = [{'Body': body, 'ReceiptHandle': str(i), 'Attributes': {'SentTimestamp': str(int(sent_at * 1000))}}
+                         for i, body in enumerate(bodies)]
+        self.deleted = []
+        self.released = []
+
+    def receive_message(self, **kwargs):
+        return {'Messages': self.messages}
+
+    def delete_message(self, QueueUrl, ReceiptHandle):
+        self.deleted.append(ReceiptHandle)
+
+    def change_message_visibility(self, QueueUrl, ReceiptHandle, VisibilityTimeout):
+        self.released.append(ReceiptHandle)
+
+
+def test_sqs_source_only_deletes_notifications_for_accepted_tasks():
+    sqs = FakeSQS([
+        '{"taskId": "mine", "taskStatus": "COMPLETED"}',
+        '{"taskId": "theirs", "taskStatus": "COMPLETED"}',
+    ])
+    events = SQSNotificationSource(sqs, "queue-url", "topic-arn").receive(accept=lambda task_id: task_id == "mine")
+
+    assert [event['task_id'] for event in events] == ["mine"]
+    assert sqs.deleted == ["0"]
+    assert sqs.released == ["1"]
+
+
+def test_sqs_source_deletes_unclaimed_notifications_older_than_the_wait_timeout():
+    sqs = FakeSQS([
+        '{"taskId": "crashed-run", "taskStatus": "COMPLETED"}',
+        '{"taskId": "mine", "taskStatus": "COMPLETED"}',
+    ], sent_at=time.time() - 7200)
+    source = SQSNotificationSource(sqs, "queue-url", "topic-arn", max_age=1800)
+    events = source.receive(accept=lambda task_id: task_id == "mine")
+
+    assert [event['task_id'] for event in events] == ["mine"]
+    assert sqs.deleted == ["0", "1"]
+    assert sqs.released == []
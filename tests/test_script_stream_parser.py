@@ -0,0 +1,28 @@
+import pytest
+from modules.script_stream_parser import ScriptStreamParser
+
+
+def parse(raw, chunk_size):
+    parser = ScriptStreamParser()
+    sentences = []
+    for start in range(0, len(raw), chunk_size):
+        sentences += parser.feed(raw[start:start + chunk_size])
+    return sentences + parser.finish()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 7, 1000])
+def test_surrogate_pairs_decode_across_chunk_boundaries(chunk_size):
+    raw = r'{"title": "t", "script": "No cap \ud83d\ude00 fr. Next one."}'
+    sentences = parse(raw, chunk_size)
+    assert sentences == ["No cap \U0001F600 fr.", "Next one."]
+    for sentence in sentences:
+        sentence.encode("utf-8")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1000])
+def test_lone_surrogates_and_malformed_escapes_do_not_break_the_stream(chunk_size):
+    raw = r'{"script": "Lone \ud83d here. Low \ude00 too. Bad \u12zz ok."}'
+    sentences = parse(raw, chunk_size)
+    assert sentences == ["Lone \ufffd here.", "Low \ufffd too.", "Bad u12zz ok."]
+    for sentence in sentences:
+        sentence.encode("utf-8")
@@ -0,0 +1,23 @@
+from modules.state_store import StateStore
+
+
+def test_list_jobs_returns_details_newest_first(tmp_path):
+    store = StateStore(str(tmp_path / "state.db"))
+    store.set_job_status("a", "completed", output="a.mp4")
+    store.set_job_status("b", "failed", error="boom")
+    store.set_job_status("a", "completed", parts=2)
+
+    assert [job['name'] for job in store.list_jobs()] == ["a", "b"]
+    assert store.list_jobs("completed")[0]['output'] == "a.mp4"
+    assert store.list_jobs("completed")[0]['parts'] == 2
+    assert store.list_jobs("failed")[0]['error'] == "boom"
+
+
+def test_provider_stats_accumulate_across_store_instances(tmp_path):
+    path = str(tmp_path / "state.db")
+    assert StateStore(path).get_provider_stats("gemini") == {}
+    for latency in (1.0, 2.0, 3.0):
+        StateStore(path).record_provider_call("gemini", latency, success=True, max_samples=2)
+    StateStore(path).record_provider_call("gemini", 9.0, success=False, max_samples=2)
+
+    assert StateStore(path).get_provider_stats("gemini") == {'latencies': [2.0, 3.0], 'successes': 3, 'errors': 1}
@@ -0,0 +1,102 @@
+import json
+import pytest
+
+pytest.importorskip("pypdf")
+pytest.importorskip("boto3")
+pytest.importorskip("dotenv")
+
+from controllers import streaming_controller
+from modules.disk_cache import DiskCache
+
+
+class FakeGemini:
+    def __init__(self, chunks, repaired=None):
+        self.chunks = chunks
+        self.repaired = repaired
+
+    def stream_pdf(self, pdf_path, prompt_text):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+    def process_text(self, document_text, prompt_text):
+        return self.repaired
+
+
+class FakeTTS:
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.voiced = []
+
+    def process_sentence_stream(self, sentence_batches, base_name):
+        for batch in sentence_batches:
+            if self.fail_after is not None and len(self.voiced) >= self.fail_after:
+                raise RuntimeError("ThrottlingException")
+            self.voiced += batch
+        return {'audio_path': f"audio/{base_name}.mp3", 'subtitle_path': f"audio/{base_name}.srt"}
+
+
+@pytest.fixture
+def stream(tmp_path, monkeypatch):
+    """Run stream_pdf_to_script_and_audio in tmp_path against a fake model; returns (run, script cache)."""
+    monkeypatch.chdir(tmp_path)
+    cache = DiskCache(str(tmp_path / "cache"), suffix=".json")
+    monkeypatch.setattr(streaming_controller, "script_cache", cache)
+    monkeypatch.setattr(streaming_controller, "get_model_name", lambda provider: "fake-model")
+    (tmp_path / "input").mkdir()
+    (tmp_path / "prompt.txt").write_text("Write a script.", encoding="utf8")
+
+    def run(model, tts):
+        pdf_path = tmp_path / "input" / "deck.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        monkeypatch.setattr(streaming_controller, "create_processor", lambda provider: model)
+        return streaming_controller.stream_pdf_to_script_and_audio(str(pdf_path), str(tmp_path / "prompt.txt"),
+                                                                   tts_controller=tts)
+    return run, cache
+
+
+RESPONSE = '{"title": "Deck", "script": "One. Two. Three. Four. Five. Six. Seven. Eight. Nine."}'
+
+
+def test_tts_failure_still_saves_and_caches_the_streamed_script(stream, tmp_path):
+    run, cache = stream
+    model = FakeGemini([RESPONSE[i:i + 7] for i in range(0, len(RESPONSE), 7)])
+
+    result = run(model, FakeTTS(fail_after=2))
+
+    assert result['tts_result'] is None
+    saved = json.loads((tmp_path / "scripts" / "deck.json").read_text(encoding="utf8"))
+    assert saved['script'] == "One. Two. Three. Four. Five. Six. Seven. Eight. Nine."
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    assert (tmp_path / "processed" / "deck.pdf").exists()
+
+
+def test_stream_failure_is_raised_without_saving_a_script(stream, tmp_path):
+    run, _ = stream
+    model = FakeGemini([RESPONSE[:30], ConnectionError("stream reset")])
+
+    with pytest.raises(ConnectionError):
+        run(model, FakeTTS(fail_after=0))
+    assert not (tmp_path / "scripts" / "deck.json").exists()
+
+
+def test_audio_is_discarded_when_the_model_repaired_the_script(stream, tmp_path):
+    run, _ = stream
+    # The script field streams fine, but the rest of the response is beyond local repair
+    model = FakeGemini(['{"title": "Deck", "script": "Streamed one. Streamed two.", oops}'],
+                       repaired='{"title": "Deck", "script": "Repaired text."}')
+    tts = FakeTTS()
+
+    result = run(model, tts)
+
+    assert tts.voiced == ["Streamed one.", "Streamed two."]
+    assert result['tts_result'] is None
+    saved = json.loads((tmp_path / "scripts" / "deck.json").read_text(encoding="utf8"))
+    assert saved['script'] == "Repaired text."
+
+
+def test_audio_is_kept_when_the_saved_script_is_what_was_streamed(stream):
+    run, _ = stream
+    result = run(FakeGemini([RESPONSE]), FakeTTS())
+    assert result['tts_result'] == {'audio_path': "audio/deck.mp3", 'subtitle_path': "audio/deck.srt"}
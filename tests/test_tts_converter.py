@@ -0,0 +1,72 @@
+import io
+import json
+import re
+import pytest
+
+pytest.importorskip("boto3")
+pytest.importorskip("dotenv")
+
+from modules import tts_converter
+from modules.disk_cache import DiskCache
+
+# One MPEG-2 Layer III frame: 64 kbps, 24 kHz, 576 samples (24 ms), 192 bytes
+FRAME = bytes([0xFF, 0xF3, 0x84, 0xC4]) + bytes(188)
+FRAMES_PER_WORD = 10
+WORD_MS = 240
+
+
+class FakePolly:
+    """synthesize_speech stand-in: 240 ms of audio per word, with matching word marks."""
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize_speech(self, Text, OutputFormat, **kwargs):
+        body = re.compile(rb"[A-Za-z']+")
+        data = Text.encode("utf-8")
+        words = list(body.finditer(data, len(b"<speak>"), len(data) - len(b"</speak>")))
+        if OutputFormat == 'mp3':
+            self.calls.append(Text)
+            return {'AudioStream': io.BytesIO(FRAME * FRAMES_PER_WORD * len(words))}
+        marks = [{'time': i * WORD_MS, 'type': 'word', 'start': match.start(), 'end': match.end(),
+                  'value': match.group().decode("utf-8")} for i, match in enumerate(words)]
+        return {'AudioStream': io.BytesIO("\n".join(json.dumps(mark) for mark in marks).encode("utf-8"))}
+
+
+@pytest.fixture
+def tts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(tts_converter.boto3, "client", lambda *args, **kwargs: None, raising=False)
+    converter = tts_converter.PollyTTS(use_cache=True)
+    converter.cache = DiskCache(str(tmp_path / "tts"))
+    converter.polly_client = FakePolly()
+    return converter
+
+
+SENTENCES = ["Mitochondria make energy.", "They have their own DNA.", "Cells can hold thousands.", "Wild, right?"]
+
+
+def test_cache_misses_are_packed_into_one_call_and_cached_per_sentence(tts):
+    assert tts.split_into_synthesis_units(SENTENCES) == [SENTENCES]
+    audio, words, _ = tts.synthesize_units(tts.split_into_synthesis_units(SENTENCES))
+    assert len(tts.polly_client.calls) == 1
+
+    units = tts.split_into_synthesis_units(SENTENCES)
+    assert units == [[sentence] for sentence in SENTENCES]
+    cached_audio, cached_words, _ = tts.synthesize_units(units)
+    assert len(tts.polly_client.calls) == 1
+    assert cached_audio == audio
+    assert cached_words == words
+
+
+def test_edited_sentence_is_the_only_one_resynthesized(tts):
+    tts.synthesize_units(tts.split_into_synthesis_units(SENTENCES))
+    edited = SENTENCES[:2] + ["Cells can hold millions of them.", "Wild, right?"]
+
+    units = tts.split_into_synthesis_units(edited)
+    assert units == [[sentence] for sentence in edited]
+    _, words, _ = tts.synthesize_units(units)
+
+    assert tts.polly_client.calls[1:] == ["<speak>Cells can hold millions of them.</speak>"]
+    assert [word['text'] for word in words][-5:] == ["millions", "of", "them.", "Wild,", "right?"]
+    assert [word['time'] for word in words] == [i * WORD_MS for i in range(len(words))]
@@ -0,0 +1,125 @@
+from concurrent.futures import Future
+import pytest
+
+pytest.importorskip("pysrt")
+pytest.importorskip("moviepy.editor")
+pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+
+from modules import ffmpeg_utils, video_processor
+from modules.disk_cache import DiskCache
+from modules.video_processor import VideoProcessor
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """Replace ffmpeg/ffprobe: every run writes its output file and is recorded; probes describe a 12s 1080x1920 clip."""
+    runs = []
+
+    def run_ffmpeg(args, loglevel="error"):
+        runs.append(list(args))
+        with open(args[-1], "wb") as f:
+            f.write(b"media")
+
+    monkeypatch.setattr(ffmpeg_utils, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(video_processor, "run_ffmpeg", run_ffmpeg)
+    monkeypatch.setattr(video_processor, "probe_duration", lambda path: 12.0)
+    monkeypatch.setattr(video_processor, "probe", lambda path: {
+        "streams": [{"codec_type": "video", "width": 1080, "height": 1920}]
+    })
+    monkeypatch.setattr(video_processor, "mux_audio_cache", DiskCache(str(tmp_path / "aac"), suffix=".m4a"))
+    return runs
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    audio_path = tmp_path / "audio.mp3"
+    audio_path.write_bytes(b"mp3")
+    srt_path = tmp_path / "audio.srt"
+    srt_path.write_text("1\n00:00:00,000 --> 00:00:01,000\nno cap\n", encoding="utf-8")
+    return str(tmp_path / "background.mp4"), str(audio_path), str(srt_path), str(tmp_path / "out" / "final.mp4")
+
+
+def test_render_ffmpeg_transcodes_audio_once_and_muxes_it(fake_ffmpeg, inputs):
+    video_path, audio_path, srt_path, output_path = inputs
+    processor = VideoProcessor(backend="ffmpeg", snap_to_keyframe=False, chunks=1)
+
+    assert processor.render(video_path, audio_path, srt_path, output_path, start_time=3) == (3, 12.0)
+    processor.render(video_path, audio_path, srt_path, output_path, start_time=3)
+
+    transcodes = [args for args in fake_ffmpeg if "-vn" in args]
+    assert len(transcodes) == 1
+    render = fake_ffmpeg[-1]
+    assert render[render.index("-ss") + 1] == "3.000"
+    assert render[render.index("-c:a") + 1] == "copy"
+    assert render[-1] == output_path
+
+
+def test_render_moviepy_muxes_with_stream_copy(fake_ffmpeg, inputs, monkeypatch):
+    video_path, audio_path, srt_path, output_path = inputs
+    rendered = []
+
+    def render_moviepy(self, video_path, srt_path, output_path, start_time, duration, output_format,
+                       subtitle_offset=0.0):
+        rendered.append((start_time, duration, output_format))
+        with open(output_path, "wb") as f:
+            f.write(b"video")
+
+    monkeypatch.setattr(VideoProcessor, "render_moviepy", render_moviepy)
+    processor = VideoProcessor(audio_format="mp3", snap_to_keyframe=False, chunks=1)
+    processor.render(video_path, audio_path, srt_path, output_path)
+
+    assert rendered == [(0, 12.0, (1080, 1920, 24, 1920))]
+    mux = fake_ffmpeg[-1]
+    assert mux[mux.index("-c") + 1] == "copy"
+    assert audio_path in mux
+
+
+def test_chunk_frames_ignore_cues_far_from_the_split_points():
+    assert video_processor.plan_chunk_frames([0, 0.5], 100, 4, 24) == [(0, 600), (600, 1200), (1200, 1800), (1800, 2400)]
+
+
+def test_chunk_frames_cut_at_nearby_cues():
+    frames = video_processor.plan_chunk_frames([10.0, 23.51, 52.0, 90.0], 100, 4, 24)
+    assert [end for _, end in frames] == [round(23.51 * 24), 52 * 24, 75 * 24, 2400]
+
+
+@pytest.mark.parametrize("fps", [24, 25, 30, 60])
+def test_chunk_frame_counts_add_up_to_the_whole_video(fps):
+    for step in range(1, 2000):
+        duration = 15 + step * 0.0137
+        cues = [duration * i / 7 + 0.013 * i for i in range(7)]
+        frames = video_processor.plan_chunk_frames(cues, duration, 4, fps)
+        assert sum(end - first for first, end in frames) == round(duration * fps)
+        assert all(first < end for first, end in frames)
+        assert all(a[1] == b[0] for a, b in zip(frames, frames[1:]))
+
+
+class InlinePool:
+    """ProcessPoolExecutor stand-in that runs submissions in the test process."""
+
+    def __init__(self, max_workers=None, mp_context=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+
+def test_render_chunked_passes_exact_frame_counts(fake_ffmpeg, inputs, monkeypatch):
+    video_path, audio_path, srt_path, output_path = inputs
+    monkeypatch.setattr(video_processor, "ProcessPoolExecutor", InlinePool)
+    monkeypatch.setattr(video_processor, "probe_duration", lambda path: 61.37)
+    processor = VideoProcessor(backend="ffmpeg", audio_format="mp3", snap_to_keyframe=False, chunks=3)
+    processor.render(video_path, audio_path, srt_path, output_path)
+
+    chunk_runs = [args for args in fake_ffmpeg if "-frames:v" in args]
+    assert len(chunk_runs) == 3
+    assert sum(int(args[args.index("-frames:v") + 1]) for args in chunk_runs) == round(61.37 * 24)
@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip("pypdf")
+pytest.importorskip("boto3")
+pytest.importorskip("dotenv")
+pytest.importorskip("moviepy.editor")
+
+from controllers import watch_controller
+
+
+class FakeTTSController:
+    def __init__(self, use_cache=True):
+        self.use_cache = use_cache
+
+
+@pytest.fixture
+def controller(tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_controller, "TTSController", FakeTTSController)
+    monkeypatch.setattr(watch_controller, "VideoController", lambda **kwargs: None)
+    return watch_controller.WatchController(input_folder=str(tmp_path), status_port=0,
+                                            script_options={'use_cache': False})
+
+
+def test_no_cache_reaches_the_shared_tts_controller(controller):
+    assert controller.tts_controller.use_cache is False
+
+
+def test_job_dropped_at_shutdown_is_skipped(controller, tmp_path, monkeypatch):
+    monkeypatch.setattr(watch_controller, "run_pipeline", lambda *args, **kwargs: pytest.fail("job should not run"))
+    pdf_path = str(tmp_path / "deck.pdf")
+    (tmp_path / "deck.pdf").write_bytes(b"%PDF-1.4")
+    controller.queued.append(pdf_path)
+    controller.jobs.put(pdf_path)
+    # run() clears the queue on shutdown while a worker may already hold the path
+    controller.queued.clear()
+
+    controller.process(controller.jobs.get())
+    assert controller.running == {}
+    assert controller.counts == {'completed': 0, 'failed': 0}